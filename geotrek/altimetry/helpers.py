@@ -1,22 +1,31 @@
 import logging
+import struct
 
-from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.gdal import GDALRaster
+from django.contrib.gis.geos import Polygon
 from django.utils import translation
 from django.utils.translation import gettext as _
-from django.contrib.gis.geos import LineString
 from django.conf import settings
 from django.db import connection
 
+import numpy as np
 import pygal
 from pygal.style import LightSolarizedStyle
 
 logger = logging.getLogger(__name__)
 
+DEM_BINARY_MAGIC = b'GTDM'
+DEM_BINARY_VERSION = 1
+
 
 class AltimetryHelper(object):
     @classmethod
     def elevation_profile(cls, geometry3d, precision=None, offset=0):
-        """Extract elevation profile from a 3D geometry.
+        """Extract elevation profile from a 3D geometry, as a list of
+        ``[distance, x, y, z]`` steps (coordinates in API_SRID).
+
+        Distances are computed in the native SRID, for all vertices at once,
+        and the geometry is reprojected only once, even if multi-part.
 
         :precision:  geometry sampling in meters
         """
@@ -25,31 +34,31 @@ class AltimetryHelper(object):
         if geometry3d.geom_type == 'Point':
             return [[0, geometry3d.x, geometry3d.y, geometry3d.z]]
 
-        if geometry3d.geom_type == 'MultiLineString':
-            profile = []
-            for subcoords in geometry3d.coords:
-                subline = LineString(subcoords, srid=geometry3d.srid)
-                offset += subline.length
-                subprofile = AltimetryHelper.elevation_profile(subline, precision, offset)
-                profile.extend(subprofile)
-            return profile
-
-        # Add measure to 2D version of geometry3d
-        # Get distance from origin for each vertex
-        sql = """
-        WITH line2d AS (SELECT ST_Force2D('%(ewkt)s'::geometry) AS geom),
-             line_measure AS (SELECT ST_Addmeasure(geom, 0, ST_length(geom)) AS geom FROM line2d),
-             points2dm AS (SELECT (ST_DumpPoints(geom)).geom AS point FROM line_measure)
-        SELECT (%(offset)s + ST_M(point)) FROM points2dm;
-        """ % {'offset': offset, 'ewkt': geometry3d.ewkt}
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        pointsm = cursor.fetchall()
-        # Join (offset+distance, x, y, z) together
+        multi = geometry3d.geom_type == 'MultiLineString'
+        lines = geometry3d.coords if multi else [geometry3d.coords]
+        distances = []
+        for coords in lines:
+            line_distances = cls.cumulative_distances(coords)
+            if multi:
+                # Each part is shifted by its own length
+                offset += line_distances[-1]
+            distances.append(offset + line_distances)
+
         geom3dapi = geometry3d.transform(settings.API_SRID, clone=True)
-        assert len(pointsm) == len(geom3dapi.coords), 'Cannot map distance to xyz'
-        dxyz = [pointsm[i] + v for i, v in enumerate(geom3dapi.coords)]
-        return dxyz
+        apilines = geom3dapi.coords if multi else [geom3dapi.coords]
+        xyz = np.concatenate([np.array(coords, dtype=float) for coords in apilines])
+        distances = np.concatenate(distances)
+        assert len(distances) == len(xyz), 'Cannot map distance to xyz'
+        # Join (offset+distance, x, y, z) together
+        return np.column_stack((distances, xyz)).tolist()
+
+    @classmethod
+    def cumulative_distances(cls, coords):
+        """Return the 2D distance from origin of each vertex of a line.
+        """
+        xy = np.array(coords, dtype=float)[:, :2]
+        steps = np.hypot(*np.diff(xy, axis=0).T)
+        return np.concatenate(([0.0], np.cumsum(steps)))
 
     @classmethod
     def altimetry_limits(cls, profile):
@@ -139,74 +148,22 @@ class AltimetryHelper(object):
         if height < precision or width < precision:
             precision = min([height, width])
 
-        sql = """
-            -- Author: Celian Garcia
-            WITH columns AS (
-                    SELECT generate_series({xmin}::int, {xmax}::int, {precision}) AS x
-                ),
-                lines AS (
-                    SELECT generate_series({ymin}::int, {ymax}::int, {precision}) AS y
-                ),
-                resolution AS (
-                    SELECT x, y
-                    FROM (SELECT COUNT(x) AS x FROM columns) AS col,
-                         (SELECT COUNT(y) AS y FROM lines)   AS lin
-                ),
-                points2d AS (
-                    SELECT row_number() OVER () AS id,
-                           ST_SetSRID(ST_MakePoint(x, y), {srid}) AS geom,
-                           ST_Transform(ST_SetSRID(ST_MakePoint(x, y), {srid}), 4326) AS geomll
-                    FROM lines, columns
-                ),
-                draped AS (
-                    SELECT id, ST_Value(altimetry_dem.rast, p.geom)::int AS altitude
-                    FROM altimetry_dem, points2d AS p
-                    WHERE ST_Intersects(altimetry_dem.rast, p.geom)
-                ),
-                all_draped AS (
-                    SELECT geomll, geom, altitude
-                    FROM points2d LEFT JOIN draped ON (points2d.id = draped.id)
-                    ORDER BY points2d.id
-                ),
-                extent_latlng AS (
-                    SELECT ST_Envelope(ST_Union(geom)) AS extent,
-                           MIN(altitude) AS min_z,
-                           MAX(altitude) AS max_z,
-                           AVG(altitude) AS center_z
-                    FROM all_draped
-                )
-            SELECT extent,
-                   ST_transform(extent, 4326),
-                   center_z,
-                   min_z,
-                   max_z,
-                   resolution.x AS resolution_w,
-                   resolution.y AS resolution_h,
-                   altitude
-            FROM extent_latlng, resolution, all_draped;
-        """.format(xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
-                   srid=settings.SRID, precision=precision)
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        first = result[0]
-        envelop_native, envelop, center_z, min_z, max_z, resolution_w, resolution_h, a = first
-        envelop = GEOSGeometry(envelop, srid=4326)
-        envelop_native = GEOSGeometry(envelop_native, srid=settings.SRID)
-
-        if center_z is None:
+        # Grid nodes are spaced by precision from (xmin, ymin), like generate_series()
+        resolution_w = int((xmax - xmin) // precision) + 1
+        resolution_h = int((ymax - ymin) // precision) + 1
+        altitudes = cls.dem_grid(xmin, ymin, resolution_w, resolution_h, precision)
+        valid = altitudes.compressed() if altitudes is not None else []
+        if not len(valid):
             logger.warning("No DEM present")
             return {}
+        min_z, max_z, center_z = int(valid.min()), int(valid.max()), valid.mean()
+        altitudes = altitudes.filled(0) - min_z
 
-        altitudes = []
-        row = []
-        for i, record in enumerate(result):
-            if i > 0 and i % resolution_w == 0:
-                altitudes.append(row)
-                row = []
-            elevation = (record[7] or 0.0) - min_z
-            row.append(elevation)
-        altitudes.append(row)
+        envelop_native = Polygon.from_bbox((xmin, ymin,
+                                            xmin + (resolution_w - 1) * precision,
+                                            ymin + (resolution_h - 1) * precision))
+        envelop_native.srid = settings.SRID
+        envelop = envelop_native.transform(4326, clone=True)
 
         area = {
             'center': {
@@ -249,6 +206,75 @@ class AltimetryHelper(object):
                               'x': envelop_native.coords[0][3][0],
                               'y': envelop_native.coords[0][3][1]}
             },
-            'altitudes': altitudes
+            'altitudes': altitudes.tolist()
         }
         return area
+
+    @classmethod
+    def dem_grid(cls, xmin, ymin, width, height, step):
+        """Return DEM altitudes at nodes of a grid, as a masked array of
+        ``height`` rows (from south to north) of ``width`` integers, where
+        nodes outside the DEM are masked. Return None if there is no DEM.
+
+        The DEM is clipped and resampled once by PostGIS into a single raster
+        whose pixels are centered on nodes, transferred as a GeoTIFF.
+        """
+        # Upper-left corner of the pixel centered on the north-west node
+        ulx = xmin - step / 2.0
+        uly = ymin + (height - 1) * step + step / 2.0
+        sql = """
+        WITH grid AS (
+            SELECT ST_MakeEmptyRaster(%(width)s, %(height)s, %(ulx)s, %(uly)s,
+                                      %(step)s, -%(step)s, 0, 0, %(srid)s) AS rast
+        ),
+        clipped AS (
+            SELECT ST_Union(ST_Clip(dem.rast, 1, ST_Envelope(grid.rast), true)) AS rast
+            FROM altimetry_dem AS dem, grid
+            WHERE ST_Intersects(dem.rast, ST_Envelope(grid.rast))
+        )
+        SELECT ST_AsGDALRaster(ST_Resample(clipped.rast, grid.rast, 'NearestNeighbour'), 'GTiff')
+        FROM clipped, grid
+        WHERE clipped.rast IS NOT NULL;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'width': width, 'height': height, 'ulx': ulx, 'uly': uly,
+                                 'step': step, 'srid': settings.SRID})
+            row = cursor.fetchone()
+        if row is None or row[0] is None:
+            return None
+        raster = GDALRaster(bytes(row[0]))
+        band = raster.bands[0]
+        data = band.data()
+        if band.nodata_value is not None:
+            nodata = data == band.nodata_value
+        else:
+            nodata = np.zeros(data.shape, dtype=bool)
+        # Resampled raster covers the clipped DEM only: paste it into the grid
+        top = int(round((uly - raster.origin.y) / step))
+        left = int(round((raster.origin.x - ulx) / step))
+        src = (slice(max(0, -top), height - top), slice(max(0, -left), width - left))
+        dst = (slice(max(0, top), max(0, top) + data[src].shape[0]),
+               slice(max(0, left), max(0, left) + data[src].shape[1]))
+        grid = np.zeros((height, width))
+        grid[dst] = data[src]
+        mask = np.ones((height, width), dtype=bool)
+        mask[dst] = nodata[src]
+        # Like ST_Value(...)::int, and from south to north
+        return np.ma.masked_array(np.rint(grid).astype(int), mask)[::-1]
+
+    @classmethod
+    def elevation_area_binary(cls, area):
+        """
+        Return the altitudes of an area (see ``elevation_area()``) in a compact
+        binary format (little-endian):
+
+        * header: magic ``GTDM``, format version (uint8), width (uint32), height (uint32),
+          step (float32), south-west node x and y (float64), minimum altitude (int32)
+        * altitudes relative to minimum altitude (int16[height][width]), rows from south to north
+        """
+        southwest = area['extent']['southwest']
+        header = struct.pack('<4sBIIfddi', DEM_BINARY_MAGIC, DEM_BINARY_VERSION,
+                             area['resolution']['x'], area['resolution']['y'],
+                             area['resolution']['step'], southwest['x'], southwest['y'],
+                             area['extent']['altitudes']['min'])
+        return header + np.array(area['altitudes'], dtype='<i2').tobytes()
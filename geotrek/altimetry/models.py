@@ -2,6 +2,7 @@ import os
 
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.core.cache import caches
 from django.utils.translation import get_language, gettext_lazy as _
 from django.urls import reverse
 
@@ -44,11 +45,26 @@ class AltimetryMixin(models.Model):
         self.slope = fromdb.slope
         return self
 
+    def _cached_altimetry(self, name, compute):
+        """Cache results of ``compute`` per object version (``date_update``)
+        """
+        date_update = getattr(self, 'date_update', None)
+        if self.pk is None or date_update is None:
+            return compute()
+        key = 'altimetry_%s_%s_%s_%s' % (name, self._meta.label_lower, self.pk,
+                                         date_update.strftime('%y%m%d%H%M%S%f'))
+        cache = caches['default']
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result)
+        return result
+
     def get_elevation_profile(self):
-        return AltimetryHelper.elevation_profile(self.geom_3d)
+        return self._cached_altimetry('profile', lambda: AltimetryHelper.elevation_profile(self.geom_3d))
 
     def get_elevation_area(self):
-        return AltimetryHelper.elevation_area(self.geom)
+        return self._cached_altimetry('area', lambda: AltimetryHelper.elevation_area(self.geom))
 
     def get_elevation_limits(self):
         return AltimetryHelper.altimetry_limits(self.get_elevation_profile())
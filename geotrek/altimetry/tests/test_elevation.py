@@ -1,6 +1,9 @@
+import struct
+from array import array
+
 from django.conf import settings
-from django.test import TestCase
-from unittest import SkipTest, skipIf
+from django.test import TestCase, override_settings
+from unittest import SkipTest, mock, skipIf
 
 from django.db import connection
 from django.contrib.gis.geos import MultiLineString, LineString, Point
@@ -47,6 +50,18 @@ class ElevationTest(TestCase):
         self.assertAlmostEqual(profile[5][3], 20.0)
         self.assertAlmostEqual(profile[6][3], 22.0)
 
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_elevation_profile_cached(self):
+        profile = self.path.get_elevation_profile()
+        with mock.patch.object(AltimetryHelper, 'elevation_profile') as elevation_profile:
+            self.assertEqual(self.path.get_elevation_profile(), profile)
+            self.assertFalse(elevation_profile.called)
+            self.path.geom = LineString((78, 117), (3, 42))
+            self.path.save()
+            self.path.get_elevation_profile()
+            self.assertTrue(elevation_profile.called)
+
     @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
     def test_elevation_limits(self):
         limits = self.path.get_elevation_limits()
@@ -116,6 +131,15 @@ class ElevationProfileTest(TestCase):
 
         profile = AltimetryHelper.elevation_profile(geom)
         self.assertEqual(len(profile), 4)
+        self.assertEqual([step[0] for step in profile], [1.0, 2.0, 3.5, 6.0])
+        self.assertEqual([step[3] for step in profile], [8.0, 10.0, 6.0, 7.0])
+
+    def test_elevation_profile_distances(self):
+        geom = LineString((0, 0, 1), (3, 4, 2), (3, 10, 5), srid=settings.SRID)
+
+        profile = AltimetryHelper.elevation_profile(geom, offset=5)
+        self.assertEqual([step[0] for step in profile], [5.0, 10.0, 16.0])
+        self.assertEqual([step[3] for step in profile], [1.0, 2.0, 5.0])
 
     def test_elevation_profile_point(self):
         geom = Point(1.5, 2.5, 8, srid=settings.SRID)
@@ -217,6 +241,37 @@ class ElevationOtherGeomAreaTest(AreaTestCase):
         self.assertEqual(extent['altitudes']['max'], 30)
         self.assertEqual(extent['altitudes']['min'], 30)
 
+    def test_area_altitudes_are_dem_values_at_nodes(self):
+        geom = LineString((0, 0), (100, 125), srid=settings.SRID)
+        area = AltimetryHelper.elevation_area(geom)
+        southwest = area['extent']['southwest']
+        step = area['resolution']['step']
+        min_z = area['extent']['altitudes']['min']
+        with connection.cursor() as cur:
+            for j, row in enumerate(area['altitudes']):
+                for i, altitude in enumerate(row):
+                    cur.execute('SELECT ST_Value(rast, ST_SetSRID(ST_MakePoint(%s, %s), %s))::int FROM altimetry_dem',
+                                [southwest['x'] + i * step, southwest['y'] + j * step, settings.SRID])
+                    self.assertEqual(altitude, (cur.fetchone()[0] or 0) - min_z)
+
+    def test_area_binary(self):
+        geom = LineString((0, 0), (100, 125), srid=settings.SRID)
+        area = AltimetryHelper.elevation_area(geom)
+        binary = AltimetryHelper.elevation_area_binary(area)
+        header_size = struct.calcsize('<4sBIIfddi')
+        magic, version, width, height, step, x, y, min_z = struct.unpack('<4sBIIfddi', binary[:header_size])
+        self.assertEqual(magic, b'GTDM')
+        self.assertEqual((width, height), (area['resolution']['x'], area['resolution']['y']))
+        self.assertEqual((x, y), (area['extent']['southwest']['x'], area['extent']['southwest']['y']))
+        self.assertEqual(min_z, area['extent']['altitudes']['min'])
+        altitudes = array('h', binary[header_size:])
+        self.assertEqual(len(altitudes), width * height)
+        self.assertEqual(list(altitudes[:width]), area['altitudes'][0])
+
+    def test_area_without_dem(self):
+        geom = LineString((10000, 10000), (10100, 10000), srid=settings.SRID)
+        self.assertEqual(AltimetryHelper.elevation_area(geom), {})
+
     def test_area_has_nice_ratio_if_vertical(self):
         geom = LineString((0, 0), (0, 1000), srid=settings.SRID)
         area = AltimetryHelper.elevation_area(geom)
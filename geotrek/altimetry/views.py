@@ -13,6 +13,7 @@ from mapentity.views import JSONResponseMixin, LastModifiedMixin
 
 from geotrek.common.permissions import PublicOrReadPermMixin
 
+from .helpers import AltimetryHelper
 from .models import AltimetryMixin
 
 
@@ -57,7 +58,8 @@ class ElevationArea(LastModifiedMixin, JSONResponseMixin, PublicOrReadPermMixin,
         """Used by the ``view_cache_response_content`` decorator.
         """
         obj = self.get_object()
-        return 'altimetry_dem_area_%s' % obj.pk
+        date_update = getattr(obj, 'date_update', None)
+        return 'altimetry_dem_area_%s_%s' % (obj.pk, date_update.strftime('%y%m%d%H%M%S%f') if date_update else '')
 
     @view_cache_response_content()
     def dispatch(self, *args, **kwargs):
@@ -67,6 +69,17 @@ class ElevationArea(LastModifiedMixin, JSONResponseMixin, PublicOrReadPermMixin,
         return self.object.get_elevation_area()
 
 
+class ElevationAreaBinary(LastModifiedMixin, PublicOrReadPermMixin, BaseDetailView):
+    """Return elevation area in the binary format of ``AltimetryHelper.elevation_area_binary()``"""
+
+    def render_to_response(self, context, **response_kwargs):
+        area = self.object.get_elevation_area()
+        if not area:
+            raise Http404('No DEM present')
+        return HttpResponse(AltimetryHelper.elevation_area_binary(area),
+                            content_type='application/octet-stream')
+
+
 def serve_elevation_chart(request, model_name, pk, from_command=False):
     model = get_object_or_404(ContentType, model=model_name).model_class()
     if not issubclass(model, AltimetryMixin):
@@ -6,7 +6,6 @@ from PIL import Image
 import re
 import shutil
 from time import sleep
-from zipfile import ZipFile
 import cairosvg
 
 from django.conf import settings
@@ -24,7 +23,7 @@ from geotrek.tourism import models as tourism_models
 from geotrek.trekking import models as trekking_models
 from geotrek.api.mobile.views.trekking import TrekViewSet
 from geotrek.api.mobile.views.common import FlatPageViewSet, SettingsView
-from geotrek.common.helpers_sync import ZipTilesBuilder
+from geotrek.common.helpers_sync import ZipBuilder, ZipTilesBuilder
 # Register mapentity models
 from geotrek.trekking import urls  # NOQA
 from geotrek.tourism import urls  # NOQA
@@ -157,7 +156,7 @@ class Command(BaseCommand):
         self.mkdirs(dst)
         if not os.path.isfile(dst):
             os.link(src, dst)
-        if zipfile and os.path.join(url, name) not in zipfile.namelist():
+        if zipfile:
             zipfile.write(dst, os.path.join(url, name))
         if self.verbosity == 2:
             self.stdout.write(
@@ -191,34 +190,23 @@ class Command(BaseCommand):
                 image = image.resize((size, size), Image.ANTIALIAS)
             # Save
             image.save(dst, optimize=True, quality=95)
-            if name not in zipfile.namelist():
-                zipfile.write(dst, name)
+            zipfile.write(dst, name)
             if self.verbosity == 2:
                 self.stdout.write(
                     "\x1b[36m**\x1b[0m \x1b[1m{directory}{url}/{name}\x1b[0m \x1b[32mcopied\x1b[0m".format(
                         directory=directory, url=obj.pictogram.url, name=name))
 
+    def open_zip(self, name):
+        """ Opens a zip file, linked to its previous version if identical (see ZipBuilder)
+        """
+        return ZipBuilder(os.path.join(self.tmp_root, name), previous=os.path.join(self.dst_root, name))
+
     def close_zip(self, zipfile, name):
         if self.verbosity == 2:
             self.stdout.write("\x1b[36m**\x1b[0m \x1b[1m{name}\x1b[0m ...".format(name=name), ending="")
             self.stdout._out.flush()
 
-        oldzipfilename = os.path.join(self.dst_root, name)
-        zipfilename = os.path.join(self.tmp_root, name)
-        try:
-            oldzipfile = ZipFile(oldzipfilename, 'r')
-        except IOError:
-            uptodate = False
-        else:
-            old = set([(zi.filename, zi.CRC) for zi in oldzipfile.infolist()])
-            new = set([(zi.filename, zi.CRC) for zi in zipfile.infolist()])
-            uptodate = (old == new)
-            oldzipfile.close()
-
-        zipfile.close()
-        if uptodate:
-            stat = os.stat(oldzipfilename)
-            os.utime(zipfilename, (stat.st_atime, stat.st_mtime))
+        uptodate = zipfile.close()
 
         if self.verbosity == 2:
             if uptodate:
@@ -281,7 +269,7 @@ class Command(BaseCommand):
         zipname_trekid = os.path.join(url_trek, "{}.zip".format(trek.pk))
         zipfullname_trekid = os.path.join(self.tmp_root, zipname_trekid)
         self.mkdirs(zipfullname_trekid)
-        trekid_zipfile = ZipFile(zipfullname_trekid, 'w')
+        trekid_zipfile = self.open_zip(zipname_trekid)
 
         if not self.skip_tiles:
             self.sync_trek_tiles(trek, trekid_zipfile)
@@ -337,7 +325,7 @@ class Command(BaseCommand):
         zipname_settings = os.path.join('nolang', 'global.zip')
         zipfullname_settings = os.path.join(self.tmp_root, zipname_settings)
         self.mkdirs(zipfullname_settings)
-        self.zipfile_settings = ZipFile(zipfullname_settings, 'w')
+        self.zipfile_settings = self.open_zip(zipname_settings)
 
         if not self.skip_tiles:
             self.sync_global_tiles(self.zipfile_settings)
@@ -491,7 +479,7 @@ class Command(BaseCommand):
             'tiles_url': tiles_url,
             'tiles_headers': {"Referer": self.referer},
             'ignore_errors': True,
-            'tiles_dir': os.path.join(settings.VAR_DIR, 'tiles'),
+            'tiles_dir': settings.MOBILE_TILES_STORE_DIR,
         }
 
         self.tmp_root = os.path.join(os.path.dirname(self.dst_root), 'tmp_sync_mobile')
@@ -39,12 +39,16 @@ class VarTmpTestCase(TestCase):
             shutil.rmtree(os.path.join('var', 'tmp_sync_mobile'))
         if os.path.exists(os.path.join('var', 'tmp')):
             shutil.rmtree(os.path.join('var', 'tmp'))
+        if os.path.exists(settings.MOBILE_TILES_STORE_DIR):
+            shutil.rmtree(settings.MOBILE_TILES_STORE_DIR)
 
     def tearDown(self):
         if os.path.exists(os.path.join('var', 'tmp_sync_mobile')):
             shutil.rmtree(os.path.join('var', 'tmp_sync_mobile'))
         if os.path.exists(os.path.join('var', 'tmp')):
             shutil.rmtree(os.path.join('var', 'tmp'))
+        if os.path.exists(settings.MOBILE_TILES_STORE_DIR):
+            shutil.rmtree(settings.MOBILE_TILES_STORE_DIR)
 
 
 @mock.patch('landez.TilesManager.tileslist', return_value=[(9, 258, 199)])
@@ -490,6 +494,20 @@ class SyncMobileTreksTest(TranslationResetMixin, VarTmpTestCase):
             # Check inside file generated we have only one picture.
             self.assertEqual(len(trek_geojson['features'][0]['properties']['pictures']), 1)
 
+    def test_zip_unchanged(self):
+        management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
+                                skip_tiles=True, verbosity=2, stdout=StringIO())
+        zipname = os.path.join('var/tmp/nolang', '{}.zip'.format(self.trek_1.pk))
+        inode = os.stat(zipname).st_ino
+        output = StringIO()
+        management.call_command('sync_mobile', 'var/tmp', url='http://localhost:8000',
+                                skip_tiles=True, verbosity=2, stdout=output)
+        # Identical zip file is the previous one
+        self.assertEqual(os.stat(zipname).st_ino, inode)
+        self.assertIn('nolang/{}.zip\x1b[0m ...\x1b[3D\x1b[32munchanged'.format(self.trek_1.pk), output.getvalue())
+        with zipfile.ZipFile(zipname) as zfile:
+            self.assertIsNone(zfile.testzip())
+
     @mock.patch('geotrek.api.mobile.views.TrekViewSet.list')
     def test_streaminghttpresponse(self, mocke):
         output = StringIO()
@@ -8,6 +8,9 @@ from django.conf import settings
 from geotrek.api.v2 import pagination as api_pagination, filters as api_filters
 from geotrek.api.v2.serializers import override_serializer
 
+if 'geotrek.zoning' in settings.INSTALLED_APPS:
+    from geotrek.zoning.mixins import ZoningPropertiesMixin, prefetch_zoning
+
 
 class GeotrekViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,
@@ -24,6 +27,14 @@ class GeotrekViewSet(viewsets.ReadOnlyModelViewSet):
             'kwargs': self.kwargs
         }
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and 'geotrek.zoning' in settings.INSTALLED_APPS \
+                and issubclass(queryset.model, ZoningPropertiesMixin):
+            # Resolve zones of the whole page at once (see serializers get_cities())
+            prefetch_zoning(page)
+        return page
+
 
 class GeotrekGeometricViewset(GeotrekViewSet):
     filter_backends = GeotrekViewSet.filter_backends + \
@@ -1,5 +1,11 @@
+import hashlib
 import logging
+import os
 import re
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from landez import TilesManager
@@ -11,20 +17,146 @@ from geotrek.common import views
 logger = logging.getLogger(__name__)
 
 
+class TileStore(object):
+    """
+    Tiles downloaded from a source, stored in a MBTiles (SQLite) file so that
+    they are shared between zip files, processes and synchronizations.
+    Tiles older than ``MOBILE_TILES_STORE_MAX_AGE`` days are downloaded again.
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS tiles (zoom_level integer, tile_column integer, "
+                                    "tile_row integer, tile_data blob, date integer)")
+            self.connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index "
+                                    "ON tiles (zoom_level, tile_column, tile_row)")
+
+    def close(self):
+        self.connection.close()
+
+    def key(self, tile):
+        # MBTiles rows are numbered from the bottom (TMS scheme)
+        z, x, y = tile
+        return z, x, 2 ** z - 1 - y
+
+    def missing(self, tiles):
+        """
+        Return tiles among ``tiles`` which are not stored, or expired.
+        """
+        oldest = time.time() - settings.MOBILE_TILES_STORE_MAX_AGE * 24 * 3600
+        missing = []
+        for tile in tiles:
+            row = self.connection.execute("SELECT date FROM tiles "
+                                          "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                                          self.key(tile)).fetchone()
+            if row is None or row[0] < oldest:
+                missing.append(tile)
+        return missing
+
+    def get(self, tile):
+        row = self.connection.execute("SELECT tile_data FROM tiles "
+                                      "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                                      self.key(tile)).fetchone()
+        return row[0] if row else None
+
+    def put(self, tiles):
+        """
+        Store a list of (tile, data) tuples.
+        """
+        now = int(time.time())
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)",
+                                        [self.key(tile) + (data, now) for tile, data in tiles])
+
+
+class ZipBuilder(object):
+    """
+    Write a zip file, like ``zipfile.ZipFile``, with the previous version of
+    this zip file as reference:
+
+    * members are written once, the first time their name is added
+    * if the zip file is identical to the previous one, it is replaced by a
+      hard link to it on ``close()``
+    """
+    def __init__(self, filename, previous=None):
+        self.filename = filename
+        self.zipfile = zipfile.ZipFile(filename, 'w')
+        self.names = set()
+        self.previous = None
+        if previous and os.path.isfile(previous):
+            try:
+                self.previous = zipfile.ZipFile(previous, 'r')
+            except zipfile.BadZipFile:
+                pass
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def namelist(self):
+        return list(self.names)
+
+    def infolist(self):
+        return self.zipfile.infolist()
+
+    def write(self, filename, arcname):
+        if arcname in self.names:
+            return
+        self.names.add(arcname)
+        self.zipfile.write(filename, arcname)
+
+    def writestr(self, arcname, data):
+        if arcname in self.names:
+            return
+        self.names.add(arcname)
+        self.zipfile.writestr(arcname, data)
+
+    def close(self):
+        """
+        Close the zip file, and return True if it is identical to the previous one
+        """
+        new = set([(zi.filename, zi.CRC) for zi in self.zipfile.infolist()])
+        self.zipfile.close()
+        if self.previous is None:
+            return False
+        old = set([(zi.filename, zi.CRC) for zi in self.previous.infolist()])
+        self.previous.close()
+        if old != new:
+            return False
+        tmpname = '{}.{}'.format(self.filename, os.getpid())
+        os.link(self.previous.filename, tmpname)
+        os.replace(tmpname, self.filename)
+        return True
+
+
 class ZipTilesBuilder(object):
+    """
+    Download tiles concurrently (``MOBILE_TILES_WORKERS`` threads) into the tile
+    store of the source, then write them from the store into the zip file.
+    """
+    batch_size = 500
+
     def __init__(self, zipfile, prefix="", **builder_args):
         self.zipfile = zipfile
         self.prefix = prefix
+        urls = [builder_args['tiles_url']]
         builder_args['tile_format'] = self.format_from_url(builder_args['tiles_url'])
+        # Tiles are stored in the tile store instead
+        builder_args['cache'] = False
         self.tm = TilesManager(**builder_args)
 
         if not isinstance(settings.MOBILE_TILES_URL, str) and len(settings.MOBILE_TILES_URL) > 1:
             for url in settings.MOBILE_TILES_URL[1:]:
+                urls.append(url)
                 args = builder_args
                 args['tiles_url'] = url
                 args['tile_format'] = self.format_from_url(args['tiles_url'])
                 self.tm.add_layer(TilesManager(**args), opacity=1)
 
+        # One store per source (or combination of layers)
+        name = hashlib.md5(' '.join(urls).encode()).hexdigest()
+        self.store_path = os.path.join(builder_args['tiles_dir'], '{}.mbtiles'.format(name))
         self.tiles = set()
 
     def format_from_url(self, url):
@@ -41,19 +173,41 @@ class ZipTilesBuilder(object):
     def add_coverage(self, bbox, zoomlevels):
         self.tiles |= set(self.tm.tileslist(bbox, zoomlevels))
 
+    def download(self, tile):
+        try:
+            return self.tm.tile(tile)
+        except DownloadError:
+            logger.warning("Failed to download tile %s/%s/%s" % tile)
+            return None
+
+    def fetch(self, store, tiles):
+        batch = []
+        with ThreadPoolExecutor(max_workers=settings.MOBILE_TILES_WORKERS) as executor:
+            for tile, data in zip(tiles, executor.map(self.download, tiles)):
+                if data is None:
+                    continue
+                batch.append((tile, data))
+                if len(batch) >= self.batch_size:
+                    store.put(batch)
+                    batch = []
+        store.put(batch)
+
     def run(self):
-        for tile in self.tiles:
-            name = '{prefix}{0}/{1}/{2}{ext}'.format(
-                *tile,
-                prefix=self.prefix,
-                ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
-            )
-            try:
-                data = self.tm.tile(tile)
-            except DownloadError:
-                logger.warning("Failed to download tile %s" % name)
-            else:
+        store = TileStore(self.store_path)
+        try:
+            self.fetch(store, store.missing(sorted(self.tiles)))
+            for tile in sorted(self.tiles):
+                data = store.get(tile)
+                if data is None:
+                    continue
+                name = '{prefix}{0}/{1}/{2}{ext}'.format(
+                    *tile,
+                    prefix=self.prefix,
+                    ext=settings.MOBILE_TILES_EXTENSION or self.tm._tile_extension
+                )
                 self.zipfile.writestr(name, data)
+        finally:
+            store.close()
 
 
 class SyncRando:
@@ -15,6 +15,10 @@ class Command(BaseCommand):
         parser.add_argument('shapefile', nargs="?")
         parser.add_argument('-l', dest='limit', type=int, help='Limit number of lines to import')
         parser.add_argument('--encoding', '-e', default='utf8')
+        parser.add_argument('--batch-size', '-b', dest='batch_size', type=int,
+                            help='Import lines by chunks of this size, with bulk queries')
+        parser.add_argument('--full', action='store_true', default=False,
+                            help='Import all lines, even unchanged ones, with incremental parsers')
 
     def handle(self, *args, **options):
         verbosity = options['verbosity']
@@ -50,6 +54,10 @@ class Command(BaseCommand):
                     line=line, eid=eid or "", progress=int(100 * progress)))
 
         parser = Parser(progress_cb=progress_cb, encoding=encoding)
+        if options['batch_size']:
+            parser.batch_size = options['batch_size']
+        if options['full']:
+            parser.full = True
 
         try:
             parser.parse(options['shapefile'], limit=limit)
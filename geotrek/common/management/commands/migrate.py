@@ -3,6 +3,8 @@ from django.conf import settings
 from django.contrib.gis.gdal import SpatialReference
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management.commands.migrate import Command as BaseCommand
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
 
 from geotrek.common.utils.postgresql import move_models_to_schemas, load_sql_files, set_search_path
 
@@ -15,10 +17,32 @@ def check_srid_has_meter_unit():
     check_srid_has_meter_unit._checked = True
 
 
+def refresh_zoning_memberships(migrated_apps):
+    """
+    Geometries may have been changed by migrations while triggers were dropped (see
+    zoning/sql/pre_10_cleanup.sql): zoning memberships of objects of migrated apps
+    (and of their parent models) are computed again, every one if zones were migrated.
+    """
+    if not apps.is_installed('geotrek.zoning') or not migrated_apps:
+        return
+    from geotrek.zoning.models import ZoningMembership
+
+    if 'zoning' in migrated_apps:
+        ZoningMembership.refresh()
+        return
+    tables = set()
+    for model in apps.get_models():
+        if model._meta.app_label in migrated_apps:
+            tables.update(parent._meta.db_table for parent in [model] + model._meta.get_parent_list())
+    ZoningMembership.refresh(sorted(tables))
+
+
 class Command(BaseCommand):
     def handle(self, *args, **options):
         check_srid_has_meter_unit()
         set_search_path()
+        recorder = MigrationRecorder(connection)
+        applied = set(recorder.applied_migrations()) if recorder.has_table() else set()
         for app in apps.get_app_configs():
             move_models_to_schemas(app)
             load_sql_files(app, 'pre')
@@ -26,3 +50,6 @@ class Command(BaseCommand):
         for app in apps.get_app_configs():
             move_models_to_schemas(app)
             load_sql_files(app, 'post')
+        # Applied or unapplied migrations
+        migrated = applied.symmetric_difference(recorder.applied_migrations())
+        refresh_zoning_memberships({app_label for app_label, name in migrated})
@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mapentity.helpers import render_map_images
+from mapentity.settings import app_settings
+
+
+class Command(BaseCommand):
+    help = "Render stale map images of objects, used by their documents (PDF)"
+    default_models = ['trekking.Trek', 'tourism.TouristicContent', 'tourism.TouristicEvent', 'diving.Dive']
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help="Models to render (app_label.ModelName), default is {}".format(
+                                ', '.join(self.default_models)))
+        parser.add_argument('--url', '-u', dest='url', default='http://localhost',
+                            help="Root URL of Geotrek-admin, as seen by the capture server")
+        parser.add_argument('--workers', '-w', type=int, default=app_settings['MAP_CAPTURE_WORKERS'],
+                            help="Number of captures in parallel")
+
+    def get_models(self, labels):
+        if not labels:
+            labels = [label for label in self.default_models
+                      if 'geotrek.{}'.format(label.split('.')[0]) in settings.INSTALLED_APPS]
+        try:
+            return [apps.get_model(label) for label in labels]
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+
+    def handle(self, *args, **options):
+        url = options['url']
+        if not url.startswith('http://') and not url.startswith('https://'):
+            raise CommandError('url parameter should start with http:// or https://')
+        rooturl = url.rstrip('/') + '/'
+        for model in self.get_models(options['models']):
+            manager = model.objects
+            objects = manager.existing() if hasattr(manager, 'existing') else manager.all()
+            rendered = render_map_images(objects.order_by('pk'), rooturl, workers=options['workers'])
+            if options['verbosity'] > 0:
+                self.stdout.write("{} map images of {} rendered".format(rendered, model._meta.verbose_name_plural))
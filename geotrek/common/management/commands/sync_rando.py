@@ -1,23 +1,32 @@
 import argparse
+import hashlib
+import json
 import logging
 import filecmp
+import multiprocessing
 import os
 import shutil
 from time import sleep
 from zipfile import ZipFile
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.management.base import BaseCommand, CommandError
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, connections
 from django.db.models import Q
 from django.http import StreamingHttpResponse
 from django.test.client import RequestFactory
-from django.utils import translation
+from django.utils import timezone, translation
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext as _
 
 from geotrek.common.models import FileType  # NOQA
 from geotrek.altimetry.views import ElevationProfile, ElevationArea, serve_elevation_chart
 from geotrek.common import models as common_models
+from geotrek.common.utils import intersecting, uniquify
+from mapentity.helpers import render_map_images
 
 from geotrek.tourism import models as tourism_models
 from geotrek.trekking import models as trekking_models
@@ -46,6 +55,57 @@ from geotrek.tourism import urls  # NOQA
 
 logger = logging.getLogger(__name__)
 
+# Models without update date shown in synchronized files, see Command.tables_signature()
+SIGNATURE_MODELS = (
+    'zoning.City', 'zoning.District', 'zoning.RestrictedArea', 'zoning.RestrictedAreaType',
+    'common.Theme', 'common.Label', 'common.RecordSource', 'common.TargetPortal', 'common.ReservationSystem',
+    'trekking.OrderedTrekChild', 'trekking.TrekRelationship', 'trekking.TrekNetwork',
+    'trekking.Practice', 'trekking.Accessibility', 'trekking.Route', 'trekking.DifficultyLevel',
+    'trekking.WebLink', 'trekking.WebLinkCategory', 'trekking.POIType', 'trekking.ServiceType',
+    'tourism.InformationDesk', 'tourism.InformationDeskType',
+    'signage.SignageType', 'infrastructure.InfrastructureType',
+    'sensitivity.Species', 'sensitivity.SportPractice',
+)
+
+
+class ZipEntries:
+    """
+    Files to add to a zip file. Work units (see ``Command.run_units()``) may run
+    in other processes, so they record entries of the shared zip file instead
+    of writing it.
+    """
+    def __init__(self):
+        self.entries = []
+
+    def namelist(self):
+        return [arcname for filename, arcname in self.entries]
+
+    def write(self, filename, arcname):
+        self.entries.append((filename, arcname))
+
+
+# Command and function of running work units, inherited by forked processes
+units_worker = None
+
+
+def run_unit(unit):
+    command, function = units_worker
+    zipfile, successfull, written = command.zipfile, command.successfull, command.written
+    command.zipfile = ZipEntries()
+    command.successfull = True
+    command.written = []
+    try:
+        dependencies = function(unit) or []
+        record = {
+            'entries': command.zipfile.entries,
+            'files': uniquify(command.written),
+            'dependencies': dependencies,
+        }
+        return unit, command.successfull, record
+    finally:
+        command.stdout._out.flush()
+        command.zipfile, command.successfull, command.written = zipfile, successfull, written
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -75,12 +135,212 @@ class Command(BaseCommand):
                             default=False, help='include infrastructures')
         parser.add_argument('--with-dives', action='store_true', dest='with_dives',
                             default=False, help='include dives')
+        parser.add_argument('--jobs', '-j', dest='jobs', type=int, default=1,
+                            help='Number of processes syncing treks')
+        parser.add_argument('--resume', action='store_true', dest='resume', default=False,
+                            help='Resume an interrupted synchronization, and keep progress if this one fails')
+        parser.add_argument('--incremental', action='store_true', dest='incremental', default=False,
+                            help='Only sync treks modified since previous synchronization')
         parser.add_argument('--task', default=None, help=argparse.SUPPRESS)
 
     def mkdirs(self, name):
-        dirname = os.path.dirname(name)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+
+    def link(self, src, dst):
+        """ Hard links src to dst atomically, as the same file may be written by several processes.
+        """
+        tmpname = '{}.{}'.format(dst, os.getpid())
+        os.link(src, tmpname)
+        os.replace(tmpname, dst)
+
+    def run_units(self, name, units, function):
+        """ Calls function(unit) for each unit (a trek pk), in a pool of processes if --jobs is greater than 1.
+
+        Function returns dependencies of the unit (see get_dirty_treks()). Files added by units to the current global
+        zip file are written by this process. Successful units are recorded in the progress file, so that they are
+        skipped when an interrupted synchronization is resumed. With --incremental, files of clean units are
+        linked from previous synchronization instead.
+        """
+        global units_worker
+        todo = []
+        for unit in units:
+            record = self.completed.get((name, unit))
+            if record is None and self.previous is not None and unit not in self.dirty_treks:
+                record = self.reuse_unit(name, unit)
+                if record is not None:
+                    self.complete_unit(name, unit, True, record)
+                    continue
+            if record is None:
+                todo.append(unit)
+            else:
+                self.write_entries(record['entries'])
+                self.manifest_units.setdefault(name, {})[str(unit)] = record
+        if not todo:
+            return
+        units_worker = (self, function)
+        try:
+            if self.jobs > 1:
+                # Forked processes must open their own database connection
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(self.jobs) as pool:
+                    for result in pool.imap_unordered(run_unit, todo):
+                        self.complete_unit(name, *result)
+            else:
+                for unit in todo:
+                    self.complete_unit(name, *run_unit(unit))
+        finally:
+            units_worker = None
+
+    def complete_unit(self, name, unit, successfull, record):
+        self.write_entries(record['entries'])
+        if not successfull:
+            self.successfull = False
+            return
+        self.manifest_units.setdefault(name, {})[str(unit)] = record
+        with open(self.progress_path, 'a') as f:
+            f.write(json.dumps([name, unit, record]) + '\n')
+
+    def reuse_unit(self, name, unit):
+        """ Links files of a unit from previous synchronization, returns its record, or None if some are missing.
+        """
+        record = self.previous['units'].get(name, {}).get(str(unit))
+        if record is None:
+            return None
+        if not all([os.path.isfile(os.path.join(self.dst_root, filename)) for filename in record['files']]):
+            return None
+        for filename in record['files']:
+            dst = os.path.join(self.tmp_root, filename)
+            if not os.path.exists(dst):
+                self.mkdirs(dst)
+                self.link(os.path.join(self.dst_root, filename), dst)
+        if self.verbosity == 2:
+            self.stdout.write("{name} {unit} unchanged".format(name=name, unit=unit))
+        return record
+
+    def write_entries(self, entries):
+        if self.zipfile is None or not entries:
+            return
+        names = set(self.zipfile.namelist())
+        for filename, arcname in entries:
+            if arcname not in names:
+                self.zipfile.write(filename, arcname)
+                names.add(arcname)
+
+    def progress_header(self):
+        return json.dumps({'signature': self.signature()}) + '\n'
+
+    def load_progress(self):
+        """ Loads units completed by an interrupted synchronization, unless it was run with other options
+        """
+        with open(self.progress_path, 'r') as f:
+            lines = f.readlines()
+        if not lines or lines[0] != self.progress_header():
+            if self.verbosity >= 1:
+                self.stdout.write("Interrupted synchronization was run with other options, starting over")
+            shutil.rmtree(self.tmp_root)
+            os.mkdir(self.tmp_root)
+            return
+        for line in lines[1:]:
+            try:
+                name, unit, record = json.loads(line)
+            except ValueError:
+                continue  # Interrupted while writing this line
+            self.completed[(name, unit)] = record
+
+    def signature(self):
+        """ Options changing synchronized files, a new signature requiring a full synchronization
+        """
+        keys = ('url', 'rando_url', 'source', 'portal', 'skip_pdf', 'skip_tiles', 'skip_dem', 'skip_profile_png',
+                'languages', 'with_events', 'content_categories', 'with_signages', 'with_infrastructures',
+                'with_dives')
+        values = [self.options.get(key) for key in keys] + [self.builder_args['tiles_url']]
+        return hashlib.md5(json.dumps(values).encode()).hexdigest()
+
+    def tables_signature(self):
+        """ Zones and lookup tables shown in trek files have no update date,
+        any modification requires a full synchronization
+        """
+        signatures = []
+        with connection.cursor() as cursor:
+            for name in SIGNATURE_MODELS:
+                try:
+                    model = apps.get_model(name)
+                except LookupError:
+                    continue  # Application not installed
+                tables = [model._meta.db_table] + [field.remote_field.through._meta.db_table
+                                                   for field in model._meta.local_many_to_many]
+                for table in tables:
+                    cursor.execute("SELECT md5(string_agg(md5(z::text), '' ORDER BY md5(z::text))) "
+                                   "FROM {} AS z".format(table))
+                    signatures.append(cursor.fetchone()[0] or '')
+        return hashlib.md5(''.join(signatures).encode()).hexdigest()
+
+    def load_manifest(self):
+        """ Returns the manifest of previous synchronization, if it can be used for an incremental one
+        """
+        try:
+            with open(os.path.join(self.dst_root, 'manifest.json'), 'r') as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if manifest.get('signature') != self.signature() or manifest.get('tables') != self.tables:
+            return None
+        manifest['date'] = parse_datetime(manifest['date'])
+        return manifest
+
+    def write_manifest(self):
+        manifest = {
+            'date': self.started.isoformat(),
+            'signature': self.signature(),
+            'tables': self.tables,
+            'units': self.manifest_units,
+        }
+        with open(os.path.join(self.tmp_root, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+    def get_dirty_treks(self):
+        """ Pks of treks modified since previous synchronization, or showing objects modified since then
+        """
+        since = self.previous['date']
+        treks = trekking_models.Trek.objects.existing()
+        dirty = set(trekking_models.Trek.objects.filter(date_update__gt=since).values_list('pk', flat=True))
+        changed = set()
+        models = [trekking_models.POI, trekking_models.Service]
+        if 'geotrek.tourism' in settings.INSTALLED_APPS:
+            models += [tourism_models.TouristicContent, tourism_models.TouristicEvent]
+        if self.with_signages and 'geotrek.signage' in settings.INSTALLED_APPS:
+            models.append(apps.get_model('signage.Signage'))
+        if self.with_infrastructures and 'geotrek.infrastructure' in settings.INSTALLED_APPS:
+            models.append(apps.get_model('infrastructure.Infrastructure'))
+        if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+            models.append(apps.get_model('sensitivity.SensitiveArea'))
+        for model in models:
+            for obj in model.objects.filter(date_update__gt=since):
+                changed.add('{}:{}'.format(model._meta.model_name, obj.pk))
+                dirty.update(intersecting(treks, obj).values_list('pk', flat=True))
+        trek_type = ContentType.objects.get_for_model(trekking_models.Trek)
+        attachments = common_models.Attachment.objects.filter(date_update__gt=since)
+        for pk, content_type, object_id in attachments.values_list('pk', 'content_type', 'object_id'):
+            changed.add('attachment:{}'.format(pk))
+            if content_type == trek_type.pk:
+                dirty.add(object_id)
+        # Deleted attachments
+        previous = set()
+        for records in self.previous['units'].values():
+            for record in records.values():
+                previous.update([key for key in record['dependencies'] if key.startswith('attachment:')])
+        existing = common_models.Attachment.objects.filter(pk__in=[int(key.split(':')[1]) for key in previous])
+        changed.update(previous - set(['attachment:{}'.format(pk) for pk in existing.values_list('pk', flat=True)]))
+        # Objects removed from treks
+        for records in self.previous['units'].values():
+            for unit, record in records.items():
+                if changed.intersection(record['dependencies']):
+                    dirty.add(int(unit))
+        # Parents and children treks show each other
+        for parent, child in trekking_models.OrderedTrekChild.objects.filter(
+                Q(parent__in=dirty) | Q(child__in=dirty)).values_list('parent', 'child'):
+            dirty.update([parent, child])
+        return dirty
 
     def get_params_portal(self, params):
         if self.portal:
@@ -169,7 +429,9 @@ class Command(BaseCommand):
             if self.verbosity > 0:
                 self.stderr.write(self.style.ERROR("failed (HTTP {code})".format(code=response.status_code)))
             return
-        f = open(fullname, 'wb')
+        # Written under another name, then renamed, as the same file may be written by several processes
+        tmpname = '{}.{}'.format(fullname, os.getpid())
+        f = open(tmpname, 'wb')
         if isinstance(response, StreamingHttpResponse):
             content = b''.join(response.streaming_content)
         else:
@@ -182,14 +444,16 @@ class Command(BaseCommand):
         f.close()
         oldfilename = os.path.join(self.dst_root, name)
         # If new file is identical to old one, don't recreate it. This will help backup
-        if os.path.isfile(oldfilename) and filecmp.cmp(fullname, oldfilename):
-            os.unlink(fullname)
-            os.link(oldfilename, fullname)
+        if os.path.isfile(oldfilename) and filecmp.cmp(tmpname, oldfilename):
+            os.unlink(tmpname)
+            self.link(oldfilename, fullname)
             if self.verbosity == 2:
                 self.stdout.write("unchanged")
         else:
+            os.replace(tmpname, fullname)
             if self.verbosity == 2:
                 self.stdout.write("generated")
+        self.written.append(name)
         # FixMe: Find why there are duplicate files.
         if zipfile:
             if name not in zipfile.namelist():
@@ -257,7 +521,8 @@ class Command(BaseCommand):
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{url}/{name}\x1b[0m \x1b[31mfile does not exist\x1b[0m".format(lang=lang, url=url, name=name))
             return
         if not os.path.isfile(dst):
-            os.link(src, dst)
+            self.link(src, dst)
+        self.written.append(os.path.join(url, name))
         if zipfile:
             zipfile.write(dst, os.path.join(url, name))
         if self.verbosity == 2:
@@ -289,6 +554,7 @@ class Command(BaseCommand):
             oldzipfile.close()
 
         zipfile.close()
+        self.written.append(name)
         if uptodate:
             stat = os.stat(oldzipfilename)
             os.utime(zipfilename, (stat.st_atime, stat.st_mtime))
@@ -333,9 +599,9 @@ class Command(BaseCommand):
             if self.portal:
                 treks = treks.filter(Q(portal__name=self.portal) | Q(portal=None))
 
-            for trek in treks:
-                if trek.any_published or any([parent.any_published for parent in trek.parents]):
-                    self.sync_trek_tiles(trek)
+            pks = [trek.pk for trek in treks
+                   if trek.any_published or any([parent.any_published for parent in trek.parents])]
+            self.run_units('tiles', pks, lambda pk: self.sync_trek_tiles(trekking_models.Trek.objects.get(pk=pk)))
 
             if self.celery_task:
                 self.celery_task.update_state(
@@ -362,7 +628,8 @@ class Command(BaseCommand):
             src = os.path.join(settings.MEDIA_ROOT, path)
             dst = os.path.join(self.tmp_root, 'api', lang, '{modelname}s'.format(modelname=modelname), str(obj.pk), obj.slug + '.pdf')
             self.mkdirs(dst)
-            os.link(src, dst)
+            self.link(src, dst)
+            self.written.append(os.path.relpath(dst, self.tmp_root))
             if self.verbosity == 2:
                 self.stdout.write("\x1b[36m{lang}\x1b[0m \x1b[1m{dst}\x1b[0m \x1b[32mcopied\x1b[0m".format(lang=lang, dst=dst))
         elif settings.ONLY_EXTERNAL_PUBLIC_PDF:
@@ -374,6 +641,17 @@ class Command(BaseCommand):
             self.get_params_portal(params)
             self.sync_object_view(lang, obj, view, '{obj.slug}.pdf', params=params, slug=obj.slug)
 
+    def prepare_map_images(self, objects):
+        """
+        Render stale map images of objects in batch, before their PDF are synced one by one
+        """
+        if self.skip_pdf or settings.ONLY_EXTERNAL_PUBLIC_PDF:
+            return
+        rooturl = '{scheme}://{host}/'.format(scheme='https' if self.secure else 'http', host=self.host)
+        rendered = render_map_images(objects, rooturl)
+        if self.verbosity == 2 and rendered:
+            self.stdout.write("{count} map images rendered".format(count=rendered))
+
     def sync(self):
         step_value = int(50 / len(settings.MODELTRANSLATION_LANGUAGES))
         current_value = 30
@@ -429,7 +707,7 @@ class Command(BaseCommand):
         if not os.path.exists(self.dst_root):
             return
         existing = set([os.path.basename(p) for p in os.listdir(self.dst_root)])
-        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip'))
+        remaining = existing - set(('api', 'media', 'meta', 'static', 'zip', 'manifest.json'))
         if remaining:
             raise CommandError("Destination directory contains extra data")
 
@@ -444,7 +722,9 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.options = options
+        self.started = timezone.now()
         self.successfull = True
+        self.written = []
         self.verbosity = options['verbosity']
         self.dst_root = options["path"].rstrip('/')
         self.check_dst_root_is_empty()
@@ -482,6 +762,8 @@ class Command(BaseCommand):
         self.with_infrastructures = options.get('with_infrastructures', False)
         self.with_dives = options.get('with_dives', False)
         self.celery_task = options.get('task', None)
+        self.jobs = options.get('jobs') or 1
+        self.zipfile = None
 
         if self.source is not None:
             self.source = self.source.split(',')
@@ -495,19 +777,34 @@ class Command(BaseCommand):
             'tiles_url': tiles_url,
             'tiles_headers': {"Referer": self.referer},
             'ignore_errors': True,
-            'tiles_dir': os.path.join(settings.VAR_DIR, 'tiles'),
+            'tiles_dir': settings.MOBILE_TILES_STORE_DIR,
         }
         self.tmp_root = os.path.join(os.path.dirname(self.dst_root), 'tmp_sync_rando')
+        self.progress_path = os.path.join(self.tmp_root, 'progress.json')
+        self.completed = {}
         try:
             os.mkdir(self.tmp_root)
         except OSError as e:
             if e.errno != 17:
                 raise
-            raise CommandError(
-                "The {}/ directory already exists. Please check no other sync_rando command is already running."
-                " If not, please delete this directory.".format(self.tmp_root)
-            )
+            if not (options.get('resume') and os.path.isfile(self.progress_path)):
+                raise CommandError(
+                    "The {}/ directory already exists. Please check no other sync_rando command is already running."
+                    " If not, please resume the synchronization with --resume option,"
+                    " or delete this directory.".format(self.tmp_root)
+                )
+            self.load_progress()
+        if not os.path.isfile(self.progress_path):
+            with open(self.progress_path, 'w') as f:
+                f.write(self.progress_header())
+        self.manifest_units = {}
+        self.previous = None
         try:
+            self.tables = self.tables_signature()
+            if options.get('incremental'):
+                self.previous = self.load_manifest()
+            if self.previous is not None:
+                self.dirty_treks = self.get_dirty_treks()
             self.sync()
             if self.celery_task:
                 self.celery_task.update_state(
@@ -519,11 +816,14 @@ class Command(BaseCommand):
                         'infos': "{}".format(_("Sync ended"))
                     }
                 )
-
         except Exception:
-            shutil.rmtree(self.tmp_root)
+            # With --resume, completed units are kept in tmp_root, to be skipped by next synchronization
+            if not options.get('resume'):
+                shutil.rmtree(self.tmp_root)
             raise
 
+        self.write_manifest()
+        os.remove(self.progress_path)
         self.rename_root()
 
         done_message = 'Done'
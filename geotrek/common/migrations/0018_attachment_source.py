@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0017_auto_20210121_0943'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='source_etag',
+            field=models.CharField(blank=True, default='', editable=False, max_length=256),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='source_last_modified',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
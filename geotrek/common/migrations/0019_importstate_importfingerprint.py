@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0018_attachment_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parser', models.CharField(max_length=256, unique=True, verbose_name='Parser')),
+                ('signature', models.CharField(blank=True, default='', max_length=32, verbose_name='Configuration signature')),
+                ('high_water_mark', models.CharField(blank=True, default='', max_length=64, verbose_name='Last modification')),
+                ('date_update', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+            ],
+            options={
+                'verbose_name': 'Import state',
+                'verbose_name_plural': 'Import states',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parser', models.CharField(max_length=256, verbose_name='Parser')),
+                ('eid', models.CharField(max_length=1024, verbose_name='External id')),
+                ('fingerprint', models.CharField(max_length=32, verbose_name='Fingerprint')),
+            ],
+            options={
+                'verbose_name': 'Import fingerprint',
+                'verbose_name_plural': 'Import fingerprints',
+                'unique_together': {('parser', 'eid')},
+            },
+        ),
+    ]
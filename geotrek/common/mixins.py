@@ -1,3 +1,4 @@
+from collections import defaultdict
 from io import BytesIO
 import os
 import logging
@@ -8,6 +9,7 @@ import hashlib
 from pdfimpose import PageList
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db.models import Manager as DefaultManager
 from django.db import models, transaction
 from django.db.models import Q
@@ -21,6 +23,7 @@ from easy_thumbnails.exceptions import InvalidImageFormatError
 from easy_thumbnails.files import get_thumbnailer
 from easy_thumbnails.alias import aliases
 from embed_video.backends import detect_backend, VideoDoesntExistException
+from paperclip.settings import get_attachment_model
 from PIL.Image import DecompressionBombError
 
 from geotrek.common.utils import classproperty
@@ -107,6 +110,24 @@ class PicturesMixin(object):
     def pictures(self, values):
         self._pictures = values
 
+    @classmethod
+    def prefetch_pictures(cls, objects):
+        """
+        Fetch pictures of many objects with a single query, so that their
+        ``pictures`` and ``thumbnail`` are then read without any query.
+        """
+        pictures = defaultdict(list)
+        attachments = get_attachment_model().objects.filter(
+            content_type=ContentType.objects.get_for_model(cls),
+            object_id__in=[obj.pk for obj in objects],
+            is_image=True,
+        ).exclude(title='mapimage').order_by('-starred', 'attachment_file')
+        for attachment in attachments:
+            pictures[attachment.object_id].append(attachment)
+        for obj in objects:
+            obj.pictures = pictures[obj.pk]
+        return objects
+
     @property
     def serializable_pictures(self):
         serialized = []
@@ -368,7 +389,7 @@ class PublishableMixin(BasePublishableMixin):
     def has_geom_valid(self):
         return self.geom is not None
 
-    def prepare_map_image(self, rooturl):
+    def prepare_map_image(self, rooturl, queue=True):
         """
         We override the default behaviour of map image preparation :
         if the object has a attached picture file with *title* ``mapimage``, we use it
@@ -381,8 +402,8 @@ class PublishableMixin(BasePublishableMixin):
             src = os.path.join(settings.MEDIA_ROOT, attached.name)
             dst = self.get_map_image_path()
             shutil.copyfile(src, dst)
-        else:
-            super(PublishableMixin, self).prepare_map_image(rooturl)
+            return True
+        return super(PublishableMixin, self).prepare_map_image(rooturl, queue=queue)
 
     def is_public(self):
         return self.any_published
@@ -49,6 +49,10 @@ class FileType(StructureOrNoneRelated, BaseFileType):
 class Attachment(BaseAttachment):
 
     creation_date = models.DateField(verbose_name=_("Creation Date"), null=True, blank=True)
+    # Validators and hash of imported files, to download them again only if changed
+    source_etag = models.CharField(max_length=256, blank=True, default="", editable=False)
+    source_last_modified = models.CharField(max_length=64, blank=True, default="", editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
 
 
 class Theme(PictogramMixin):
@@ -155,3 +159,30 @@ class Label(OptionalPictogramMixin):
 
     def __str__(self):
         return self.name
+
+
+class ImportState(models.Model):
+    """ State of incremental imports (see ``Parser.incremental``) """
+    parser = models.CharField(verbose_name=_("Parser"), max_length=256, unique=True)
+    signature = models.CharField(verbose_name=_("Configuration signature"), max_length=32, blank=True, default="")
+    high_water_mark = models.CharField(verbose_name=_("Last modification"), max_length=64, blank=True, default="")
+    date_update = models.DateTimeField(verbose_name=_("Update date"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Import state")
+        verbose_name_plural = _("Import states")
+
+    def __str__(self):
+        return self.parser
+
+
+class ImportFingerprint(models.Model):
+    """ Fingerprint of the source row of an imported object """
+    parser = models.CharField(verbose_name=_("Parser"), max_length=256)
+    eid = models.CharField(verbose_name=_("External id"), max_length=1024)
+    fingerprint = models.CharField(verbose_name=_("Fingerprint"), max_length=32)
+
+    class Meta:
+        verbose_name = _("Import fingerprint")
+        verbose_name_plural = _("Import fingerprints")
+        unique_together = (('parser', 'eid'), )
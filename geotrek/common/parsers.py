@@ -1,34 +1,42 @@
 import os
 import re
+import json
+import hashlib
 import requests
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 import textwrap
 import xlrd
 import xml.etree.ElementTree as ET
 from functools import reduce
-from collections import Iterable
+from collections import Iterable, defaultdict, deque
+from itertools import islice
 from time import sleep
 
 from ftplib import FTP
 from os.path import dirname
 from urllib.parse import urlparse
 
-from django.db import models, connection
+from django.db import models, connection, transaction
 from django.db.utils import DatabaseError
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.gdal import DataSource, GDALException, CoordTransform
 from django.contrib.gis.geos import Point
 from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
 from django.utils import translation
 from django.utils.translation import gettext as _
-from django.utils.encoding import force_str
+from django.utils.encoding import force_bytes, force_str
 from django.conf import settings
 from paperclip.models import attachment_upload
 
 from geotrek.authent.models import default_structure
-from geotrek.common.models import FileType, Attachment
+from geotrek.common.models import FileType, Attachment, ImportState, ImportFingerprint
 
 if 'modeltranslation' in settings.INSTALLED_APPS:
     from modeltranslation.fields import TranslationField
@@ -77,6 +85,23 @@ class Parser(object):
     non_fields = {}
     natural_keys = {}
     field_options = {}
+    # Number of rows imported together (see parse_chunk()), None to import rows one by one
+    batch_size = None
+    # Write objects with bulk_create/bulk_update in batch mode, None to do it only
+    # if the model does not override save() (which would then be skipped)
+    bulk_save = None
+    # Maximum number of connections kept open per host
+    http_pool_size = 10
+    # Number of pages of paginated sources fetched concurrently (see paginate())
+    page_workers = 4
+    # Skip rows which did not change since last import (requires eid)
+    incremental = False
+    # Ignore state of previous imports in incremental mode (rows are still fingerprinted)
+    full = False
+    # Source field of rows modification date, used as a high-water mark by sources
+    # which are able to return only modified rows (see modification_filter)
+    modification_field = None
+    modification_filter = None
 
     def __init__(self, progress_cb=None, user=None, encoding='utf8'):
         self.warnings = {}
@@ -89,6 +114,17 @@ class Parser(object):
         self.user = user
         self.structure = user and user.profile.structure or default_structure()
         self.encoding = encoding
+        self.lookups = None
+        self.prefetched = None
+        self.pending = None
+        self.pending_eids = set()
+        self.fingerprints = None
+        self.since = None
+        self.limited = False
+        # Pages and attachments are fetched by several threads, each one with its own session
+        # (sessions are not thread-safe), sharing the connections pool of the adapter
+        self.http_adapter = HTTPAdapter(pool_maxsize=self.http_pool_size)
+        self.local = threading.local()
 
         try:
             mto = translator.get_options_for_model(self.model)
@@ -260,10 +296,20 @@ class Parser(object):
         except RowImportError as warnings:
             self.add_warning(str(warnings))
             return
+        if self.pending is not None:
+            # Saved with the whole chunk (see flush())
+            self.pending.append((self.line, row, self.obj, operation, update_fields, self.eid_val))
+            if operation == "created":
+                self.pending_eids.add(self.eid_val)
+            return
         if operation == "created":
             self.obj.save()
         else:
             self.obj.save(update_fields=update_fields)
+        self.parse_related(row, operation, update_fields)
+
+    def parse_related(self, row, operation, update_fields):
+        """Parse fields which require a saved object, and count it"""
         update_fields += self.parse_fields(row, self.m2m_fields)
         update_fields += self.parse_fields(row, self.m2m_constant_fields)
         update_fields += self.parse_fields(row, self.non_fields, non_field=True)
@@ -290,6 +336,15 @@ class Parser(object):
         self.eid_val = eid_val
         return {self.eid: eid_val}
 
+    def get_objects(self, eid_kwargs):
+        if self.prefetched is None:
+            return self.model.objects.filter(**eid_kwargs)
+        eid_val = eid_kwargs[self.eid]
+        if eid_val in self.pending_eids:
+            # Created by a previous row of the chunk
+            self.flush()
+        return list(self.prefetched.get(eid_val, []))
+
     def parse_row(self, row):
         self.eid_val = None
         self.line += 1
@@ -302,7 +357,9 @@ class Parser(object):
             except RowImportError as warnings:
                 self.add_warning(str(warnings))
                 return
-            objects = self.model.objects.filter(**eid_kwargs)
+            if self.skip_unchanged(row):
+                return
+            objects = self.get_objects(eid_kwargs)
         if len(objects) == 0 and self.update_only:
             if self.warn_on_missing_objects:
                 self.add_warning(_("Bad value '{eid_val}' for field '{eid_src}'. No object with this identifier").format(eid_val=self.eid_val, eid_src=self.eid_src))
@@ -329,6 +386,9 @@ class Parser(object):
         for self.obj in objects:
             self.parse_obj(row, operation)
             self.to_delete.discard(self.obj.pk)
+            if operation == "created" and self.prefetched is not None and self.obj.pk is not None:
+                # Saved without bulk queries, available for next rows of the chunk
+                self.prefetched.setdefault(self.eid_val, []).append(self.obj)
         self.nb_success += 1  # FIXME
         if self.progress_cb:
             self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
@@ -345,6 +405,32 @@ class Parser(object):
         }
         return render_to_string('common/parser_report.{output_format}'.format(output_format=output_format), context)
 
+    def lookup(self, model, fields, create=False):
+        """
+        Return a (object or None, created) tuple for natural key ``fields``. In
+        batch mode, results are cached for the whole parser run (a cached miss
+        is not used if ``create`` is True).
+        """
+        key = None
+        if self.lookups is not None:
+            try:
+                key = (model, tuple(sorted(fields.items())))
+                if key in self.lookups and (self.lookups[key] is not None or not create):
+                    return self.lookups[key], False
+            except TypeError:  # Unhashable value
+                key = None
+        created = False
+        if create:
+            obj, created = model.objects.get_or_create(**fields)
+        else:
+            try:
+                obj = model.objects.get(**fields)
+            except model.DoesNotExist:
+                obj = None
+        if key is not None:
+            self.lookups[key] = obj
+        return obj, created
+
     def get_mapping(self, src, val, mapping, partial):
         if partial:
             found = False
@@ -371,16 +457,12 @@ class Parser(object):
         fields = {field: val}
         if fk:
             fields[fk] = getattr(self.obj, fk)
-        if create:
-            val, created = model.objects.get_or_create(**fields)
-            if created:
-                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=val))
-            return val
-        try:
-            return model.objects.get(**fields)
-        except model.DoesNotExist:
+        obj, created = self.lookup(model, fields, create)
+        if created:
+            self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=obj))
+        elif obj is None:
             self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=val))
-            return None
+        return obj
 
     def filter_m2m(self, src, val, model, field, mapping=None, partial=False, create=False, fk=None, **kwargs):
         if not val:
@@ -396,17 +478,13 @@ class Parser(object):
             fields = {field: subval}
             if fk:
                 fields[fk] = getattr(self.obj, fk)
-            if create:
-                subval, created = model.objects.get_or_create(**fields)
-                if created:
-                    self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=subval))
-                dst.append(subval)
-                continue
-            try:
-                dst.append(model.objects.get(**fields))
-            except model.DoesNotExist:
+            obj, created = self.lookup(model, fields, create)
+            if created:
+                self.add_warning(_("{model} '{val}' did not exist in Geotrek-Admin and was automatically created").format(model=model._meta.verbose_name.title(), val=obj))
+            elif obj is None:
                 self.add_warning(_("{model} '{val}' does not exists in Geotrek-Admin. Please add it").format(model=model._meta.verbose_name.title(), val=subval))
                 continue
+            dst.append(obj)
         return dst
 
     def get_to_delete_kwargs(self):
@@ -441,10 +519,101 @@ class Parser(object):
             self.to_delete = set()
         else:
             self.to_delete = set(self.model.objects.filter(**kwargs).values_list('pk', flat=True))
+        if self.incremental and self.eid is not None:
+            self.start_incremental()
 
     def end(self):
         if self.delete:
             self.model.objects.filter(pk__in=self.to_delete).delete()
+        if self.fingerprints is not None:
+            self.end_incremental()
+
+    @property
+    def state_key(self):
+        return '{}.{}'.format(self.__class__.__module__, self.__class__.__name__)
+
+    @property
+    def signature(self):
+        """Hash of parser configuration: rows are parsed again if it changes"""
+        config = (self.model._meta.label, self.eid, self.fields, self.m2m_fields, self.constant_fields,
+                  self.m2m_constant_fields, self.non_fields, self.natural_keys, self.field_options)
+        return hashlib.md5(repr(config).encode()).hexdigest()
+
+    def row_fingerprint(self, row):
+        content = json.dumps(row, sort_keys=True, default=str)
+        return hashlib.md5((self.state_signature + content).encode()).hexdigest()
+
+    def get_modification(self, row):
+        if not self.modification_field:
+            return None
+        try:
+            val = self.get_val(row, None, self.normalize_src(self.modification_field))
+        except ValueImportError:
+            return None
+        return str(val) if val else None
+
+    def start_incremental(self):
+        self.state, created = ImportState.objects.get_or_create(parser=self.state_key)
+        self.state_signature = self.signature
+        if self.full or self.state.signature != self.state_signature:
+            self.fingerprints = {}
+        else:
+            self.fingerprints = dict(ImportFingerprint.objects.filter(parser=self.state_key)
+                                     .values_list('eid', 'fingerprint'))
+            if self.modification_filter and self.state.high_water_mark:
+                self.since = self.state.high_water_mark
+                # Source returns modified objects only, others must not be deleted
+                self.delete = False
+        self.existing = defaultdict(list)
+        for eid, pk in self.model.objects.values_list(self.eid, 'pk'):
+            self.existing[str(eid)].append(pk)
+        self.seen = []
+
+    def skip_unchanged(self, row):
+        """In incremental mode, returns True if the row did not change since last import"""
+        if self.fingerprints is None:
+            return False
+        eid = str(self.eid_val)
+        fingerprint = self.row_fingerprint(row)
+        self.seen.append((self.line, eid, fingerprint, self.get_modification(row)))
+        if self.fingerprints.get(eid) != fingerprint or not self.existing.get(eid):
+            return False
+        self.to_delete.difference_update(self.existing[eid])
+        self.nb_unmodified += len(self.existing[eid])
+        self.nb_success += 1
+        if self.progress_cb:
+            self.progress_cb(float(self.line) / self.nb, self.line, self.eid_val)
+        return True
+
+    def end_incremental(self):
+        """
+        Store fingerprints of imported rows and the new high-water mark. Rows
+        with warnings are not fingerprinted, and the mark is kept before the
+        oldest of them, so that they are imported again next time.
+        """
+        failed = [_("Line {line}".format(line=line)) in self.warnings for line, eid, fingerprint, modification in self.seen]
+        fingerprints = {}
+        for (line, eid, fingerprint, modification), warned in zip(self.seen, failed):
+            if not warned and self.fingerprints.get(eid) != fingerprint:
+                fingerprints[eid] = fingerprint
+        with transaction.atomic():
+            eids = list(fingerprints.keys())
+            for i in range(0, len(eids), 1000):
+                ImportFingerprint.objects.filter(parser=self.state_key, eid__in=eids[i:i + 1000]).delete()
+            ImportFingerprint.objects.bulk_create([
+                ImportFingerprint(parser=self.state_key, eid=eid, fingerprint=fingerprint)
+                for eid, fingerprint in fingerprints.items()
+            ], batch_size=1000)
+            oldest_failed = min([modification for (line, eid, fingerprint, modification), warned in zip(self.seen, failed)
+                                 if warned and modification] or [None])
+            modifications = [modification for (line, eid, fingerprint, modification), warned in zip(self.seen, failed)
+                             if not warned and modification and (oldest_failed is None or modification < oldest_failed)]
+            if self.state.high_water_mark:
+                modifications.append(self.state.high_water_mark)
+            if not self.limited:
+                self.state.high_water_mark = max(modifications or [""])
+            self.state.signature = self.state_signature
+            self.state.save()
 
     def parse(self, filename=None, limit=None):
         if filename:
@@ -453,10 +622,25 @@ class Parser(object):
             raise GlobalImportError(_("Filename is required"))
         if self.filename and not os.path.exists(self.filename):
             raise GlobalImportError(_("File does not exists at: {filename}").format(filename=self.filename))
+        self.limited = bool(limit)
         self.start()
-        for i, row in enumerate(self.next_row()):
-            if limit and i >= limit:
-                break
+        rows = self.next_row()
+        if limit:
+            rows = islice(rows, limit)
+        if self.batch_size:
+            self.lookups = {}
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                self.parse_chunk(chunk)
+            self.lookups = None
+        else:
+            self.parse_rows(rows)
+        self.end()
+
+    def parse_rows(self, rows):
+        for row in rows:
             try:
                 self.parse_row(row)
             except DatabaseError as e:
@@ -470,19 +654,143 @@ class Parser(object):
                 if settings.DEBUG:
                     raise
                 self.add_warning(str(e))
-        self.end()
+
+    def can_bulk_save(self):
+        if self.bulk_save is not None:
+            return self.bulk_save
+        # Multi-table inheritance is not supported by bulk_create()
+        return self.model.save is models.Model.save and not self.model._meta.parents
+
+    def row_eid(self, row):
+        """Return eid value of row, or None if it can't be found (warned when the row is parsed)"""
+        if self.eid is None:
+            return None
+        try:
+            return self.get_eid_kwargs(row)[self.eid]
+        except (ValueImportError, RowImportError):
+            return None
+
+    def prefetch(self, rows):
+        """Fetch data needed by all rows of a chunk, before they are parsed"""
+        if self.eid is not None:
+            self.prefetch_objects(rows)
+
+    def prefetch_objects(self, rows):
+        """Fetch existing objects of all rows with a single query"""
+        eid_vals = set([self.row_eid(row) for row in rows]) - set([None])
+        queryset = self.model.objects.filter(**{'{}__in'.format(self.eid): eid_vals})
+        if 'structure' in [field.name for field in self.model._meta.fields]:
+            queryset = queryset.select_related('structure')
+        for obj in queryset:
+            self.prefetched.setdefault(getattr(obj, self.eid), []).append(obj)
+
+    def flush(self):
+        """Write pending objects of the chunk, then parse their related fields"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        created = [obj for line, row, obj, operation, update_fields, eid_val in pending if operation == "created"]
+        self.model.objects.bulk_create(created, batch_size=self.batch_size)
+        updated = {}
+        for line, row, obj, operation, update_fields, eid_val in pending:
+            if operation == "created":
+                self.prefetched.setdefault(eid_val, []).append(obj)
+                self.pending_eids.discard(eid_val)
+            elif update_fields:
+                updated.setdefault(tuple(sorted(set(update_fields))), []).append(obj)
+        # bulk_update() does not call pre_save(), auto_now fields (date_update) are set here
+        auto_now = [field for field in self.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        for update_fields, objs in updated.items():
+            for field in auto_now:
+                for obj in objs:
+                    field.pre_save(obj, add=False)
+            update_fields = list(update_fields) + [field.name for field in auto_now if field.name not in update_fields]
+            self.model.objects.bulk_update(objs, update_fields, batch_size=self.batch_size)
+        line, obj = self.line, getattr(self, 'obj', None)
+        for self.line, row, self.obj, operation, update_fields, eid_val in pending:
+            self.parse_related(row, operation, update_fields)
+        self.line, self.obj = line, obj
+
+    def parse_chunk(self, rows):
+        """
+        Import rows with a single query to fetch existing objects, in a single
+        transaction. Objects are written with bulk queries if possible (see
+        can_bulk_save()). If a database error occurs, rows are imported again
+        one by one, to get a warning for the faulty row only.
+        """
+        state = (self.line, self.nb_success, self.nb_created, self.nb_updated, self.nb_unmodified,
+                 set(self.to_delete), {key: list(val) for key, val in self.warnings.items()})
+        seen = len(getattr(self, 'seen', []))
+        try:
+            with transaction.atomic():
+                self.prefetched = {}
+                self.pending_eids = set()
+                self.prefetch(rows)
+                self.pending = [] if self.can_bulk_save() else None
+                for row in rows:
+                    try:
+                        self.parse_row(row)
+                    except (ValueImportError, RowImportError) as e:
+                        self.add_warning(str(e))
+                self.flush()
+        except DatabaseError:
+            if settings.DEBUG:
+                raise
+            (self.line, self.nb_success, self.nb_created, self.nb_updated, self.nb_unmodified,
+             self.to_delete, self.warnings) = state
+            if self.fingerprints is not None:
+                del self.seen[seen:]
+            # Objects fetched or created in the rolled back transaction are not valid anymore
+            self.lookups = {}
+            self.prefetched = self.pending = None
+            self.parse_rows(rows)
+        finally:
+            self.prefetched = self.pending = None
+
+    def paginate(self, fetch_page, get_count, page_size, start=0):
+        """
+        Yield pages of a paginated source, in order. The first page is fetched
+        alone, to know the total number of items (``get_count(page)``), then the
+        next ones are fetched concurrently, ``page_workers`` pages ahead at most.
+        ``fetch_page(skip)`` returns the page starting at item ``skip``.
+        """
+        page = fetch_page(start)
+        skips = iter(range(start + page_size, get_count(page), page_size))
+        executor = ThreadPoolExecutor(max_workers=self.page_workers)
+        futures = deque([executor.submit(fetch_page, skip) for skip in islice(skips, self.page_workers)])
+        try:
+            yield page
+            while futures:
+                page = futures.popleft().result()
+                for skip in islice(skips, 1):
+                    futures.append(executor.submit(fetch_page, skip))
+                yield page
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @property
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.mount('http://', self.http_adapter)
+            session.mount('https://', self.http_adapter)
+        return session
 
     def request_or_retry(self, url, verb='get', **kwargs):
         try_get = settings.PARSER_NUMBER_OF_TRIES
         assert try_get > 0
         while try_get:
-            action = getattr(requests, verb)
+            action = getattr(self.session, verb)
             response = action(url, allow_redirects=True, **kwargs)
             if response.status_code in settings.PARSER_RETRY_HTTP_STATUS:
                 logger.info("Failed to fetch url {}. Retrying ...".format(url))
                 sleep(settings.PARSER_RETRY_SLEEP_TIME)
                 try_get -= 1
-            elif response.status_code == 200:
+            elif response.status_code in (requests.codes.ok, requests.codes.not_modified):
+                # Not modified is only returned to conditional requests
                 return response
             else:
                 break
@@ -558,6 +866,8 @@ class AttachmentParserMixin(object):
     base_url = ''
     delete_attachments = True
     filetype_name = "Photographie"
+    # Number of attachments downloaded concurrently in batch mode (see Parser.batch_size)
+    download_workers = 8
     non_fields = {
         'attachments': _("Attachments"),
     }
@@ -575,6 +885,117 @@ class AttachmentParserMixin(object):
                 raise GlobalImportError(_("FileType '{name}' does not exists in "
                                           "Geotrek-Admin. Please add it").format(name=self.filetype_name))
         self.creator, created = get_user_model().objects.get_or_create(username='import', defaults={'is_active': False})
+        self.downloads = {}
+        self.fetched = {}
+        self.object_attachments = {}
+
+    def prefetch(self, rows):
+        """
+        Start downloads of all attachments of rows, in a pool of threads. Existing
+        attachments are checked with a conditional request if their validators
+        are known, or a HEAD request otherwise (see has_changed()).
+        """
+        super(AttachmentParserMixin, self).prefetch(rows)
+        self.downloads = {}
+        self.fetched = {}
+        self.object_attachments = {}
+        if 'attachments' not in self.non_fields:
+            return
+        objects = [obj for objs in self.prefetched.values() for obj in objs]
+        if objects:
+            for obj in objects:
+                self.object_attachments[obj.pk] = []
+            attachments = Attachment.objects.filter(content_type=ContentType.objects.get_for_model(self.model),
+                                                    object_id__in=list(self.object_attachments.keys()))
+            for attachment in attachments:
+                self.object_attachments[attachment.object_id].append(attachment)
+        keys = []
+        # Warnings of rows are added when they are parsed
+        warnings, self.warnings = self.warnings, {}
+        try:
+            for row in rows:
+                existing = [attachment
+                            for obj in self.prefetched.get(self.row_eid(row), [])
+                            for attachment in self.object_attachments[obj.pk]]
+                for url in self.row_attachments_urls(row):
+                    if urlparse(url).scheme not in ('http', 'https') or not self.download_attachments:
+                        continue
+                    name = self.attachment_name(url)
+                    matching = [attachment for attachment in existing if self.has_same_name(attachment, name)]
+                    if not matching:
+                        keys.append(('get', url, '', ''))
+                    for attachment in matching:
+                        if attachment.source_etag or attachment.source_last_modified:
+                            keys.append(('get', url, attachment.source_etag, attachment.source_last_modified))
+                        else:
+                            keys.append(('head', url, '', ''))
+        finally:
+            self.warnings = warnings
+        if not keys:
+            return
+        executor = ThreadPoolExecutor(max_workers=self.download_workers)
+        for key in keys:
+            if key not in self.downloads:
+                verb, url, etag, last_modified = key
+                self.downloads[key] = executor.submit(self.request_or_retry, url, verb=verb,
+                                                      **self.conditional_kwargs(etag, last_modified))
+        # Rows are parsed while downloads go on
+        executor.shutdown(wait=False)
+
+    def row_attachments_urls(self, row):
+        src = self.normalize_src(self.non_fields['attachments'])
+        try:
+            val = self.get_val(row, 'attachments', src)
+            return [self.base_url + attachment[0] for attachment in self.filter_attachments(src, val)]
+        except Exception:
+            return []  # Warned when the row is parsed
+
+    def conditional_kwargs(self, etag, last_modified):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return {'headers': headers} if headers else {}
+
+    def response_validators(self, response):
+        validators = [response.headers.get('ETag'), response.headers.get('Last-Modified')]
+        return [value if isinstance(value, str) else "" for value in validators]
+
+    def fetch(self, url, verb='get', etag='', last_modified=''):
+        """Return response of an attachment request, prefetched if possible"""
+        future = self.downloads.get((verb, url, etag, last_modified))
+        try:
+            if future is not None:
+                return future.result()
+            return self.request_or_retry(url, verb=verb, **self.conditional_kwargs(etag, last_modified))
+        except DownloadImportError as e:
+            raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+
+    def attachment_name(self, url):
+        basename, ext = os.path.splitext(os.path.basename(url))
+        return '%s%s' % (basename[:128], ext)
+
+    def has_same_name(self, attachment, name):
+        upload_name, ext = os.path.splitext(attachment_upload(attachment, name))
+        existing_name = attachment.attachment_file.name
+        return re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(
+            name=upload_name, ext=ext), existing_name
+        ) is not None
+
+    def has_changed(self, url, attachment):
+        if not attachment.source_etag and not attachment.source_last_modified:
+            return self.has_size_changed(url, attachment)
+        response = self.fetch(url, etag=attachment.source_etag, last_modified=attachment.source_last_modified)
+        if response.status_code == requests.codes.not_modified:
+            return False
+        if hashlib.md5(force_bytes(response.content)).hexdigest() != attachment.content_hash:
+            # Downloaded content is used for the new attachment
+            self.fetched[url] = response
+            return True
+        attachment.source_etag, attachment.source_last_modified = self.response_validators(response)
+        attachment.save()
+        return False
 
     def filter_attachments(self, src, val):
         if not val:
@@ -593,58 +1014,61 @@ class AttachmentParserMixin(object):
             return size != attachment.attachment_file.size
 
         if parsed_url.scheme == 'http' or parsed_url.scheme == 'https':
-            try:
-                response = self.request_or_retry(url, verb='head')
-            except DownloadImportError as e:
-                raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+            response = self.fetch(url, verb='head')
             size = response.headers.get('content-length')
             return size is not None and int(size) != attachment.attachment_file.size
 
         return True
 
     def download_attachment(self, url):
+        download = self.download_attachment_with_validators(url)
+        return download and download[0]
+
+    def download_attachment_with_validators(self, url):
+        """Return a (content, etag, last modified) tuple, or None if not downloaded"""
         parsed_url = urlparse(url)
         if parsed_url.scheme == 'ftp':
             try:
                 response = self.request_or_retry(url)
             except DownloadImportError as e:
                 raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
-            return response.read()
+            return response.read(), "", ""
         else:
             if self.download_attachments:
-                try:
-                    response = self.request_or_retry(url)
-                except DownloadImportError as e:
-                    raise ValueImportError('Failed to load attachment: {exc}'.format(exc=e))
+                response = self.fetched.pop(url, None)
+                if response is None:
+                    response = self.fetch(url)
                 if response.status_code != requests.codes.ok:
                     self.add_warning(_("Failed to download '{url}'").format(url=url))
                     return None
-                return response.content
+                return (response.content, ) + tuple(self.response_validators(response))
             return None
 
+    def update_attachment(self, attachment, legend, author):
+        """Returns True if modified"""
+        if author != attachment.author or legend != attachment.legend:
+            attachment.author = author
+            attachment.legend = textwrap.shorten(legend, width=127)
+            attachment.save()
+            return True
+        return False
+
     def save_attachments(self, src, val):
         updated = False
-        attachments_to_delete = list(Attachment.objects.attachments_for_object(self.obj))
+        attachments_to_delete = self.object_attachments.pop(self.obj.pk, None)
+        if attachments_to_delete is None:
+            attachments_to_delete = list(Attachment.objects.attachments_for_object(self.obj))
         for url, legend, author in self.filter_attachments(src, val):
             url = self.base_url + url
             legend = legend or ""
             author = author or ""
-            basename, ext = os.path.splitext(os.path.basename(url))
-            name = '%s%s' % (basename[:128], ext)
+            name = self.attachment_name(url)
             found = False
             for attachment in attachments_to_delete:
-                upload_name, ext = os.path.splitext(attachment_upload(attachment, name))
-                existing_name = attachment.attachment_file.name
-                if re.search(r"^{name}(_[a-zA-Z0-9]{{7}})?{ext}$".format(
-                        name=upload_name, ext=ext), existing_name
-                ) and not self.has_size_changed(url, attachment):
+                if self.has_same_name(attachment, name) and not self.has_changed(url, attachment):
                     found = True
                     attachments_to_delete.remove(attachment)
-                    if author != attachment.author or legend != attachment.legend:
-                        attachment.author = author
-                        attachment.legend = textwrap.shorten(legend, width=127)
-                        attachment.save()
-                        updated = True
+                    updated = self.update_attachment(attachment, legend, author) or updated
                     break
             if found:
                 continue
@@ -659,8 +1083,16 @@ class AttachmentParserMixin(object):
             attachment.legend = textwrap.shorten(legend, width=127)
 
             if (parsed_url.scheme in ('http', 'https') and self.download_attachments) or parsed_url.scheme == 'ftp':
-                content = self.download_attachment(url)
-                if content is None:
+                download = self.download_attachment_with_validators(url)
+                if download is None:
+                    continue
+                content, attachment.source_etag, attachment.source_last_modified = download
+                attachment.content_hash = hashlib.md5(force_bytes(content)).hexdigest()
+                # Same file at another url (renamed)
+                identical = [other for other in attachments_to_delete if other.content_hash == attachment.content_hash]
+                if identical:
+                    attachments_to_delete.remove(identical[0])
+                    updated = self.update_attachment(identical[0], legend, author) or updated
                     continue
                 f = ContentFile(content)
                 attachment.attachment_file.save(name, f, save=False)
@@ -679,6 +1111,8 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
     version_tourinsoft = 2
     separator = '#'
     separator2 = '|'
+    modification_field = 'Updated'
+    modification_filter = "Updated gt datetime'{since}'"
 
     @property
     def items(self):
@@ -686,28 +1120,39 @@ class TourInSoftParser(AttachmentParserMixin, Parser):
             return self.root['value']
         return self.root['d']['results']
 
-    def get_nb(self):
+    def get_nb(self, root=None):
+        root = self.root if root is None else root
         if self.version_tourinsoft == 3:
-            return int(self.root['odata.count'])
-        return int(self.root['d']['__count'])
+            return int(root['odata.count'])
+        return int(root['d']['__count'])
+
+    def fetch_page(self, skip):
+        params = {
+            '$format': 'json',
+            '$inlinecount': 'allpages',
+            '$top': 1000,
+            '$skip': skip,
+        }
+        if self.since:
+            # OData filter on modification date (see modification_filter)
+            params['$filter'] = self.modification_filter.format(since=self.since)
+        response = self.request_or_retry(self.url, params=params)
+        return response.json()
+
+    def get_modification(self, row):
+        """OData dates (``/Date(<milliseconds>)/``) are converted to ISO format, usable in filters"""
+        modification = super().get_modification(row)
+        match = modification and re.match(r'^/Date\((-?\d+)([+-]\d{4})?\)/$', modification)
+        if match:
+            date = datetime.utcfromtimestamp(int(match.group(1)) / 1000)
+            return date.strftime('%Y-%m-%dT%H:%M:%S')
+        return modification
 
     def next_row(self):
-        skip = 0
-        while True:
-            params = {
-                '$format': 'json',
-                '$inlinecount': 'allpages',
-                '$top': 1000,
-                '$skip': skip,
-            }
-            response = self.request_or_retry(self.url, params=params)
-            self.root = response.json()
+        for self.root in self.paginate(self.fetch_page, self.get_nb, 1000):
             self.nb = self.get_nb()
             for row in self.items:
                 yield {self.normalize_field_name(src): val for src, val in row.items()}
-            skip += 1000
-            if skip >= self.nb:
-                return
 
     def filter_attachments(self, src, val):
         if not val:
@@ -795,22 +1240,23 @@ class TourismSystemParser(AttachmentParserMixin, Parser):
     def items(self):
         return self.root['data']
 
+    def fetch_page(self, skip, size=1000, auth=None):
+        params = {
+            'size': size,
+            'start': skip,
+        }
+        response = self.request_or_retry(self.url, params=params, auth=auth)
+        return response.json()
+
     def next_row(self):
         size = 1000
-        skip = 0
-        while True:
-            params = {
-                'size': size,
-                'start': skip,
-            }
-            response = self.request_or_retry(self.url, params=params, authent=HTTPBasicAuth(self.login, self.password))
-            self.root = response.json()
+        auth = HTTPBasicAuth(self.login, self.password)
+        pages = self.paginate(lambda skip: self.fetch_page(skip, size, auth),
+                              lambda root: int(root['metadata']['total']), size)
+        for self.root in pages:
             self.nb = int(self.root['metadata']['total'])
             for row in self.items:
                 yield {self.normalize_field_name(src): val for src, val in row.items()}
-            skip += size
-            if skip >= self.nb:
-                return
 
     def filter_attachments(self, src, val):
         result = []
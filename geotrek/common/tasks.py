@@ -6,10 +6,13 @@ import os
 from os.path import join
 import sys
 from celery import Task, shared_task, current_task
+from django.apps import apps
 from django.contrib.auth.models import User
 from django.core.management import call_command
 from django.conf import settings
-from django.utils.translation import gettext_lazy as _
+from django.utils.translation import gettext_lazy as _, get_language, override
+
+from mapentity.helpers import render_map_images
 
 
 class GeotrekImportTask(Task):
@@ -171,3 +174,24 @@ def launch_sync_rando(*args, **kwargs):
     return {
         'name': current_task.name,
     }
+
+
+@shared_task(name='geotrek.common.render-map-images')
+def launch_render_map_images(model_label, pks, rooturl, language=None):
+    """
+    celery shared task - render stale map images of objects
+    """
+    model = apps.get_model(model_label)
+    with override(language):
+        rendered = render_map_images(model.objects.filter(pk__in=pks), rooturl)
+    return {
+        'name': current_task.name,
+        'rendered': rendered,
+    }
+
+
+def queue_map_image(obj, rooturl):
+    """
+    Render map image of obj in background (MAPENTITY_CONFIG['MAP_CAPTURE_QUEUE'])
+    """
+    launch_render_map_images.delay(obj._meta.label, [obj.pk], rooturl, get_language())
@@ -1,23 +1,32 @@
+import hashlib
+import json
 import os
+import threading
+from datetime import timedelta
 from unittest import mock
 from shutil import rmtree
 from tempfile import mkdtemp
 from io import StringIO
 from requests import Response
 import urllib
+from urllib.parse import parse_qs, urlparse
 
 from django.test import TestCase
+from django.utils import timezone
 from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from django.test.utils import override_settings
 from django.template.exceptions import TemplateDoesNotExist
 
+from mapentity.tests import StubServerMixin
+
 from geotrek.authent.factories import StructureFactory
 from geotrek.trekking.models import Trek
-from geotrek.common.models import Organism, FileType, Attachment
+from geotrek.flatpages.models import FlatPage
+from geotrek.common.models import Organism, FileType, Attachment, ImportState, ImportFingerprint
 from geotrek.common.parsers import (
-    ExcelParser, AttachmentParserMixin, TourInSoftParser, ValueImportError, DownloadImportError,
+    Parser, ExcelParser, AttachmentParserMixin, TourInSoftParser, ValueImportError, DownloadImportError,
     TourismSystemParser, OpenSystemParser,
 )
 
@@ -33,6 +42,45 @@ class OrganismEidParser(ExcelParser):
     eid = 'organism'
 
 
+class OrganismEidBatchParser(OrganismEidParser):
+    batch_size = 10
+
+
+class OrganismIncrementalParser(OrganismEidParser):
+    incremental = True
+
+
+class OrganismRowsParser(Parser):
+    model = Organism
+    url = 'http://test.url.com/organisms'
+    fields = {'organism': 'name'}
+    eid = 'organism'
+    incremental = True
+    modification_field = 'date'
+    modification_filter = "date gt '{since}'"
+    rows = []
+
+    def next_row(self):
+        self.nb = len(self.rows)
+        for row in self.rows:
+            yield row
+
+
+class FlatPageBatchParser(Parser):
+    model = FlatPage
+    url = 'http://test.url.com/flatpages'
+    fields = {'external_url': 'url', 'order': 'order'}
+    eid = 'external_url'
+    batch_size = 10
+    bulk_save = True
+    rows = []
+
+    def next_row(self):
+        self.nb = len(self.rows)
+        for row in self.rows:
+            yield row
+
+
 class AttachmentParser(AttachmentParserMixin, OrganismEidParser):
     non_fields = {'attachments': 'photo'}
 
@@ -44,6 +92,10 @@ class AttachmentLegendParser(AttachmentParser):
         return [(url, legend, author)]
 
 
+class AttachmentBatchParser(AttachmentParser):
+    batch_size = 10
+
+
 class ParserTests(TestCase):
     def test_bad_parser_class(self):
         with self.assertRaisesRegex(CommandError, "Failed to import parser class 'DoesNotExist'"):
@@ -101,6 +153,72 @@ class ParserTests(TestCase):
         self.assertEqual(organisms[0].organism, "Comité Théodule")
         self.assertEqual(organisms[1].organism, "Comité Hippolyte")
 
+    def test_batch_unmodified_with_eid(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        parser = OrganismEidBatchParser()
+        parser.parse(filename)
+        self.assertEqual(parser.nb_created, 1)
+        parser = OrganismEidBatchParser()
+        parser.parse(filename)
+        self.assertEqual(parser.nb_created, 0)
+        self.assertEqual(parser.nb_unmodified, 1)
+        self.assertEqual(Organism.objects.count(), 1)
+
+    def test_batch_updated_with_eid(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        filename2 = os.path.join(os.path.dirname(__file__), 'data', 'organism2.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidParser', filename, verbosity=0)
+        parser = OrganismEidBatchParser()
+        parser.parse(filename2)
+        self.assertEqual(parser.nb_success, parser.line)
+        self.assertEqual(parser.nb_created + parser.nb_updated + parser.nb_unmodified, parser.line)
+        self.assertEqual(Organism.objects.count(), 2)
+        organisms = Organism.objects.order_by('pk')
+        self.assertEqual(organisms[0].organism, "Comité Théodule")
+        self.assertEqual(organisms[1].organism, "Comité Hippolyte")
+
+    def test_batch_size_option(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.OrganismEidParser', filename, batch_size=100, verbosity=0)
+        self.assertEqual(Organism.objects.count(), 1)
+
+    def test_batch_updated_date_update(self):
+        FlatPageBatchParser.rows = [{'URL': 'http://example.com', 'ORDER': 1}]
+        FlatPageBatchParser().parse()
+        FlatPage.objects.update(date_update=timezone.now() - timedelta(days=1))
+        date_update = FlatPage.objects.get().date_update
+        FlatPageBatchParser.rows = [{'URL': 'http://example.com', 'ORDER': 2}]
+        parser = FlatPageBatchParser()
+        parser.parse()
+        self.assertEqual(parser.nb_updated, 1)
+        flatpage = FlatPage.objects.get()
+        self.assertEqual(flatpage.order, 2)
+        self.assertGreater(flatpage.date_update, date_update)
+
+    def test_batch_lookups_are_cached(self):
+        FileType.objects.create(type="Photographie")
+        parser = OrganismEidBatchParser()
+        parser.lookups = {}
+        with self.assertNumQueries(1):
+            for i in range(3):
+                filetype, created = parser.lookup(FileType, {'type': "Photographie"})
+                self.assertEqual(filetype.type, "Photographie")
+                self.assertFalse(created)
+        with self.assertNumQueries(1):
+            for i in range(3):
+                self.assertEqual(parser.lookup(FileType, {'type': "Missing"}), (None, False))
+
+    def test_batch_lookup_creates_after_cached_miss(self):
+        parser = OrganismEidBatchParser()
+        parser.lookups = {}
+        self.assertEqual(parser.lookup(FileType, {'type': "Missing"}), (None, False))
+        filetype, created = parser.lookup(FileType, {'type': "Missing"}, create=True)
+        self.assertTrue(created)
+        self.assertEqual(filetype.type, "Missing")
+        with self.assertNumQueries(0):
+            self.assertEqual(parser.lookup(FileType, {'type': "Missing"}), (filetype, False))
+            self.assertEqual(parser.lookup(FileType, {'type': "Missing"}, create=True), (filetype, False))
+
     def test_report_format_text(self):
         parser = OrganismParser()
         self.assertRegex(parser.report(), '0/0 lines imported.')
@@ -126,7 +244,7 @@ class AttachmentParserTests(TestCase):
         if os.path.exists(settings.MEDIA_ROOT):
             rmtree(settings.MEDIA_ROOT)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -139,7 +257,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_long_name(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -153,7 +271,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_long_legend(self, mocked):
         mocked.return_value.status_code = 200
         mocked.return_value.content = ''
@@ -167,7 +285,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype, self.filetype)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_with_other_filetype_with_structure(self, mocked):
         """
         It will always take the one without structure first
@@ -186,7 +304,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(attachment.filetype.structure, None)
         self.assertTrue(os.path.exists(attachment.attachment_file.path), True)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment_with_no_filetype_photographie(self, mocked):
         self.filetype.delete()
         mocked.return_value.status_code = 200
@@ -195,8 +313,8 @@ class AttachmentParserTests(TestCase):
         with self.assertRaisesRegex(CommandError, "FileType 'Photographie' does not exists in Geotrek-Admin. Please add it"):
             call_command('import', 'geotrek.common.tests.test_parsers.AttachmentParser', filename, verbosity=0)
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_not_updated(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
@@ -209,8 +327,8 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(Attachment.objects.count(), 1)
 
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_request_fail(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
@@ -222,8 +340,8 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(mocked_head.call_count, 3)
         self.assertEqual(Attachment.objects.count(), 1)
 
-    @mock.patch('requests.get')
-    @mock.patch('requests.head')
+    @mock.patch('requests.Session.get')
+    @mock.patch('requests.Session.head')
     def test_attachment_request_except(self, mocked_head, mocked_get):
         mocked_get.return_value.status_code = 200
         mocked_get.return_value.content = ''
@@ -235,7 +353,7 @@ class AttachmentParserTests(TestCase):
         self.assertEqual(mocked_head.call_count, 1)
         self.assertEqual(Attachment.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @mock.patch('geotrek.common.parsers.urlparse')
     def test_attachment_download_fail(self, mocked_urlparse, mocked_get):
         filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
@@ -246,6 +364,62 @@ class AttachmentParserTests(TestCase):
 
         self.assertEqual(mocked_get.call_count, 1)
 
+    @mock.patch('requests.Session.get')
+    def test_attachment_batch_downloaded_with_validators(self, mocked):
+        mocked.return_value.status_code = 200
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Mar 2021 10:00:00 GMT'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        self.assertEqual(attachment.source_etag, '"abc"')
+        self.assertEqual(attachment.source_last_modified, 'Mon, 01 Mar 2021 10:00:00 GMT')
+        self.assertEqual(attachment.content_hash, hashlib.md5(b'Fake image').hexdigest())
+
+    @mock.patch('requests.Session.get')
+    def test_attachment_batch_not_modified(self, mocked):
+        mocked.return_value.status_code = 200
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {'ETag': '"abc"'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        mocked.return_value.status_code = 304
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual(mocked.call_args[1]['headers'], {'If-None-Match': '"abc"'})
+        self.assertEqual(Attachment.objects.get(), attachment)
+
+    @mock.patch('requests.Session.get')
+    def test_attachment_batch_same_content(self, mocked):
+        mocked.return_value.status_code = 200
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {'ETag': '"abc"'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        mocked.return_value.headers = {'ETag': '"def"'}
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual(Attachment.objects.get(), attachment)
+        self.assertEqual(Attachment.objects.get().source_etag, '"def"')
+
+    @mock.patch('requests.Session.get')
+    def test_attachment_batch_modified(self, mocked):
+        mocked.return_value.status_code = 200
+        mocked.return_value.content = b'Fake image'
+        mocked.return_value.headers = {'ETag': '"abc"'}
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        attachment = Attachment.objects.get()
+        mocked.return_value.content = b'Other image'
+        mocked.return_value.headers = {'ETag': '"def"'}
+        call_command('import', 'geotrek.common.tests.test_parsers.AttachmentBatchParser', filename, verbosity=0)
+        # Content of conditional request is used, without downloading it again
+        self.assertEqual(mocked.call_count, 2)
+        self.assertNotEqual(Attachment.objects.get(), attachment)
+        self.assertEqual(Attachment.objects.get().content_hash, hashlib.md5(b'Other image').hexdigest())
+
 
 class TourInSoftParserTests(TestCase):
 
@@ -277,9 +451,133 @@ class TourInSoftParserTests(TestCase):
             parser.filter_contact('', ('Mél|chateau.senonches@gmail.Com#Instagram|#chateaudesenonches', ''))
 
 
+class IncrementalParserTests(TestCase):
+    def test_unchanged_rows_are_skipped(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        parser = OrganismIncrementalParser()
+        parser.parse(filename)
+        self.assertEqual(parser.nb_created, 1)
+        self.assertEqual(ImportFingerprint.objects.count(), 1)
+        with mock.patch.object(Organism, 'save') as mocked_save:
+            parser = OrganismIncrementalParser()
+            parser.parse(filename)
+            self.assertEqual(mocked_save.call_count, 0)
+            self.assertEqual(parser.nb_unmodified, 1)
+            self.assertEqual(parser.nb_success, 1)
+            # Full import parses it again
+            parser = OrganismIncrementalParser()
+            parser.full = True
+            parser.parse(filename)
+            self.assertEqual(mocked_save.call_count, 1)
+            self.assertEqual(parser.nb_unmodified, 1)
+
+    def test_deleted_objects_are_imported_again(self):
+        filename = os.path.join(os.path.dirname(__file__), 'data', 'organism.xls')
+        OrganismIncrementalParser().parse(filename)
+        Organism.objects.all().delete()
+        parser = OrganismIncrementalParser()
+        parser.parse(filename)
+        self.assertEqual(parser.nb_created, 1)
+        self.assertEqual(Organism.objects.count(), 1)
+
+    def test_high_water_mark(self):
+        OrganismRowsParser.rows = [
+            {'NAME': 'A', 'DATE': '2021-01-02'},
+            {'NAME': 'B', 'DATE': '2021-01-04'},
+        ]
+        parser = OrganismRowsParser()
+        parser.parse()
+        self.assertIsNone(parser.since)
+        self.assertEqual(ImportState.objects.get().high_water_mark, '2021-01-04')
+        parser = OrganismRowsParser()
+        parser.delete = True
+        parser.parse()
+        self.assertEqual(parser.since, '2021-01-04')
+        self.assertFalse(parser.delete)
+        self.assertEqual(parser.nb_unmodified, 2)
+
+    def test_high_water_mark_before_failed_rows(self):
+        OrganismRowsParser.rows = [
+            {'NAME': 'A', 'DATE': '2021-01-02'},
+            {'NAME': None, 'DATE': '2021-01-03'},
+            {'NAME': 'C', 'DATE': '2021-01-04'},
+        ]
+        parser = OrganismRowsParser()
+        parser.parse()
+        self.assertEqual(len(parser.warnings), 1)
+        self.assertEqual(ImportState.objects.get().high_water_mark, '2021-01-02')
+        self.assertEqual(ImportFingerprint.objects.count(), 2)
+
+
+class PaginatedParserTests(StubServerMixin, TestCase):
+    count = 2500
+
+    def skip(self, path):
+        return int(parse_qs(urlparse(path).query)['$skip'][0])
+
+    def stub_response(self, path):
+        """Serve 2500 items as TourInSoft pages, with a 503 error on first request of second page"""
+        skip = self.skip(path)
+        if skip == 1000 and [self.skip(request) for request in self.stub_requests].count(skip) == 1:
+            return 503, None, b''
+        results = [{'Id': str(i), 'Updated': '/Date(1609459200000)/'} for i in range(skip, min(skip + 1000, self.count))]
+        return 200, 'application/json', json.dumps({'d': {'results': results, '__count': self.count}}).encode()
+
+    @override_settings(PARSER_RETRY_SLEEP_TIME=0)
+    def test_pages_fetched_concurrently_in_order(self):
+        class TestTourParser(TourInSoftParser):
+            url = self.stub_url + '/'
+
+            def __init__(self):
+                self.model = Trek
+                super(TestTourParser, self).__init__()
+
+        parser = TestTourParser()
+        rows = list(parser.next_row())
+        self.assertEqual([row['ID'] for row in rows], [str(i) for i in range(2500)])
+        self.assertEqual(parser.nb, 2500)
+        # First page alone, then the 2 other ones, with a retry of the second page
+        skips = [self.skip(path) for path in self.stub_requests]
+        self.assertEqual(skips[0], 0)
+        self.assertEqual(sorted(skips), [0, 1000, 1000, 2000])
+
+    def test_modified_since_high_water_mark(self):
+        class TestTourParser(TourInSoftParser):
+            url = self.stub_url + '/'
+
+            def __init__(self):
+                self.model = Trek
+                super(TestTourParser, self).__init__()
+
+        parser = TestTourParser()
+        row = next(parser.next_row())
+        self.assertEqual(parser.get_modification(row), '2021-01-01T00:00:00')
+        self.assertNotIn('$filter', parse_qs(urlparse(self.stub_requests[0]).query))
+        parser.since = '2021-01-01T00:00:00'
+        parser.fetch_page(0)
+        self.assertEqual(parse_qs(urlparse(self.stub_requests[-1]).query)['$filter'],
+                         ["Updated gt datetime'2021-01-01T00:00:00'"])
+
+    def test_session_per_thread(self):
+        parser = OrganismParser()
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(parser.session))
+        thread.start()
+        thread.join()
+        self.assertIs(parser.session, parser.session)
+        self.assertIsNot(parser.session, sessions[0])
+        # Connections are pooled by the same adapter
+        self.assertIs(parser.session.get_adapter(self.stub_url), sessions[0].get_adapter(self.stub_url))
+
+    def test_paginate_stops_after_last_page(self):
+        parser = OrganismParser()
+        pages = parser.paginate(lambda skip: list(range(skip, min(skip + 10, 25))), lambda page: 25, 10)
+        self.assertEqual(list(pages), [list(range(0, 10)), list(range(10, 20)), list(range(20, 25))])
+
+
 class TourismSystemParserTest(TestCase):
     @mock.patch('geotrek.common.parsers.HTTPBasicAuth')
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked_get, mocked_auth):
         class TestTourismSystemParser(TourismSystemParser):
             def __init__(self):
@@ -306,7 +604,7 @@ class TourismSystemParserTest(TestCase):
 
 
 class OpenSystemParserTest(TestCase):
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_attachment(self, mocked_get):
         class TestOpenSystemParser(OpenSystemParser):
             def __init__(self):
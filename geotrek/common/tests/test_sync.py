@@ -8,13 +8,16 @@ from io import StringIO
 import zipfile
 
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.gis.geos import LineString
 from django.core import management
 from django.core.management.base import CommandError
 from django.http import HttpResponse, StreamingHttpResponse
 from django.test.utils import override_settings
 
+from mapentity.tests import StubServerMixin
+
+from geotrek.common.helpers_sync import ZipBuilder, ZipTilesBuilder
 from geotrek.common.factories import FileTypeFactory, RecordSourceFactory, TargetPortalFactory, AttachmentFactory, ThemeFactory
 from geotrek.common.utils.testdata import get_dummy_uploaded_image
 from geotrek.core.factories import PathFactory
@@ -26,18 +29,118 @@ from geotrek.trekking.factories import TrekFactory, TrekWithPublishedPOIsFactory
 from geotrek.trekking import models as trekking_models
 
 
-class VarTmpTestCase(TestCase):
+class VarTmpMixin:
     def setUp(self):
-        if os.path.exists(os.path.join('var', 'tmp_sync_rando')):
-            shutil.rmtree(os.path.join('var', 'tmp_sync_rando'))
-        if os.path.exists(os.path.join('var', 'tmp')):
-            shutil.rmtree(os.path.join('var', 'tmp'))
+        super().setUp()
+        self.remove_var_tmp()
 
     def tearDown(self):
+        self.remove_var_tmp()
+        super().tearDown()
+
+    def remove_var_tmp(self):
         if os.path.exists(os.path.join('var', 'tmp_sync_rando')):
             shutil.rmtree(os.path.join('var', 'tmp_sync_rando'))
         if os.path.exists(os.path.join('var', 'tmp')):
             shutil.rmtree(os.path.join('var', 'tmp'))
+        if os.path.exists(settings.MOBILE_TILES_STORE_DIR):
+            shutil.rmtree(settings.MOBILE_TILES_STORE_DIR)
+
+
+class VarTmpTestCase(VarTmpMixin, TestCase):
+    pass
+
+
+class ZipBuilderTest(VarTmpTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join('var', 'tmp'))
+        self.source = os.path.join('var', 'tmp', 'source.txt')
+        with open(self.source, 'w') as f:
+            f.write('content' * 100)
+        self.previous = os.path.join('var', 'tmp', 'previous.zip')
+        builder = ZipBuilder(self.previous)
+        builder.write(self.source, 'a.txt')
+        builder.writestr('b.txt', 'other')
+        self.assertFalse(builder.close())
+
+    def test_names_written_once(self):
+        builder = ZipBuilder(os.path.join('var', 'tmp', 'new.zip'))
+        builder.write(self.source, 'a.txt')
+        builder.write(self.source, 'a.txt')
+        builder.writestr('a.txt', 'other')
+        self.assertIn('a.txt', builder)
+        builder.close()
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'new.zip')) as zfile:
+            self.assertEqual(zfile.namelist(), ['a.txt'])
+
+    def test_unchanged_zip_is_linked(self):
+        builder = ZipBuilder(os.path.join('var', 'tmp', 'new.zip'), previous=self.previous)
+        builder.write(self.source, 'a.txt')
+        builder.writestr('b.txt', 'other')
+        self.assertTrue(builder.close())
+        self.assertEqual(os.stat(os.path.join('var', 'tmp', 'new.zip')).st_ino, os.stat(self.previous).st_ino)
+
+    def test_added_members_are_written(self):
+        builder = ZipBuilder(os.path.join('var', 'tmp', 'new.zip'), previous=self.previous)
+        builder.write(self.source, 'a.txt')
+        builder.writestr('c.txt', 'new')
+        self.assertFalse(builder.close())
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'new.zip')) as zfile:
+            self.assertIsNone(zfile.testzip())
+            self.assertEqual(zfile.read('a.txt'), b'content' * 100)
+            self.assertEqual(zfile.read('c.txt'), b'new')
+
+    def test_modified_members_are_written(self):
+        with open(self.source, 'w') as f:
+            f.write('modified')
+        os.utime(self.source, (946684800, 946684800))
+        builder = ZipBuilder(os.path.join('var', 'tmp', 'new.zip'), previous=self.previous)
+        builder.write(self.source, 'a.txt')
+        self.assertFalse(builder.close())
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'new.zip')) as zfile:
+            self.assertEqual(zfile.read('a.txt'), b'modified')
+
+
+class ZipTilesBuilderTest(StubServerMixin, VarTmpTestCase):
+    def setUp(self):
+        super().setUp()
+        url = self.stub_url + '/{z}/{x}/{y}.png'
+        self.builder_args = {'tiles_url': url, 'ignore_errors': True, 'tiles_dir': settings.MOBILE_TILES_STORE_DIR}
+        os.makedirs(os.path.join('var', 'tmp'))
+
+    def stub_response(self, path):
+        """Serve tiles containing their own path"""
+        return 200, 'image/png', path.encode()
+
+    def build(self, name, tiles):
+        with zipfile.ZipFile(os.path.join('var', 'tmp', name), 'w') as zfile:
+            builder = ZipTilesBuilder(zfile, prefix='tiles/', **self.builder_args)
+            builder.tiles = set(tiles)
+            builder.run()
+        with zipfile.ZipFile(os.path.join('var', 'tmp', name)) as zfile:
+            return dict([(name, zfile.read(name)) for name in zfile.namelist()])
+
+    @override_settings(MOBILE_TILES_URL=[], MOBILE_TILES_EXTENSION='.png')
+    def test_tiles_downloaded_once(self):
+        files = self.build('global.zip', [(8, 129, 99), (9, 258, 198)])
+        self.assertEqual(files, {
+            'tiles/8/129/99.png': b'/8/129/99.png',
+            'tiles/9/258/198.png': b'/9/258/198.png',
+        })
+        files = self.build('1.zip', [(9, 258, 198), (9, 259, 198)])
+        self.assertEqual(files, {
+            'tiles/9/258/198.png': b'/9/258/198.png',
+            'tiles/9/259/198.png': b'/9/259/198.png',
+        })
+        # Only missing tiles are downloaded for the second zip file
+        self.assertEqual(sorted(self.stub_requests), ['/8/129/99.png', '/9/258/198.png', '/9/259/198.png'])
+
+    @override_settings(MOBILE_TILES_URL=[], MOBILE_TILES_EXTENSION='.png', MOBILE_TILES_STORE_MAX_AGE=0)
+    def test_expired_tiles_downloaded_again(self):
+        self.build('global.zip', [(9, 258, 198)])
+        self.build('1.zip', [(9, 258, 198)])
+        self.assertEqual(self.stub_requests, ['/9/258/198.png', '/9/258/198.png'])
 
 
 class SyncRandoTilesTest(VarTmpTestCase):
@@ -178,7 +281,7 @@ class SyncRandoFailTest(VarTmpTestCase):
         os.makedirs(os.path.join('var', 'tmp_sync_rando'))
         msg = "The var/tmp_sync_rando/ directory already exists. " \
               "Please check no other sync_rando command is already running. " \
-              "If not, please delete this directory."
+              "If not, please resume the synchronization with --resume option, or delete this directory."
         with self.assertRaisesRegex(CommandError, msg):
             management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000',
                                     skip_tiles=True, verbosity=2)
@@ -301,6 +404,132 @@ class SyncTest(VarTmpTestCase):
         self.assertFalse(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'treks', str(self.trek.pk), '%s.pdf' % self.trek.slug)))
         self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'treks', str(trek.pk), '%s.pdf' % trek.slug)))
 
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_resume(self, mock_prepare):
+        with mock.patch('geotrek.common.helpers_sync.SyncRando.sync', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000',
+                                        skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp_sync_rando', 'progress.json')))
+        with self.assertRaisesRegex(CommandError, "directory already exists"):
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000',
+                                    skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', resume=True,
+                                    skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        mock_detail.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join('var', 'tmp', 'progress.json')))
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'treks', str(self.trek.pk), 'pois.geojson')))
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'zip', 'treks', 'en', 'global.zip')) as zfile:
+            self.assertIn(os.path.join('api', 'en', 'treks', str(self.trek.pk), 'pois.geojson'), zfile.namelist())
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_resume_after_error(self, mock_prepare):
+        with mock.patch('geotrek.common.helpers_sync.SyncRando.sync', side_effect=ValueError('This is a test')):
+            with self.assertRaisesRegex(ValueError, 'This is a test'):
+                management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', resume=True,
+                                        skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp_sync_rando', 'progress.json')))
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', resume=True,
+                                    skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        mock_detail.assert_not_called()
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'treks', str(self.trek.pk), 'pois.geojson')))
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_error_without_resume_cleans_up(self, mock_prepare):
+        with mock.patch('geotrek.common.helpers_sync.SyncRando.sync', side_effect=ValueError('This is a test')):
+            with self.assertRaisesRegex(ValueError, 'This is a test'):
+                management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000',
+                                        skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join('var', 'tmp_sync_rando')))
+        # Next synchronization is not prevented
+        management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000',
+                                skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'treks', str(self.trek.pk), 'pois.geojson')))
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_resume_with_other_options(self, mock_prepare):
+        with mock.patch('geotrek.common.helpers_sync.SyncRando.sync', side_effect=ValueError('This is a test')):
+            with self.assertRaisesRegex(ValueError, 'This is a test'):
+                management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', resume=True,
+                                        skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        output = StringIO()
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', resume=True,
+                                    skip_tiles=True, skip_pdf=True, skip_dem=True, languages='en', verbosity=2,
+                                    stdout=output)
+        self.assertIn("run with other options, starting over", output.getvalue())
+        self.assertEqual(mock_detail.call_count, 1)
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental(self, mock_prepare):
+        kwargs = {'url': 'http://localhost:8000', 'skip_tiles': True, 'skip_pdf': True, 'languages': 'en',
+                  'verbosity': 2, 'incremental': True}
+        management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'manifest.json')))
+        pois = os.path.join('var', 'tmp', 'api', 'en', 'treks', str(self.trek.pk), 'pois.geojson')
+        inode = os.stat(pois).st_ino
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        mock_detail.assert_not_called()
+        # Unchanged file is linked from previous synchronization
+        self.assertEqual(os.stat(pois).st_ino, inode)
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'zip', 'treks', 'en', 'global.zip')) as zfile:
+            self.assertIn(os.path.join('api', 'en', 'treks', str(self.trek.pk), 'pois.geojson'), zfile.namelist())
+        self.trek.pois.first().save()
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        self.assertEqual(mock_detail.call_count, 1)
+        del kwargs['incremental']
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        self.assertEqual(mock_detail.call_count, 1)
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental_shared_files(self, mock_prepare):
+        kwargs = {'url': 'http://localhost:8000', 'skip_tiles': True, 'skip_pdf': True, 'languages': 'en',
+                  'verbosity': 2, 'incremental': True}
+        theme = ThemeFactory.create(label='Old theme')
+        management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        theme.label = 'New theme'
+        theme.save()
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        # Lookup tables have no update date, their modification requires a full synchronization
+        self.assertEqual(mock_detail.call_count, 1)
+        with open(os.path.join('var', 'tmp', 'api', 'en', 'themes.json'), 'r') as f:
+            self.assertIn('New theme', f.read())
+        self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'api', 'en', 'parameters.json')))
+
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_incremental_signage(self, mock_prepare):
+        kwargs = {'url': 'http://localhost:8000', 'skip_tiles': True, 'skip_pdf': True, 'languages': 'en',
+                  'verbosity': 2, 'incremental': True, 'with_signages': True}
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            signage = SignageFactory.create(paths=[(self.trek.paths.first(), 0, 0)])
+        else:
+            signage = SignageFactory.create(geom='SRID={};POINT({} {})'.format(settings.SRID, *self.trek.geom.coords[0]))
+        management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        signage.save()
+        with mock.patch('geotrek.trekking.helpers_sync.SyncRando.sync_detail') as mock_detail:
+            management.call_command('sync_rando', os.path.join('var', 'tmp'), stdout=StringIO(), **kwargs)
+        self.assertEqual(mock_detail.call_count, 1)
+
+
+class SyncJobsTest(VarTmpMixin, TransactionTestCase):
+    @mock.patch('geotrek.trekking.models.Trek.prepare_map_image')
+    def test_sync_jobs(self, mock_prepare):
+        treks = TrekWithPublishedPOIsFactory.create_batch(3, published=True)
+        management.call_command('sync_rando', os.path.join('var', 'tmp'), url='http://localhost:8000', jobs=2,
+                                skip_tiles=True, skip_pdf=True, languages='en', verbosity=2, stdout=StringIO())
+        with zipfile.ZipFile(os.path.join('var', 'tmp', 'zip', 'treks', 'en', 'global.zip')) as zfile:
+            names = zfile.namelist()
+        self.assertEqual(len(names), len(set(names)))
+        for trek in treks:
+            self.assertIn(os.path.join('api', 'en', 'treks', str(trek.pk), 'pois.geojson'), names)
+            self.assertTrue(os.path.exists(os.path.join('var', 'tmp', 'zip', 'treks', 'en', '{}.zip'.format(trek.pk))))
+
 
 class SyncComplexTest(VarTmpTestCase):
     def setUp(self):
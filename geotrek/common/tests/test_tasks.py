@@ -66,7 +66,7 @@ class TasksTest(TestCase):
         self.assertEqual("100%", log)
         self.assertEqual(task.status, "SUCCESS")
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     @patch('sys.stdout', new_callable=StringIO)
     def test_import_data_from_web_task(self, mock, mocked):
         def mocked_json():
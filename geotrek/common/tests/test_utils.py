@@ -1,16 +1,21 @@
 from unittest import mock
 
+from django.conf import settings
 from django.contrib.gis.geos import Point
 from django.db import connection
 from django.test import TestCase, override_settings
 
-from ..utils import sql_extent, uniquify, format_coordinates, spatial_reference
+from ..utils import (sql_extent, uniquify, format_coordinates, spatial_reference,
+                     intersecting, intersecting_batch)
 from ..utils.postgresql import debug_pg_notices
 from ..utils.import_celery import (create_tmp_destination,
                                    subclasses,
                                    )
 
 from geotrek.common.parsers import Parser
+from geotrek.core.factories import PathFactory
+from geotrek.zoning.factories import CityFactory
+from geotrek.zoning.models import City
 
 
 class UtilsTest(TestCase):
@@ -37,6 +42,23 @@ class UtilsTest(TestCase):
             raisenotice()
             fake_log.debug.assert_called_with('hello')
 
+    def test_intersecting_batch(self):
+        CityFactory(code='01', geom='SRID=%s;MULTIPOLYGON(((2 0, 2 2, 4 2, 4 0, 2 0)))' % settings.SRID)
+        CityFactory(code='02', geom='SRID=%s;MULTIPOLYGON(((0 0, 0 2, 2 2, 2 0, 0 0)))' % settings.SRID)
+        CityFactory(code='03', geom='SRID=%s;MULTIPOLYGON(((10 0, 10 2, 12 2, 12 0, 10 0)))' % settings.SRID)
+        paths = [
+            PathFactory(geom='SRID=%s;LINESTRING(0 1, 4 1)' % settings.SRID),
+            PathFactory(geom='SRID=%s;LINESTRING(4 1, 0 1)' % settings.SRID),
+            PathFactory(geom='SRID=%s;LINESTRING(5 5, 6 6)' % settings.SRID),
+        ]
+        with self.assertNumQueries(2):
+            result = intersecting_batch(City, paths)
+        self.assertEqual([city.code for city in result[paths[0].pk]], ['02', '01'])
+        self.assertEqual([city.code for city in result[paths[1].pk]], ['01', '02'])
+        self.assertEqual(result[paths[2].pk], [])
+        for path in paths:
+            self.assertEqual(result[path.pk], list(intersecting(City, path)))
+
     def test_subclasses(self):
         class_list = subclasses(Parser)
         for classname in (
@@ -114,6 +114,93 @@ def intersecting(qs, obj, distance=None, ordering=True, field='geom'):
     return qs
 
 
+def intersecting_batch(qs, objects, distance=None, field='geom'):
+    """
+    Like ``intersecting()``, for many objects of a same model at once: return a
+    dict {object pk: [intersecting instances]} computed with a single spatial join.
+    """
+    if isinstance(qs, ModelBase):
+        qs = qs.objects
+        if hasattr(qs, 'existing'):
+            qs = qs.existing()
+    objects = [obj for obj in objects if obj.geom]
+    if not objects:
+        return {}
+    pks = [obj.pk for obj in objects]
+    if distance is None:
+        distances = [obj.distance(qs.model) or 0 for obj in objects]
+    else:
+        distances = [distance] * len(objects)
+    source_field = objects[0]._meta.get_field('geom')
+    target_field = qs.model._meta.get_field(field)
+    targets, targets_params = qs.order_by().values('pk').query.sql_with_params()
+    sql = """
+        WITH sources AS (SELECT unnest(%s::integer[]) AS id, unnest(%s::float[]) AS distance)
+        SELECT src.id, t.{target_pk}
+        FROM sources AS src
+        JOIN {source_table} AS s ON s.{source_pk} = src.id
+        JOIN {target_table} AS t ON ST_DWithin(s.{source_geom}, t.{target_geom}, src.distance)
+        WHERE t.{target_pk} IN ({targets}) {exclude_self}
+        ORDER BY src.id,
+                 CASE WHEN src.distance = 0 AND GeometryType(s.{source_geom}) = 'LINESTRING' THEN
+                     (SELECT min(ST_LineLocatePoint(s.{source_geom}, ST_StartPoint(d.geom)))
+                      FROM ST_Dump(ST_Intersection(s.{source_geom}, t.{target_geom})) AS d)
+                 END,
+                 t.{target_pk}
+    """.format(
+        source_table=source_field.model._meta.db_table,
+        source_pk=source_field.model._meta.pk.column,
+        source_geom=source_field.column,
+        target_table=target_field.model._meta.db_table,
+        target_pk=target_field.model._meta.pk.column,
+        target_geom=target_field.column,
+        targets=targets,
+        # Prevent self intersection
+        exclude_self='AND t.{} <> src.id'.format(target_field.model._meta.pk.column)
+        if objects[0].__class__ == qs.model else '',
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [pks, distances] + list(targets_params))
+        pairs = cursor.fetchall()
+    instances = qs.in_bulk(set(pk for source_pk, pk in pairs))
+    result = dict([(pk, []) for pk in pks])
+    for source_pk, pk in pairs:
+        if pk in instances:
+            result[source_pk].append(instances[pk])
+    return result
+
+
+def prefetch_relations(objects, columns):
+    """
+    Resolve ``cities``, ``districts``, ``areas``, ``treks`` and ``thumbnail``
+    columns of many objects with one query per relation, so that serializers
+    then read them without any query. Treks are stored in ``treks_csv_display``
+    attribute.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+    model = objects[0].__class__
+    zone_types = [zone_type for zone_type, column in (('city', 'cities'), ('district', 'districts'),
+                                                      ('restrictedarea', 'areas')) if column in columns]
+    if zone_types and 'geotrek.zoning' in settings.INSTALLED_APPS:
+        from geotrek.zoning.mixins import ZoningPropertiesMixin, prefetch_zoning
+        if issubclass(model, ZoningPropertiesMixin):
+            prefetch_zoning(objects, zone_types)
+    if 'treks' in columns and 'geotrek.trekking' in settings.INSTALLED_APPS:
+        from geotrek.core.models import Topology
+        from geotrek.trekking.models import Trek
+        if issubclass(model, Topology):
+            treks = Trek.topology_treks_batch(objects)
+            for obj in objects:
+                obj.treks_csv_display = treks.get(obj.pk, [])
+    if 'thumbnail' in columns:
+        from geotrek.common.mixins import PicturesMixin
+        if issubclass(model, PicturesMixin):
+            model.prefetch_pictures(objects)
+    return objects
+
+
 def format_coordinates(geom):
     if settings.DISPLAY_SRID in [4326, 3857]:  # WGS84 formatting
         location = geom.centroid.transform(4326, clone=True)
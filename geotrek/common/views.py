@@ -20,7 +20,7 @@ from mapentity.registry import registry
 from mapentity import views as mapentity_views
 from geotrek.celery import app as celery_app
 from geotrek.common.mixins import transform_pdf_booklet_callback
-from geotrek.common.utils import sql_extent
+from geotrek.common.utils import prefetch_relations, sql_extent
 from geotrek.common.models import FileType, Attachment, TargetPortal
 from geotrek import __version__
 
@@ -46,6 +46,16 @@ from .serializers import ThemeSerializer
 from .tasks import launch_sync_rando
 
 
+class RelationsPrefetchMixin(object):
+    """
+    Resolve ``cities``, ``districts``, ``areas``, ``treks`` and ``thumbnail``
+    columns of listed or exported objects with one query per relation and chunk
+    of objects.
+    """
+    def prefetch_objects(self, objects):
+        return prefetch_relations(super().prefetch_objects(objects), self.columns)
+
+
 class MetaMixin(object):
     def get_context_data(self, **kwargs):
         lang = self.request.GET.get('lang')
@@ -223,6 +233,9 @@ class JSSettings(mapentity_views.JSSettings):
         dictsettings['version'] = __version__
         dictsettings['showExtremities'] = settings.SHOW_EXTREMITIES
         dictsettings['showLabels'] = settings.SHOW_LABELS
+        if settings.TOPOLOGY_SERVER_ROUTING:
+            # Topology editor computes routes on server, see geotrek.core.views.route_json
+            dictsettings['urls']['path_route'] = reverse('core:path_json_route')
         return dictsettings
 
 
@@ -1,10 +1,18 @@
+import heapq
+import json
 import math
+import random
+import struct
+import sys
+import threading
+from array import array
 from collections import defaultdict
 
+from django.db.models import FloatField, Func
 
-def path_modifier(path):
-    length = 0.0 if math.isnan(path.length) else path.length
-    return {"id": path.pk, "length": length}
+
+GRAPH_BINARY_MAGIC = b'GTGR'
+GRAPH_BINARY_VERSION = 1
 
 
 def get_key_optimizer():
@@ -13,6 +21,23 @@ def get_key_optimizer():
     return lambda x: mapping[x]
 
 
+def path_extremities(qs):
+    """
+    Return ``(path_pk, length, start_point, end_point)`` rows of the paths
+    of the queryset, with extremities read in database in the same query,
+    instead of materializing every ``Path`` and its geometry.
+    """
+    def coord(function, axis):
+        return Func(Func('geom', function=function), function=axis, output_field=FloatField())
+
+    rows = qs.values_list('pk', 'length',
+                          coord('ST_StartPoint', 'ST_X'), coord('ST_StartPoint', 'ST_Y'),
+                          coord('ST_EndPoint', 'ST_X'), coord('ST_EndPoint', 'ST_Y'))
+    for pk, length, x1, y1, x2, y2 in rows.iterator():
+        length = 0.0 if length is None or math.isnan(length) else length
+        yield pk, length, (x1, y1), (x2, y2)
+
+
 def graph_edges_nodes_of_qs(qs):
     """
     return a graph on the form:
@@ -33,25 +58,375 @@ def graph_edges_nodes_of_qs(qs):
     """
 
     key_modifier = get_key_optimizer()
-    value_modifier = path_modifier
 
     edges = defaultdict(dict)
     nodes = defaultdict(dict)
 
-    for path in qs:
-        coords = path.geom.coords
-        start_point, end_point = coords[0], coords[-1]
+    for edge_id, length, start_point, end_point in path_extremities(qs):
         k_start_point, k_end_point = key_modifier(start_point), key_modifier(end_point)
 
-        v_path = value_modifier(path)
-        v_path['nodes_id'] = [k_start_point, k_end_point]
-        edge_id = v_path['id']
-
         nodes[k_start_point][k_end_point] = edge_id
         nodes[k_end_point][k_start_point] = edge_id
-        edges[edge_id] = v_path
+        edges[edge_id] = {'id': edge_id, 'length': length, 'nodes_id': [k_start_point, k_end_point]}
 
     return {
         'edges': dict(edges),
         'nodes': dict(nodes),
     }
+
+
+def graph_binary_of_qs(qs):
+    """
+    Return the graph of ``graph_edges_nodes_of_qs()`` in a compact columnar
+    binary format (little-endian), which compresses well with gzip or brotli:
+
+    * header: magic ``GTGR``, format version (uint8), nodes count (uint32), edges count (uint32)
+    * edges ids (int32[edges count])
+    * edges start node ids (uint32[edges count])
+    * edges end node ids (uint32[edges count])
+    * edges lengths (float32[edges count])
+
+    Node ids are numbered from 1 like in the JSON graph.
+    """
+    key_modifier = get_key_optimizer()
+    ids, starts, ends, lengths = array('i'), array('I'), array('I'), array('f')
+    for edge_id, length, start_point, end_point in path_extremities(qs):
+        ids.append(edge_id)
+        starts.append(key_modifier(start_point))
+        ends.append(key_modifier(end_point))
+        lengths.append(length)
+    nodes_count = max(max(starts), max(ends)) if ids else 0
+    header = struct.pack('<4sBII', GRAPH_BINARY_MAGIC, GRAPH_BINARY_VERSION, nodes_count, len(ids))
+    columns = [ids, starts, ends, lengths]
+    if sys.byteorder == 'big':
+        for column in columns:
+            column.byteswap()
+    return header + b''.join(column.tobytes() for column in columns)
+
+
+class GraphStore(object):
+    """
+    Graph of the path network (see ``graph_edges_nodes_of_qs()``) kept up to date
+    by applying per-path deltas, instead of being rebuilt after each change.
+
+    Every refresh that changes the graph increments ``version`` and records
+    touched edges and nodes, so that clients can fetch only what changed
+    since the version they know (see ``diff()``).
+    """
+    max_diffs = 100
+
+    def __init__(self, first_version=0):
+        self.version = first_version
+        self.latest = None
+        self.edges = {}
+        self.nodes = {}
+        self.node_ids = {}
+        self.node_coords = {}
+        self.next_node_id = 1
+        self.diffs = []
+        self._json = None
+
+    def _node_id(self, coord):
+        if coord not in self.node_ids:
+            self.node_ids[coord] = self.next_node_id
+            self.node_coords[self.next_node_id] = coord
+            self.next_node_id += 1
+        return self.node_ids[coord]
+
+    def _unlink(self, pk, touched_nodes):
+        """Remove edge ``pk`` and return its extremities."""
+        edge = self.edges.pop(pk, None)
+        if edge is None:
+            return []
+        start, end = edge['nodes_id']
+        for node, other in ((start, end), (end, start)):
+            links = self.nodes.get(node, {})
+            if links.get(other) == pk:
+                del links[other]
+            touched_nodes.add(node)
+        return [start, end]
+
+    def _prune(self, nodes):
+        """Remove nodes which have no more edge."""
+        for node in nodes:
+            if node in self.nodes and not self.nodes[node]:
+                del self.nodes[node]
+                del self.node_ids[self.node_coords.pop(node)]
+
+    def remove_path(self, pk, touched_nodes):
+        self._prune(self._unlink(pk, touched_nodes))
+
+    def add_path(self, pk, length, start_point, end_point, touched_nodes):
+        # Unlink previous version first, but keep its nodes until the new one is linked,
+        # so that unchanged extremities keep their id.
+        previous_nodes = self._unlink(pk, touched_nodes)
+        start, end = self._node_id(start_point), self._node_id(end_point)
+        self.nodes.setdefault(start, {})[end] = pk
+        self.nodes.setdefault(end, {})[start] = pk
+        self.edges[pk] = {'id': pk, 'length': length, 'nodes_id': [start, end]}
+        touched_nodes.update((start, end))
+        self._prune(previous_nodes)
+
+    def refresh(self, qs, latest):
+        """
+        Apply changes of paths in ``qs`` since last refresh: paths updated after
+        ``self.latest`` (inserted, modified, split or merged) are re-applied and
+        paths that are no longer in ``qs`` (deleted, merged or drafted) are removed.
+        Returns True if the graph has changed.
+        """
+        if latest == self.latest and qs.count() == len(self.edges):
+            return False
+        touched_nodes = set()
+        removed = set(self.edges) - set(qs.values_list('pk', flat=True))
+        for pk in removed:
+            self.remove_path(pk, touched_nodes)
+        if not self.nodes:
+            self.next_node_id = 1
+        changed = qs if self.latest is None else qs.filter(date_update__gte=self.latest)
+        changed_pks = set()
+        for pk, length, start_point, end_point in path_extremities(changed.order_by('pk')):
+            self.add_path(pk, length, start_point, end_point, touched_nodes)
+            changed_pks.add(pk)
+        self.latest = latest
+        if not removed and not changed_pks:
+            return False
+        self.version += 1
+        self.diffs = self.diffs[-(self.max_diffs - 1):] + [(self.version, removed | changed_pks, touched_nodes)]
+        self._json = None
+        return True
+
+    def graph(self):
+        return {
+            'edges': self.edges,
+            'nodes': self.nodes,
+        }
+
+    def json(self):
+        if self._json is None:
+            self._json = json.dumps(self.graph())
+        return self._json
+
+    def diff(self, since):
+        """
+        Return changes between version ``since`` and current version, or None if
+        this version is unknown (too old, or from another graph store).
+        """
+        if since > self.version or (since < self.version and (not self.diffs or since < self.diffs[0][0] - 1)):
+            return None
+        touched_edges, touched_nodes = set(), set()
+        for version, edges, nodes in self.diffs:
+            if version > since:
+                touched_edges |= edges
+                touched_nodes |= nodes
+        return {
+            'version': self.version,
+            'edges': {pk: self.edges[pk] for pk in touched_edges if pk in self.edges},
+            'removed_edges': sorted(pk for pk in touched_edges if pk not in self.edges),
+            'nodes': {node: self.nodes[node] for node in touched_nodes if node in self.nodes},
+            'removed_nodes': sorted(node for node in touched_nodes if node not in self.nodes),
+        }
+
+
+class PathGraph(object):
+    """
+    Compact adjacency index of the path network.
+
+    Nodes are path extremities, edges are paths. Adjacency is stored in
+    CSR layout (``offsets``, ``neighbours``, ``neighbour_edges``) using flat
+    typed arrays, so that a network of tens of thousands of paths fits in a
+    few MB and can be walked without creating Python objects per edge.
+    """
+
+    def __init__(self, rows):
+        """
+        ``rows`` is an iterable of ``(path_pk, length, start_point, end_point)``
+        where points are hashable coordinates tuples.
+        """
+        key_modifier = get_key_optimizer()
+        self.edge_pks = array('l')
+        self.edge_lengths = array('d')
+        self.edge_nodes = array('l')
+        self.edge_index = {}
+        for pk, length, start_point, end_point in rows:
+            self.edge_index[pk] = len(self.edge_pks)
+            self.edge_pks.append(pk)
+            self.edge_lengths.append(length)
+            # Node ids are 1-based (see get_key_optimizer)
+            self.edge_nodes.append(key_modifier(start_point) - 1)
+            self.edge_nodes.append(key_modifier(end_point) - 1)
+        self.nodes_count = max(self.edge_nodes) + 1 if self.edge_nodes else 0
+
+        degrees = array('l', [0] * (self.nodes_count + 1))
+        for node in self.edge_nodes:
+            degrees[node + 1] += 1
+        for i in range(self.nodes_count):
+            degrees[i + 1] += degrees[i]
+        self.offsets = degrees
+        self.neighbours = array('l', [0] * len(self.edge_nodes))
+        self.neighbour_edges = array('l', [0] * len(self.edge_nodes))
+        cursor = array('l', self.offsets[:-1])
+        for edge in range(len(self.edge_pks)):
+            start, end = self.edge_nodes[2 * edge], self.edge_nodes[2 * edge + 1]
+            for node, other in ((start, end), (end, start)):
+                self.neighbours[cursor[node]] = other
+                self.neighbour_edges[cursor[node]] = edge
+                cursor[node] += 1
+
+    @classmethod
+    def from_db(cls):
+        """
+        Build the index from visible and non-draft paths.
+        """
+        from geotrek.core.models import Path
+
+        return cls(path_extremities(Path.objects.exclude(draft=True).order_by('pk')))
+
+    def __len__(self):
+        return len(self.edge_pks)
+
+    def _edge_ends(self, pk, position):
+        """Costs to reach both extremities of a path from a position on it."""
+        edge = self.edge_index[pk]
+        length = self.edge_lengths[edge]
+        start, end = self.edge_nodes[2 * edge], self.edge_nodes[2 * edge + 1]
+        return edge, ((start, position * length, 0.0), (end, (1.0 - position) * length, 1.0))
+
+    def shortest_path(self, source, target):
+        """
+        Compute the shortest way between two positions on the network.
+
+        ``source`` and ``target`` are ``(path_pk, position)`` tuples, where
+        position is in [0.0-1.0] along the path. Returns a tuple
+        ``(length, [(path_pk, start_position, end_position), ...])`` or
+        ``None`` if target cannot be reached.
+        """
+        source_edge, source_ends = self._edge_ends(*source)
+        target_edge, target_ends = self._edge_ends(*target)
+        targets = {}
+        for node, cost, extremity in target_ends:
+            if node not in targets or cost < targets[node][0]:
+                targets[node] = (cost, extremity)
+
+        best_length = float('inf')
+        best_node = None
+        if source_edge == target_edge:
+            best_length = abs(target[1] - source[1]) * self.edge_lengths[source_edge]
+
+        distances = {}
+        previous = {}
+        heap = []
+        for node, cost, extremity in source_ends:
+            if cost < distances.get(node, float('inf')):
+                distances[node] = cost
+                previous[node] = (None, extremity)
+                heapq.heappush(heap, (cost, node))
+
+        offsets, neighbours, neighbour_edges = self.offsets, self.neighbours, self.neighbour_edges
+        edge_lengths = self.edge_lengths
+        visited = set()
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance >= best_length:
+                break
+            if node in visited:
+                continue
+            visited.add(node)
+            if node in targets and distance + targets[node][0] < best_length:
+                best_length = distance + targets[node][0]
+                best_node = node
+            for i in range(offsets[node], offsets[node + 1]):
+                other = neighbours[i]
+                candidate = distance + edge_lengths[neighbour_edges[i]]
+                if candidate < distances.get(other, float('inf')):
+                    distances[other] = candidate
+                    previous[other] = (node, neighbour_edges[i])
+                    heapq.heappush(heap, (candidate, other))
+
+        if best_length == float('inf'):
+            return None
+        if best_node is None:
+            # Both positions are on the same path, and going straight is the shortest
+            return best_length, [(source[0], source[1], target[1])]
+
+        # Walk back from the target extremity to the source path
+        steps = [(self.edge_pks[target_edge], targets[best_node][1], target[1])]
+        node = best_node
+        while True:
+            prev_node, edge_or_extremity = previous[node]
+            if prev_node is None:
+                steps.append((source[0], source[1], edge_or_extremity))
+                break
+            edge = edge_or_extremity
+            forward = self.edge_nodes[2 * edge] == prev_node and self.edge_nodes[2 * edge + 1] == node
+            steps.append((self.edge_pks[edge], 0.0 if forward else 1.0, 1.0 if forward else 0.0))
+            node = prev_node
+        steps.reverse()
+        # Remove empty pieces at extremities (e.g. a step snapped on a path end)
+        steps = [s for i, s in enumerate(steps)
+                 if s[1] != s[2] or i not in (0, len(steps) - 1)] or steps[:1]
+        return best_length, steps
+
+    def route(self, steps):
+        """
+        Compute the shortest way going through every step, where ``steps``
+        is a list of ``(path_pk, position)``. Returns a tuple ``(length, topology)``
+        where topology is serialized like ``Topology.serialize()`` output
+        (one sub-topology per leg), or ``None`` if a step cannot be reached.
+        """
+        if len(steps) < 2:
+            raise ValueError("At least two steps are required")
+        total = 0.0
+        topology = []
+        for source, target in zip(steps[:-1], steps[1:]):
+            result = self.shortest_path(source, target)
+            if result is None:
+                return None
+            length, pieces = result
+            total += length
+            topology.append({
+                'offset': 0,
+                'paths': [pk for pk, start, end in pieces],
+                'positions': {str(i): [start, end] for i, (pk, start, end) in enumerate(pieces)},
+            })
+        return total, topology
+
+
+_path_graph = {}
+
+
+def get_path_graph():
+    """
+    Return the routing index of the path network, kept in process memory
+    and rebuilt only when paths were modified, added or removed since.
+    """
+    from geotrek.core.models import Path
+
+    qs = Path.objects.exclude(draft=True)
+    version = (Path.latest_updated(), qs.count())
+    if _path_graph.get('version') != version:
+        _path_graph['graph'] = PathGraph.from_db()
+        _path_graph['version'] = version
+    return _path_graph['graph']
+
+
+_graph_store = {}
+_graph_store_lock = threading.Lock()
+
+
+def get_graph_json(since=None):
+    """
+    Return the version of the graph of the path network and its JSON, or the
+    JSON of changes since version ``since`` if known (see ``GraphStore.diff()``).
+    The graph is kept in process memory and refreshed with the paths modified,
+    added or removed since previous call.
+    """
+    from geotrek.core.models import Path
+
+    with _graph_store_lock:
+        if 'store' not in _graph_store:
+            # Versions of other processes must be unknown to this store (see GraphStore.diff())
+            _graph_store['store'] = GraphStore(first_version=random.getrandbits(32) << 20)
+        store = _graph_store['store']
+        store.refresh(Path.objects.exclude(draft=True), Path.latest_updated())
+        diff = store.diff(since) if since is not None else None
+        return store.version, json.dumps(diff) if diff is not None else store.json()
@@ -0,0 +1,153 @@
+import json
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+
+from geotrek.core.models import Path, PathAggregation, Topology
+
+logger = logging.getLogger(__name__)
+
+
+class SnapError(Exception):
+    """A point can't be snapped because there is no path"""
+    pass
+
+
+class TopologyBulkWriter(object):
+    """
+    Attach serialized topologies to many existing topology objects (treks, POIs,
+    signages...) at once. This is the bulk equivalent of:
+
+        topology = Topology.deserialize(serialized)
+        obj.mutate(topology)
+
+    Path aggregations are written in batches, with geometry triggers deferred
+    during the batch: geometries are then computed once per topology, instead
+    of once per inserted, updated or deleted row. New points are snapped on
+    paths with a single query per batch.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.topologies_count = 0
+        self.aggregations_count = 0
+        self.duration = 0.0
+
+    def add(self, obj, serialized):
+        """
+        Schedule the update of ``obj`` (a saved topology) with ``serialized``
+        topology. The batch is written when ``batch_size`` is reached.
+        """
+        # If the object was already scheduled, the last topology wins
+        point = self._new_point(serialized)
+        if point:
+            # Points are snapped on paths all together (see flush())
+            self.pending[obj.pk] = (obj, point)
+        else:
+            self.pending[obj.pk] = (obj, Topology.deserialize(serialized))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def _new_point(self, serialized):
+        """
+        Return a (point, snap) tuple if ``serialized`` is a new point topology
+        (see ``Topology.deserialize()``), None otherwise.
+        """
+        objdict = serialized
+        if isinstance(serialized, str):
+            try:
+                objdict = json.loads(serialized)
+            except ValueError:
+                return None
+        if not isinstance(objdict, dict) or objdict.get('pk'):
+            return None
+        lat, lng = objdict.get('lat'), objdict.get('lng')
+        if lat is None or lng is None:
+            return None
+        return Point(lng, lat, srid=settings.API_SRID), objdict.get('snap')
+
+    def _snap_points(self, pending):
+        """
+        Replace (point, snap) tuples in ``pending`` by point topologies, snapping
+        all points in a single query (see ``Path.closest_positions()``).
+        """
+        points = [(i, other) for i, (obj, other) in enumerate(pending) if isinstance(other, tuple)]
+        if not points:
+            return pending
+        closests = Path.closest_positions([(point.x, point.y) for i, (point, snap) in points],
+                                          snaps=[snap for i, (point, snap) in points])
+        for (i, (point, snap)), closest in zip(points, closests):
+            if closest is None:
+                raise SnapError("No path found to snap point %s" % point.wkt)
+            path_pk, position, offset = closest
+            topology = Topology(kind='TMP', offset=0 if snap is not None else offset)
+            topology.aggregations = [PathAggregation(path_id=path_pk, start_position=position, end_position=position)]
+            topology.geom = point.transform(settings.SRID, clone=True)
+            pending[i] = (pending[i][0], topology)
+        return pending
+
+    def flush(self):
+        """
+        Write all pending topologies, and reload computed geometries into objects.
+        """
+        if not self.pending:
+            return
+        start = time.time()
+        pending, self.pending = list(self.pending.values()), {}
+        pending = self._snap_points(pending)
+        pks = [obj.pk for obj, other in pending]
+        aggregations = []
+        updates = []
+        points = []
+        for obj, other in pending:
+            aggrs = other.aggregations.all()
+            # A point has only one aggregation, the others will be created by triggers (see Topology.mutate())
+            is_point = all([a.start_position == a.end_position for a in aggrs])
+            if is_point:
+                aggrs = aggrs[:1]
+                points.append(Topology(pk=obj.pk, geom=other.geom))
+            aggregations.extend([
+                PathAggregation(
+                    path_id=aggr.path_id,
+                    topo_object_id=obj.pk,
+                    start_position=aggr.start_position,
+                    end_position=aggr.end_position,
+                    order=aggr.order
+                )
+                for aggr in aggrs
+            ])
+            updates.append(Topology(pk=obj.pk, offset=other.offset, deleted=False))
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('geotrek.defer_topology_geometry', 'on', true)")
+                PathAggregation.objects.filter(topo_object_id__in=pks).delete()
+                Topology.objects.bulk_update(updates, ['offset', 'deleted'], batch_size=self.batch_size)
+                Topology.objects.bulk_update(points, ['geom'], batch_size=self.batch_size)
+                PathAggregation.objects.bulk_create(aggregations, batch_size=self.batch_size)
+                cursor.execute("SELECT set_config('geotrek.defer_topology_geometry', 'off', true)")
+                cursor.execute("SELECT update_geometry_of_topology(id) FROM unnest(%s) AS id", [pks])
+
+        # Reload computed values with one query per model
+        objs_by_model = defaultdict(list)
+        for obj, other in pending:
+            objs_by_model[obj.__class__].append(obj)
+        for model, objs in objs_by_model.items():
+            fromdb = model.objects.in_bulk([obj.pk for obj in objs])
+            for obj in objs:
+                obj.reload(fromdb.get(obj.pk))
+
+        self.topologies_count += len(pending)
+        self.aggregations_count += len(aggregations)
+        self.duration += time.time() - start
+        logger.info(self.report())
+
+    def report(self):
+        throughput = self.topologies_count / self.duration if self.duration else 0
+        return "{} topologies ({} path aggregations) written in {:.1f}s ({:.1f} topologies/s)".format(
+            self.topologies_count, self.aggregations_count, self.duration, throughput)
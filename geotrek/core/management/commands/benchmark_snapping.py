@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+
+from geotrek.core.models import Path
+
+
+class Command(BaseCommand):
+    help = 'Measure the throughput of point snapping on paths, with random points\n'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', '-c', action='store', dest='count', type=int, default=1000,
+                            help="Number of points to snap, default 1000")
+        parser.add_argument('--batch-size', '-b', action='store', dest='batch_size', type=int, default=1000,
+                            help="Number of points snapped per query, default 1000")
+        parser.add_argument('--compare', action='store_true', dest='compare', default=False,
+                            help="Also snap points one by one, like Topology.deserialize() does")
+        parser.add_argument('--seed', action='store', dest='seed', type=int, default=None,
+                            help="Random seed, to snap the same points between runs")
+
+    def handle(self, *args, **options):
+        extent = Path.objects.exclude(draft=True).aggregate(extent=Extent('geom'))['extent']
+        if extent is None:
+            raise CommandError("No path found")
+        xmin, ymin, xmax, ymax = extent
+        rand = random.Random(options['seed'])
+        coords = [(rand.uniform(xmin, xmax), rand.uniform(ymin, ymax)) for i in range(options['count'])]
+        batch_size = options['batch_size']
+
+        start = time.time()
+        for i in range(0, len(coords), batch_size):
+            Path.closest_positions(coords[i:i + batch_size], srid=settings.SRID)
+        self.report("Batch snapping", len(coords), time.time() - start)
+
+        if options['compare']:
+            start = time.time()
+            for x, y in coords:
+                point = Point(x, y, srid=settings.SRID)
+                Path.closest(point).interpolate(point)
+            self.report("Point by point snapping", len(coords), time.time() - start)
+
+    def report(self, label, count, duration):
+        throughput = count / duration if duration else 0
+        self.stdout.write("{}: {} points in {:.2f}s ({:.0f} points/s)".format(label, count, duration, throughput))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.core.graph import graph_binary_of_qs
+from geotrek.core.models import Path
+
+
+class Command(BaseCommand):
+    help = 'Write the graph of the path network in binary format, to be served as a static file\n'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', help="Output file path")
+
+    def handle(self, *args, **options):
+        binary_graph = graph_binary_of_qs(Path.objects.exclude(draft=True).order_by('pk'))
+        with open(options['file_path'], 'wb') as f:
+            f.write(binary_graph)
+        if options['verbosity'] > 0:
+            self.stdout.write("Graph written to {} ({} bytes)".format(options['file_path'], len(binary_graph)))
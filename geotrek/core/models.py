@@ -19,11 +19,12 @@ from mapentity.serializers import plain_text
 from geotrek.authent.models import StructureRelated, StructureOrNoneRelated
 from geotrek.common.mixins import (TimeStampedModelMixin, NoDeleteMixin,
                                    AddPropertyMixin)
-from geotrek.common.utils import classproperty, sqlfunction, uniquify
+from geotrek.common.utils import classproperty, sqlfunction
 from geotrek.common.utils.postgresql import debug_pg_notices
 from geotrek.altimetry.models import AltimetryMixin
 from geotrek.zoning.mixins import ZoningPropertiesMixin
 
+from django.core.cache import caches
 from django.db import connection, connections, DEFAULT_DB_ALIAS
 from django.db.models.query import QuerySet
 
@@ -160,6 +161,39 @@ class Path(ZoningPropertiesMixin, AddPropertyMixin, MapEntityMixin, AltimetryMix
             qs = qs.exclude(pk=exclude.pk)
         return qs.exclude(visible=False).annotate(distance=Distance('geom', point)).order_by('distance')[0]
 
+    @classmethod
+    def closest_positions(cls, coords, srid=None, snaps=None):
+        """
+        Batch equivalent of ``closest()`` followed by ``interpolate()``, in a single query.
+        Returns, for each (x, y) tuple of ``coords`` (in ``srid``, default API_SRID),
+        a tuple (path pk, position, offset), or None if no path was found.
+        ``snaps`` is an optional list of path pk (or None) to snap points on.
+        """
+        if not coords:
+            return []
+        srid = srid or settings.API_SRID
+        snaps = snaps or [None] * len(coords)
+        sql = """
+        WITH points AS (SELECT n, snap, ST_Transform(ST_SetSRID(ST_MakePoint(x, y), %(srid)s), %(path_srid)s) AS geom
+                        FROM unnest(%%s::float8[], %%s::float8[], %%s::integer[]) WITH ORDINALITY AS p(x, y, snap, n))
+        SELECT c.id, i.position, i.distance
+        FROM points p
+        LEFT JOIN LATERAL (
+            (SELECT t.id, t.geom FROM %(table)s t WHERE t.id = p.snap)
+            UNION ALL
+            (SELECT t.id, t.geom FROM %(table)s t
+             WHERE p.snap IS NULL AND t.visible AND NOT t.draft
+             ORDER BY t.geom <-> p.geom
+             LIMIT 1)
+            LIMIT 1
+        ) c ON true
+        LEFT JOIN LATERAL ST_InterpolateAlong(c.geom, p.geom) AS i(position FLOAT, distance FLOAT) ON c.id IS NOT NULL
+        ORDER BY p.n
+        """ % {'srid': int(srid), 'path_srid': settings.SRID, 'table': cls._meta.db_table}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [[x for x, y in coords], [y for x, y in coords], snaps])
+            return [row if row[0] is not None else None for row in cursor.fetchall()]
+
     @classmethod
     def check_path_not_overlap(cls, geom, pk):
         """
@@ -449,62 +483,111 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
             self.reload()
         return aggr
 
+    @classmethod
+    def _overlapping_pks(cls, sources, all_objects):
+        """ Return a dict {source pk: [overlapping pks, in order of progression]}
+        for ``sources``, a list of (pk, date_update) tuples.
+
+        Results are cached per source topology version and per latest
+        update of overlapping kind, and missing ones are computed in one query.
+        """
+        kind = all_objects.model.KIND
+        is_generic = kind == Topology.KIND
+        others = Topology.objects.all() if is_generic else Topology.objects.filter(kind=kind)
+        latest = others.aggregate(latest=models.Max('date_update'))['latest']
+        if latest is None:
+            return {pk: [] for pk, date_update in sources}
+
+        def cache_key(pk, date_update):
+            return 'overlapping_%s_%s_%s_%s' % (kind, pk, date_update.strftime('%y%m%d%H%M%S%f') if date_update else '',
+                                                latest.strftime('%y%m%d%H%M%S%f'))
+
+        keys = {pk: cache_key(pk, date_update) for pk, date_update in sources}
+        cache = caches['default']
+        cached = cache.get_many(list(keys.values()))
+        result = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        missing = [pk for pk in keys if pk not in result]
+        if not missing:
+            return result
+
+        sql = """
+        WITH sources AS (SELECT a.topo_object_id AS source_id, a.path_id, a.start_position AS start,
+                                a.end_position AS end, a.order AS order
+                         FROM %(aggregations_table)s a
+                         WHERE a.topo_object_id = ANY(%%s))
+        SELECT s.source_id, t.id,
+               min(s.order + CASE WHEN s.start > s.end THEN (1 - a.start_position) ELSE a.start_position END) AS rank
+        FROM sources s
+        JOIN %(aggregations_table)s a ON a.path_id = s.path_id
+        JOIN %(topology_table)s t ON a.topo_object_id = t.id
+        WHERE least(a.start_position, a.end_position) <= greatest(s.start, s.end)
+          AND greatest(a.start_position, a.end_position) >= least(s.start, s.end)
+          AND (%%s OR t.kind = %%s)
+        GROUP BY s.source_id, t.id
+        ORDER BY s.source_id, rank, t.id;
+        """ % {
+            'topology_table': Topology._meta.db_table,
+            'aggregations_table': PathAggregation._meta.db_table,
+        }
+
+        computed = {pk: [] for pk in missing}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [missing, is_generic, kind])
+            for source_pk, pk, rank in cursor.fetchall():
+                computed[source_pk].append((rank, pk))
+        cache.set_many({keys[pk]: overlaps for pk, overlaps in computed.items()})
+        result.update(computed)
+        return result
+
     @classmethod
     def overlapping(cls, queryset, all_objects=None):
         """ Return a Topology queryset overlapping specified topologies.
         """
         if all_objects is None:
             all_objects = cls.objects.existing()
-        is_generic = all_objects.model.KIND == Topology.KIND
         single_input = isinstance(queryset, QuerySet)
 
         if single_input:
-            topology_pks = [str(pk) for pk in queryset.values_list('pk', flat=True)]
+            sources = list(queryset.values_list('pk', 'date_update'))
         else:
-            topology_pks = [str(queryset.pk)]
+            sources = [(queryset.pk, queryset.date_update)]
 
-        if len(topology_pks) == 0:
+        if len(sources) == 0:
             return all_objects.filter(pk__in=[])
 
-        sql = """
-        WITH topologies AS (SELECT id FROM %(topology_table)s WHERE id IN (%(topology_list)s)),
-        -- Concerned aggregations
-             aggregations AS (SELECT * FROM %(aggregations_table)s a, topologies t
-                              WHERE a.topo_object_id = t.id),
-        -- Concerned paths along with (start, end)
-             paths_aggr AS (SELECT a.start_position AS start, a.end_position AS end, p.id, a.order AS order
-                            FROM %(paths_table)s p, aggregations a
-                            WHERE a.path_id = p.id
-                            ORDER BY a.order)
-        -- Retrieve primary keys
-        SELECT t.id
-        FROM %(topology_table)s t, %(aggregations_table)s a, paths_aggr pa
-        WHERE a.path_id = pa.id AND a.topo_object_id = t.id
-          AND least(a.start_position, a.end_position) <= greatest(pa.start, pa.end)
-          AND greatest(a.start_position, a.end_position) >= least(pa.start, pa.end)
-          AND %(extra_condition)s
-        ORDER BY (pa.order + CASE WHEN pa.start > pa.end THEN (1 - a.start_position) ELSE a.start_position END);
-        """ % {
-            'topology_table': Topology._meta.db_table,
-            'aggregations_table': PathAggregation._meta.db_table,
-            'paths_table': Path._meta.db_table,
-            'topology_list': ','.join(topology_pks),
-            'extra_condition': 'true' if is_generic else "kind = '%s'" % all_objects.model.KIND
-        }
-
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        pk_list = uniquify([row[0] for row in result])
+        # Merge overlaps of all sources, keeping the first position of each topology
+        ranks = {}
+        for overlaps in cls._overlapping_pks(sources, all_objects).values():
+            for rank, pk in overlaps:
+                if pk not in ranks or rank < ranks[pk]:
+                    ranks[pk] = rank
+        pk_list = sorted(ranks, key=lambda pk: (ranks[pk], pk))
+        if not pk_list:
+            return all_objects.filter(pk__in=[])
 
         # Return a QuerySet and preserve pk list order
-        # http://stackoverflow.com/a/1310188/141895
-        ordering = 'CASE %s END' % ' '.join(['WHEN %s.id=%s THEN %s' % (Topology._meta.db_table, id_, i)
-                                             for i, id_ in enumerate(pk_list)])
+        ordering = 'array_position(%%s, %s.id)' % Topology._meta.db_table
         queryset = all_objects.filter(pk__in=pk_list).extra(
-            select={'ordering': ordering}, order_by=('ordering',))
+            select={'ordering': ordering}, select_params=[pk_list], order_by=('ordering',))
         return queryset
 
+    @classmethod
+    def overlapping_batch(cls, topologies, all_objects=None):
+        """ Return a dict {topology pk: [overlapping objects]} for many topologies
+        at once, e.g. for list views and serializers.
+        """
+        if all_objects is None:
+            all_objects = cls.objects.existing()
+        sources = [(topology.pk, topology.date_update) for topology in topologies]
+        if not sources:
+            return {}
+        overlaps = cls._overlapping_pks(sources, all_objects)
+        objects = all_objects.in_bulk(set(pk for pks in overlaps.values() for rank, pk in pks))
+        return {
+            source_pk: [objects[pk] for rank, pk in pks if pk in objects]
+            for source_pk, pks in overlaps.items()
+        }
+
     def mutate(self, other):
         """
         Take alls attributes of the other topology specified and
@@ -538,13 +621,14 @@ class Topology(ZoningPropertiesMixin, AddPropertyMixin, AltimetryMixin,
         self.reload()
         return self
 
-    def reload(self):
+    def reload(self, fromdb=None):
         """
         Reload into instance all computed attributes in triggers.
         """
         if self.pk:
             # Update computed values
-            fromdb = self.__class__.objects.get(pk=self.pk)
+            if fromdb is None:
+                fromdb = self.__class__.objects.get(pk=self.pk)
             self.geom = fromdb.geom
             # /!\ offset may be set by a trigger OR in
             # the django code, reload() will override
@@ -165,6 +165,11 @@ BEGIN
     -- Since the topology to be modified is available in NEW, we could improve
     -- performance with some refactoring.
 
+    -- Geometries are computed at once by the caller (see TopologyBulkWriter)
+    IF current_setting('geotrek.defer_topology_geometry', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
     PERFORM update_geometry_of_topology(NEW.id);
 
     RETURN NULL;
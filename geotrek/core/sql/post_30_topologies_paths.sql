@@ -89,6 +89,11 @@ CREATE FUNCTION {# geotrek.core #}.ft_topologies_paths_geometry_statement() RETU
 DECLARE
     rec record;
 BEGIN
+    -- Geometries are computed at once by the caller (see TopologyBulkWriter)
+    IF current_setting('geotrek.defer_topology_geometry', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
     FOR rec IN SELECT * FROM core_topology WHERE geom_need_update = TRUE LOOP
         PERFORM update_geometry_of_topology(rec.id);
     END LOOP;
@@ -249,3 +249,28 @@ Geotrek.shortestPath = (function() {
 
     return computePaths;
 })();
+
+
+// Decode the binary graph (see geotrek.core.graph.graph_binary_of_qs)
+// into the {nodes: ..., edges: ...} structure of the JSON graph.
+Geotrek.graphFromBinary = function (buffer) {
+    var view = new DataView(buffer),
+        magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic != 'GTGR' || view.getUint8(4) != 1)
+        throw "Unsupported graph format";
+    var edges_count = view.getUint32(9, true),
+        offset = 13,
+        ids = new Int32Array(buffer.slice(offset, offset += 4 * edges_count)),
+        starts = new Uint32Array(buffer.slice(offset, offset += 4 * edges_count)),
+        ends = new Uint32Array(buffer.slice(offset, offset += 4 * edges_count)),
+        lengths = new Float32Array(buffer.slice(offset, offset += 4 * edges_count));
+
+    var graph = {nodes: {}, edges: {}};
+    for (var i = 0; i < edges_count; i++) {
+        var id = ids[i], start = starts[i], end = ends[i];
+        graph.edges[id] = {id: id, length: lengths[i], nodes_id: [start, end]};
+        (graph.nodes[start] = graph.nodes[start] || {})[end] = id;
+        (graph.nodes[end] = graph.nodes[end] || {})[start] = id;
+    }
+    return graph;
+};
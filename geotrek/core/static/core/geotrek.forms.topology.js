@@ -124,16 +124,51 @@ MapEntity.GeometryField.TopologyField = MapEntity.GeometryField.extend({
             return;
         }
 
+        if (window.SETTINGS.urls.path_route) {
+            // Routes are computed by the server, no need to load graph
+            this._lineControl.setRouteUrl(window.SETTINGS.urls.path_route);
+            this.load();
+            return;
+        }
+
         // Path layer is ready, load graph !
         this._pathsLayer.fire('data:loading');
-        var url = window.SETTINGS.urls.path_graph;
-        $.getJSON(url, this._onGraphLoaded.bind(this))
-         .error(graphError.bind(this));
+        var url = window.SETTINGS.urls.path_graph_binary;
+        if (!url) {
+            url = window.SETTINGS.urls.path_graph;
+            $.getJSON(url, this._onGraphLoaded.bind(this))
+             .error(graphError.bind(this));
+            return;
+        }
+
+        // Compact binary graph (jQuery does not handle binary responses)
+        var xhr = new XMLHttpRequest();
+        xhr.open('GET', url);
+        xhr.responseType = 'arraybuffer';
+        xhr.onload = function () {
+            if (xhr.status != 200) {
+                graphError.call(this, xhr, xhr.statusText);
+                return;
+            }
+            var graph;
+            try {
+                graph = Geotrek.graphFromBinary(xhr.response);
+            }
+            catch (e) {
+                graphError.call(this, xhr, 'invalid graph', e);
+                return;
+            }
+            this._onGraphLoaded(graph);
+        }.bind(this);
+        xhr.onerror = function () {
+            graphError.call(this, xhr, 'error');
+        }.bind(this);
+        xhr.send();
 
         function graphError(jqXHR, textStatus, errorThrown) {
             this._pathsLayer.fire('data:loaded');
             $(this._map._container).addClass('map-error');
-            console.error("Could not load url '" + window.SETTINGS.urls.path_graph + "': " + textStatus);
+            console.error("Could not load url '" + url + "': " + textStatus);
             console.error(errorThrown);
         }
     },
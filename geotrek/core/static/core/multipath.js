@@ -181,6 +181,14 @@ L.Control.LineTopology = L.Control.extend({
         this.activable(true);
     },
 
+    setRouteUrl: function (url) {
+        /**
+         * Compute routes with server (see geotrek.core.views.route_json)
+         */
+        this.handler.setRouteUrl(url);
+        this.activable(true);
+    },
+
     onAdd: function (map) {
         this._container = L.DomUtil.create('div', 'leaflet-draw leaflet-control leaflet-bar leaflet-control-zoom');
         var link = L.DomUtil.create('a', 'leaflet-control-zoom-out linetopology-control', this._container);
@@ -243,6 +251,8 @@ L.Handler.MultiPath = L.Handler.extend({
         this.options = options;
 
         this.graph = null;
+        this.routeUrl = null;
+        this._routeRequest = null;
 
         // markers
         this.markersFactory = this.getMarkers();
@@ -298,6 +308,10 @@ L.Handler.MultiPath = L.Handler.extend({
         this.graph = graph;
     },
 
+    setRouteUrl: function (url) {
+        this.routeUrl = url;
+    },
+
     setState: function(state, autocompute) {
         autocompute = autocompute === undefined ? true : autocompute;
         var self = this;
@@ -461,7 +475,7 @@ L.Handler.MultiPath = L.Handler.extend({
     },
 
     canCompute: function() {
-        if (!this.graph)
+        if (!this.graph && !this.routeUrl)
             return false;
 
         if (this.steps.length < 2)
@@ -489,11 +503,45 @@ L.Handler.MultiPath = L.Handler.extend({
 
     computePaths: function() {
         if (this.canCompute()) {
+            if (this.routeUrl) {
+                this._requestComputedPaths();
+                return;
+            }
             var computed_paths = Geotrek.shortestPath(this.graph, this.steps);
             this._onComputedPaths(computed_paths);
         }
     },
 
+    // Ask the route to the server, and convert it into computed paths
+    _requestComputedPaths: function() {
+        var self = this,
+            steps = this.steps.slice();
+
+        var data = $.map(steps, function(pop) {
+            return {path: pop.polyline.properties.pk, position: pop.percent_distance};
+        });
+
+        // Only the last route is relevant
+        if (this._routeRequest)
+            this._routeRequest.abort();
+
+        this._routeRequest = $.getJSON(this.routeUrl, {steps: JSON.stringify(data)})
+        .done(function(route) {
+            var computed_paths = $.map(route.topology, function(subtopo, i) {
+                return {
+                    path: $.map(subtopo.paths, function(pk) { return {edge: {id: pk}}; }),
+                    from_pop: steps[i],
+                    to_pop: steps[i + 1]
+                };
+            });
+            self._onComputedPaths(computed_paths);
+        })
+        .fail(function(jqXHR, textStatus) {
+            if (textStatus != 'abort')
+                self._onComputedPaths(null);
+        });
+    },
+
 
     // Extract the complete edges list from the first to the last one
     _eachInnerComputedPathsEdges: function(computed_paths, f) {
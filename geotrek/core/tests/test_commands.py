@@ -227,3 +227,17 @@ class LoadPathsCommandTest(TestCase):
         value = Path.objects.first()
         self.assertEqual(value.name, 'lulu')
         self.assertEqual(value.structure, self.structure)
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class BenchmarkSnappingCommandTest(TestCase):
+    def test_no_path(self):
+        with self.assertRaisesRegex(CommandError, "No path found"):
+            call_command('benchmark_snapping', verbosity=0)
+
+    def test_benchmark(self):
+        Path.objects.create(geom=LineString((0, 0), (10, 0)))
+        output = StringIO()
+        call_command('benchmark_snapping', count=10, batch_size=3, compare=True, stdout=output)
+        self.assertIn('Batch snapping: 10 points', output.getvalue())
+        self.assertIn('Point by point snapping: 10 points', output.getvalue())
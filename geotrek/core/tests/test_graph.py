@@ -1,14 +1,19 @@
-from unittest import skipIf
+import json
+import struct
+import tempfile
+from unittest import mock, skipIf
 
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import LineString
+from django.core.management import call_command
 from django.urls import reverse
 
 from geotrek.core.factories import PathFactory
-from geotrek.core.graph import graph_edges_nodes_of_qs
-from geotrek.core.models import Path
+from geotrek.core.graph import graph_binary_of_qs, graph_edges_nodes_of_qs, get_path_graph, GraphStore, PathGraph
+from geotrek.core.models import Path, Topology
 
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
@@ -88,6 +93,14 @@ class SimpleGraph(TestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
 
+    def test_json_graph_serialized_once(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        with mock.patch.object(GraphStore, 'graph') as graph:
+            response = self.client.get(self.url)
+            graph.assert_not_called()
+        self.assertEqual(len(response.json()['edges']), 1)
+
     def test_json_graph_headers(self):
         """
 
@@ -96,3 +109,192 @@ class SimpleGraph(TestCase):
         PathFactory(geom=LineString((0, 0), (1, 1)))
         response = self.client.get(self.url)
         self.assertNotEqual(response['Cache-Control'], None)
+
+    def test_json_graph_version_header(self):
+        response = self.client.get(self.url)
+        version = int(response['X-Graph-Version'])
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        self.assertEqual(int(response['X-Graph-Version']), version + 1)
+
+    def test_json_graph_diff(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        version = response['X-Graph-Version']
+        path_2 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        response = self.client.get(self.url, {'since': version})
+        diff = response.json()
+        self.assertEqual(diff['version'], int(version) + 1)
+        self.assertEqual(list(diff['edges'].keys()), [str(path_2.pk)])
+        self.assertEqual(diff['removed_edges'], [])
+        self.assertEqual(sorted(diff['nodes'].keys()),
+                         sorted(str(node) for node in diff['edges'][str(path_2.pk)]['nodes_id']))
+        # Nothing changed since last version
+        response = self.client.get(self.url, {'since': diff['version']})
+        self.assertEqual(response.json()['edges'], {})
+
+    def test_json_graph_unknown_version(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, {'since': int(response['X-Graph-Version']) + 1})
+        graph = response.json()
+        self.assertNotIn('version', graph)
+        self.assertEqual(len(graph['edges']), 1)
+
+    def test_json_graph_version_of_other_process(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        self.client.get(self.url)
+        PathFactory(geom=LineString((1, 1), (2, 2)))
+        # Version of the graph kept by another process
+        response = self.client.get(self.url, {'since': 1})
+        graph = response.json()
+        self.assertNotIn('version', graph)
+        self.assertEqual(len(graph['edges']), 2)
+
+    def test_binary_graph(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((1, 1), (3, 1)))
+        response = self.client.get(reverse('core:path_binary_graph'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        content = response.content
+        self.assertEqual(struct.unpack('<4sBII', content[:13]), (b'GTGR', 1, 3, 2))
+        self.assertEqual(struct.unpack('<2i', content[13:21]), (path_1.pk, path_2.pk))
+        self.assertEqual(struct.unpack('<2I', content[21:29]), (1, 2))
+        self.assertEqual(struct.unpack('<2I', content[29:37]), (2, 3))
+        lengths = struct.unpack('<2f', content[37:45])
+        self.assertAlmostEqual(lengths[0], path_1.length, places=4)
+        self.assertAlmostEqual(lengths[1], path_2.length, places=4)
+        self.assertEqual(len(content), 45)
+
+    def test_binary_graph_command(self):
+        PathFactory(geom=LineString((0, 0), (1, 1)))
+        with tempfile.NamedTemporaryFile() as f:
+            call_command('generate_path_graph', f.name, verbosity=0)
+            self.assertEqual(f.read(), graph_binary_of_qs(Path.objects.order_by('pk')))
+
+
+class GraphStoreTest(TestCase):
+    def test_update_path(self):
+        path = PathFactory(geom=LineString((0, 0), (1, 1)))
+        store = GraphStore()
+        self.assertTrue(store.refresh(Path.objects.all(), Path.latest_updated()))
+        self.assertFalse(store.refresh(Path.objects.all(), Path.latest_updated()))
+        path.geom = LineString((0, 0), (2, 2))
+        path.save()
+        self.assertTrue(store.refresh(Path.objects.all(), Path.latest_updated()))
+        self.assertEqual(store.nodes, {1: {3: path.pk}, 3: {1: path.pk}})
+        self.assertEqual(store.diff(1)['removed_nodes'], [2])
+
+    def test_remove_path(self):
+        path_1 = PathFactory(geom=LineString((0, 0), (1, 1)))
+        path_2 = PathFactory(geom=LineString((1, 1), (2, 2)))
+        store = GraphStore()
+        store.refresh(Path.objects.all(), Path.latest_updated())
+        path_2.delete()
+        self.assertTrue(store.refresh(Path.objects.all(), Path.latest_updated()))
+        self.assertEqual(store.graph(), graph_edges_nodes_of_qs(Path.objects.all()))
+        diff = store.diff(1)
+        self.assertEqual(diff['removed_edges'], [path_2.pk])
+        self.assertEqual(diff['nodes'], {2: {1: path_1.pk}})
+        self.assertIsNone(store.diff(3))
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class RoutingGraph(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('homer', 'h@s.com', 'dooh')
+        success = self.client.login(username=user.username, password='dooh')
+        self.assertTrue(success)
+        self.url = reverse('core:path_json_route')
+
+    def test_shortest_path_index(self):
+        graph = PathGraph([
+            (10, 2.0, (0, 0), (2, 0)),
+            (11, 2.0, (2, 0), (2, 2)),
+            (12, 10.0, (0, 0), (2, 2)),
+            (13, 1.0, (5, 5), (6, 6)),
+        ])
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.shortest_path((10, 0.5), (11, 0.5)),
+                         (2.0, [(10, 0.5, 1.0), (11, 0.0, 0.5)]))
+        self.assertEqual(graph.shortest_path((11, 0.5), (10, 0.5)),
+                         (2.0, [(11, 0.5, 0.0), (10, 1.0, 0.5)]))
+        # Going around is shorter than following path 12
+        self.assertEqual(graph.shortest_path((12, 0.1), (12, 0.9)),
+                         (6.0, [(12, 0.1, 0.0), (10, 0.0, 1.0), (11, 0.0, 1.0), (12, 1.0, 0.9)]))
+        self.assertEqual(graph.shortest_path((10, 0.2), (10, 0.4))[1], [(10, 0.2, 0.4)])
+        # Non connex
+        self.assertIsNone(graph.shortest_path((10, 0.5), (13, 0.5)))
+
+    def test_route_is_deserializable(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        p2 = PathFactory(geom=LineString((10, 0), (10, 10)))
+        p3 = PathFactory(geom=LineString((10, 10), (20, 10)))
+        length, topology = get_path_graph().route([(p1.pk, 0.5), (p2.pk, 0.5), (p3.pk, 0.5)])
+        self.assertAlmostEqual(length, 20.0)
+        self.assertEqual(topology[0]['paths'], [p1.pk, p2.pk])
+        self.assertEqual(topology[1]['paths'], [p2.pk, p3.pk])
+        topo = Topology.deserialize(topology)
+        self.assertEqual(len(topo.aggregations.all()), 5)
+
+    def test_route_cache_invalidated(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        graph = get_path_graph()
+        self.assertIs(graph, get_path_graph())
+        PathFactory(geom=LineString((10, 0), (10, 10)))
+        self.assertIsNot(graph, get_path_graph())
+        p1.delete()
+        self.assertEqual(len(get_path_graph()), 1)
+
+    def test_json_route(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        p2 = PathFactory(geom=LineString((10, 0), (10, 10)))
+        response = self.client.post(self.url, json.dumps({'steps': [
+            {'path': p1.pk, 'position': 0.0},
+            {'path': p2.pk, 'position': 1.0},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['length'], 20.0)
+        self.assertEqual(response.json()['topology'], [{
+            'offset': 0,
+            'paths': [p1.pk, p2.pk],
+            'positions': {'0': [0.0, 1.0], '1': [0.0, 1.0]},
+        }])
+
+    def test_json_route_get(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        p2 = PathFactory(geom=LineString((10, 0), (10, 10)))
+        response = self.client.get(self.url, {'steps': json.dumps([
+            {'path': p1.pk, 'position': 0.5},
+            {'path': p2.pk, 'position': 0.5},
+        ])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['topology'][0]['paths'], [p1.pk, p2.pk])
+
+    def test_json_route_get_without_steps(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TOPOLOGY_SERVER_ROUTING=True)
+    def test_route_url_in_js_settings(self):
+        response = self.client.get(reverse('common:settings_json'))
+        self.assertEqual(response.json()['urls']['path_route'], self.url)
+
+    def test_no_route_url_in_js_settings_by_default(self):
+        response = self.client.get(reverse('common:settings_json'))
+        self.assertNotIn('path_route', response.json()['urls'])
+
+    def test_json_route_unreachable(self):
+        p1 = PathFactory(geom=LineString((0, 0), (10, 0)))
+        p2 = PathFactory(geom=LineString((20, 0), (30, 0)))
+        response = self.client.post(self.url, json.dumps({'steps': [
+            {'path': p1.pk, 'position': 0.0},
+            {'path': p2.pk, 'position': 1.0},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_json_route_invalid(self):
+        response = self.client.post(self.url, json.dumps({'steps': [{}]}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
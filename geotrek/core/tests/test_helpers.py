@@ -0,0 +1,72 @@
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.gis.geos import Point, LineString
+from django.test import TestCase
+
+from geotrek.core.factories import PathFactory, TopologyFactory, TrailFactory
+from geotrek.core.helpers import SnapError, TopologyBulkWriter
+from geotrek.core.models import Topology
+
+
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class TopologyBulkWriterTest(TestCase):
+    def setUp(self):
+        self.path_1 = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.path_2 = PathFactory.create(geom=LineString((10, 0), (10, 10)))
+
+    def test_lines(self):
+        trails = [TrailFactory.create(paths=[self.path_1]) for i in range(3)]
+        writer = TopologyBulkWriter(batch_size=2)
+        for trail in trails:
+            writer.add(trail, [{'offset': 0,
+                                'paths': [self.path_1.pk, self.path_2.pk],
+                                'positions': {'0': [0.5, 1.0], '1': [0.0, 0.5]}}])
+        # First batch is written as soon as it is full
+        self.assertEqual(writer.topologies_count, 2)
+        writer.flush()
+        for trail in trails:
+            self.assertAlmostEqual(trail.geom.length, 10)
+            self.assertEqual(trail.aggregations.count(), 2)
+            self.assertFalse(trail.deleted)
+            self.assertFalse(Topology.objects.get(pk=trail.pk).geom_need_update)
+        self.assertEqual(writer.topologies_count, 3)
+        self.assertIn('3 topologies (6 path aggregations)', writer.report())
+
+    def test_same_object_twice(self):
+        trail = TrailFactory.create(paths=[self.path_1])
+        writer = TopologyBulkWriter()
+        writer.add(trail, [{'offset': 0, 'paths': [self.path_1.pk]}])
+        writer.add(trail, [{'offset': 0, 'paths': [self.path_2.pk]}])
+        writer.flush()
+        self.assertEqual([aggr.path for aggr in trail.aggregations.all()], [self.path_2])
+
+    def test_points(self):
+        topology = TopologyFactory.create(paths=[self.path_1])
+        point = Point(5, 1, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        writer = TopologyBulkWriter()
+        writer.add(topology, {'lng': point.x, 'lat': point.y})
+        writer.flush()
+        self.assertTrue(topology.ispoint())
+        self.assertAlmostEqual(topology.geom.x, 5)
+        self.assertAlmostEqual(topology.geom.y, 1)
+        self.assertAlmostEqual(abs(topology.offset), 1)
+        self.assertEqual(topology.aggregations.get().path, self.path_1)
+
+    def test_points_snapped(self):
+        topology = TopologyFactory.create(paths=[self.path_1])
+        point = Point(5, 1, srid=settings.SRID).transform(settings.API_SRID, clone=True)
+        writer = TopologyBulkWriter()
+        writer.add(topology, '{"lng": %s, "lat": %s, "snap": %s}' % (point.x, point.y, self.path_2.pk))
+        writer.flush()
+        self.assertEqual(topology.offset, 0)
+        self.assertEqual(topology.aggregations.get().path, self.path_2)
+
+    def test_points_without_path(self):
+        topology = TopologyFactory.create(paths=[self.path_1])
+        self.path_1.delete()
+        self.path_2.delete()
+        writer = TopologyBulkWriter()
+        writer.add(topology, {'lng': 3, 'lat': 46.5})
+        with self.assertRaisesRegex(SnapError, 'No path found to snap point'):
+            writer.flush()
@@ -106,6 +106,35 @@ class InterpolateTest(TestCase):
         self.assertEqual(p.interpolate(Point(3, 46.5, srid=4326)), (0, 0))
 
 
+@skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+class ClosestPositionsTest(TestCase):
+    def setUp(self):
+        self.path_1 = PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        self.path_2 = PathFactory.create(geom=LineString((0, 10), (10, 10)))
+
+    def test_closest_positions(self):
+        positions = Path.closest_positions([(2, 1), (6, 9), (5, 5)], srid=settings.SRID,
+                                           snaps=[None, None, self.path_1.pk])
+        self.assertEqual([p[0] for p in positions], [self.path_1.pk, self.path_2.pk, self.path_1.pk])
+        self.assertAlmostEqual(positions[0][1], 0.2)
+        self.assertAlmostEqual(abs(positions[0][2]), 1)
+        self.assertAlmostEqual(positions[1][1], 0.6)
+        self.assertAlmostEqual(positions[2][1], 0.5)
+        self.assertAlmostEqual(abs(positions[2][2]), 5)
+
+    def test_closest_positions_same_as_interpolate(self):
+        point = Point(3, 46.5, srid=4326)
+        closest = Path.closest(point)
+        position, offset = closest.interpolate(point)
+        self.assertEqual(Path.closest_positions([(3, 46.5)]), [(closest.pk, position, offset)])
+
+    def test_closest_positions_no_path(self):
+        self.path_1.delete()
+        self.path_2.delete()
+        self.assertEqual(Path.closest_positions([(2, 1)], srid=settings.SRID), [None])
+        self.assertEqual(Path.closest_positions([]), [])
+
+
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
 class SnapTest(TestCase):
     def test_snap_not_saved(self):
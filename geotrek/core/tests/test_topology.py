@@ -2,7 +2,7 @@ import json
 import math
 from unittest import skipIf
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.conf import settings
 from django.db import connections, DEFAULT_DB_ALIAS
 from django.contrib.gis.geos import Point, LineString
@@ -911,3 +911,25 @@ class TopologyOverlappingTest(TestCase):
         from geotrek.trekking.models import Trek
         overlaps = Topology.overlapping(Trek.objects.all())
         self.assertEqual(list(overlaps), [])
+
+    def test_overlapping_of_queryset_keeps_first_position(self):
+        overlaps = Topology.overlapping(Topology.objects.filter(pk__in=[self.topo2.pk, self.point3.pk]))
+        self.assertEqual(list(overlaps), [self.topo2,
+                                          self.point1, self.point3, self.point2, self.topo1])
+
+    def test_overlapping_batch(self):
+        overlaps = Topology.overlapping_batch([self.topo1, self.topo2, self.point1])
+        self.assertEqual(overlaps[self.topo1.pk], [self.topo1,
+                                                   self.point2, self.point3, self.point1, self.topo2])
+        self.assertEqual(overlaps[self.topo2.pk], [self.topo2,
+                                                   self.point1, self.point3, self.point2, self.topo1])
+        self.assertEqual(overlaps[self.point1.pk], [self.topo2, self.point1, self.topo1])
+        self.assertEqual(Topology.overlapping_batch([]), {})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_overlapping_cached_per_version(self):
+        self.assertEqual(len(Topology.overlapping(self.topo2)), 5)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(Topology.overlapping(self.topo2)), 5)
+        point4 = TopologyFactory.create(paths=[(self.path2, 0.9, 0.9)])
+        self.assertEqual(list(Topology.overlapping(self.topo2))[-2:], [point4, self.topo1])
@@ -1,3 +1,4 @@
+import json
 import re
 from unittest import skipIf, mock
 
@@ -593,7 +594,7 @@ class PathViewsTest(CommonTest):
         self.modelfactory(draft=False)
         self.modelfactory(draft=True)
         response = self.client.get(obj.get_layer_url(), {"no_draft": "true"})
-        self.assertEqual(len(response.json()['features']), 2)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))['features']), 2)
 
 
 @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
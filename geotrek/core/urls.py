@@ -8,7 +8,7 @@ from geotrek.common.urls import LangConverter
 from geotrek.common.views import ParametersView
 from geotrek.core.models import Path, Trail
 from geotrek.core.views import (
-    get_graph_json, merge_path, PathGPXDetail, PathKMLDetail, TrailGPXDetail, TrailKMLDetail,
+    get_graph_json, get_graph_binary, route_json, merge_path, PathGPXDetail, PathKMLDetail, TrailGPXDetail, TrailKMLDetail,
     MultiplePathDelete
 )
 
@@ -17,6 +17,8 @@ register_converter(LangConverter, 'lang')
 app_name = 'core'
 urlpatterns = [
     path('api/graph.json', get_graph_json, name="path_json_graph"),
+    path('api/graph.bin', get_graph_binary, name="path_binary_graph"),
+    path('api/route.json', route_json, name="path_json_route"),
     path('api/<lang:lang>/parameters.json', ParametersView.as_view(), name='parameters_json'),
     path('mergepath/', merge_path, name="merge_path"),
     re_path(r'^path/delete/(?P<pk>\d+(,\d+)+)/', MultiplePathDelete.as_view(), name="multiple_path_delete"),
@@ -3,6 +3,7 @@ import logging
 from collections import defaultdict
 
 from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Point
 from django.contrib.auth.decorators import permission_required
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
@@ -26,6 +27,7 @@ from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, M
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.utils import classproperty
 from geotrek.common.permissions import PublicOrReadPermMixin
+from geotrek.common.views import RelationsPrefetchMixin
 from geotrek.core.models import AltimetryMixin
 
 from .models import Path, Trail, Topology
@@ -106,7 +108,7 @@ class PathJsonList(MapEntityJsonList, PathList):
         return context
 
 
-class PathFormatList(MapEntityFormat, PathList):
+class PathFormatList(RelationsPrefetchMixin, MapEntityFormat, PathList):
     columns = [
         'id', 'structure', 'valid', 'visible', 'name', 'comments', 'departure', 'arrival',
         'comfort', 'source', 'stake', 'usages', 'networks',
@@ -275,25 +277,85 @@ class PathViewSet(MapEntityViewSet):
 @cache_control(max_age=0, must_revalidate=True)
 @cache_last_modified(lambda x: Path.latest_updated())
 def get_graph_json(request):
+    """
+    Return the graph of the path network. With a ``since`` parameter (the version
+    given in ``X-Graph-Version`` header), return only changes since this version
+    when available.
+    """
+    since = request.GET.get('since')
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        since = None
+    version, content = graph_lib.get_graph_json(since)
+    response = HttpJSONResponse(content)
+    response['X-Graph-Version'] = version
+    return response
+
+
+@login_required
+@cache_control(max_age=0, must_revalidate=True)
+@cache_last_modified(lambda x: Path.latest_updated())
+def get_graph_binary(request):
+    """
+    Return the graph of the path network in the compact binary format
+    described in ``geotrek.core.graph.graph_binary_of_qs()``.
+    """
     cache = caches['fat']
-    key = 'path_graph_json'
+    key = 'path_graph_binary'
 
+    qs = Path.objects.exclude(draft=True)
+    version = (Path.latest_updated(), qs.count())
     result = cache.get(key)
-    latest = Path.latest_updated()
+    if result and result[0] == version:
+        binary_graph = result[1]
+    else:
+        binary_graph = graph_lib.graph_binary_of_qs(qs.order_by('pk'))
+        cache.set(key, (version, binary_graph))
+    return HttpResponse(binary_graph, content_type='application/octet-stream')
+
 
-    if result and latest:
-        cache_latest, json_graph = result
-        # Not empty and still valid
-        if cache_latest and cache_latest >= latest:
-            return HttpJSONResponse(json_graph)
+def _route_step(step):
+    """
+    Convert a routing step into a ``(path_pk, position)`` tuple.
+    Steps are either positions on a path (``{"path": 12, "position": 0.5}``)
+    or points in API_SRID (``{"lat": 5.0, "lng": 10.2}``), snapped on the closest path.
+    """
+    if 'path' in step:
+        return int(step['path']), float(step.get('position', 0.0))
+    point = Point(float(step['lng']), float(step['lat']), srid=settings.API_SRID)
+    point.transform(settings.SRID)
+    if step.get('snap') is not None:
+        closest = Path.objects.get(pk=step['snap'])
+    else:
+        closest = Path.closest(point)
+    position, offset = closest.interpolate(point)
+    return closest.pk, position
 
-    # cache does not exist or is not up to date
-    # rebuild the graph and cache the json
-    graph = graph_lib.graph_edges_nodes_of_qs(Path.objects.exclude(draft=True))
-    json_graph = json.dumps(graph)
 
-    cache.set(key, (latest, json_graph))
-    return HttpJSONResponse(json_graph)
+@login_required
+def route_json(request):
+    """
+    Compute the shortest route going through the steps on the path network,
+    and return it as a serialized topology (see ``Topology.deserialize()``).
+    Steps are posted as JSON (``{"steps": [...]}``) or given as a JSON list in
+    the ``steps`` GET parameter, as done by the topology editor.
+    """
+    if request.method not in ('GET', 'POST'):
+        return JsonResponse({'error': _("Only GET and POST requests are allowed")}, status=405)
+    try:
+        if request.method == 'GET':
+            steps = json.loads(request.GET['steps'])
+        else:
+            steps = json.loads(request.body.decode())['steps']
+        steps = [_route_step(step) for step in steps]
+        result = graph_lib.get_path_graph().route(steps)
+    except (ValueError, KeyError, TypeError, IndexError, Path.DoesNotExist) as exc:
+        return JsonResponse({'error': '%s' % exc}, status=400)
+    if result is None:
+        return JsonResponse({'error': _("No route found between steps")}, status=404)
+    length, topology = result
+    return JsonResponse({'length': length, 'topology': topology})
 
 
 class TrailLayer(MapEntityLayer):
@@ -311,7 +373,7 @@ class TrailJsonList(MapEntityJsonList, TrailList):
     pass
 
 
-class TrailFormatList(MapEntityFormat, TrailList):
+class TrailFormatList(RelationsPrefetchMixin, MapEntityFormat, TrailList):
     columns = [
         'id', 'structure', 'name', 'comments', 'departure', 'arrival',
         'date_insert', 'date_update',
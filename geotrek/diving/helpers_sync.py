@@ -26,6 +26,7 @@ class SyncRando:
         if self.global_sync.portal:
             dives = dives.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
+        self.global_sync.prepare_map_images(dives)
         for dive in dives:
             self.sync_detail(lang, dive)
 
@@ -13,7 +13,7 @@ from rest_framework import permissions as rest_permissions, viewsets
 
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.models import RecordSource, TargetPortal
-from geotrek.common.views import DocumentPublic, MarkupPublic, MetaMixin
+from geotrek.common.views import DocumentPublic, MarkupPublic, MetaMixin, RelationsPrefetchMixin
 
 from .filters import DiveFilterSet
 from .forms import DiveForm
@@ -36,11 +36,11 @@ class DiveList(FlattenPicturesMixin, MapEntityList):
     queryset = Dive.objects.existing()
 
 
-class DiveJsonList(MapEntityJsonList, DiveList):
+class DiveJsonList(RelationsPrefetchMixin, MapEntityJsonList, DiveList):
     pass
 
 
-class DiveFormatList(MapEntityFormat, DiveList):
+class DiveFormatList(RelationsPrefetchMixin, MapEntityFormat, DiveList):
     columns = [
         'id', 'eid', 'structure', 'name', 'departure',
         'description', 'description_teaser',
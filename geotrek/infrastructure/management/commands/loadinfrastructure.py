@@ -8,7 +8,7 @@ from django.db import transaction
 
 from geotrek.authent.models import default_structure
 from geotrek.authent.models import Structure
-from geotrek.core.models import Topology
+from geotrek.core.helpers import TopologyBulkWriter
 from geotrek.infrastructure.models import (InfrastructureType,
                                            InfrastructureCondition, Infrastructure)
 from django.conf import settings
@@ -68,6 +68,7 @@ class Command(BaseCommand):
         field_eid = options.get('eid_field')
 
         sid = transaction.savepoint()
+        self.topology_writer = TopologyBulkWriter()
         structure_default = options.get('structure_default')
 
         try:
@@ -171,9 +172,12 @@ class Command(BaseCommand):
                     self.create_infrastructure(feature_geom, name, type, category, use_structure,
                                                condition, structure, description, year, verbosity, eid)
 
+            self.topology_writer.flush()
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
                 self.stdout.write(self.style.NOTICE("{} objects created.".format(self.counter)))
+                if self.topology_writer.topologies_count:
+                    self.stdout.write(self.style.NOTICE(self.topology_writer.report()))
 
         except Exception:
             self.stdout.write(self.style.ERROR("An error occured, rolling back operations."))
@@ -220,8 +224,7 @@ class Command(BaseCommand):
                 geometry.coord_dim = 2
                 geometry = geometry.transform(settings.API_SRID, clone=True)
                 serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-                topology = Topology.deserialize(serialized)
-                infra.mutate(topology)
+                self.topology_writer.add(infra, serialized)
             except IndexError:
                 raise GEOSException('Invalid Geometry type. You need 1 path')
         else:
@@ -1,12 +1,14 @@
 import os
 from io import StringIO
 
+from django.conf import settings
 from django.contrib.gis.geos.error import GEOSException
 from django.core.management import call_command
 from django.test import TestCase
 from django.core.management.base import CommandError
 
 from geotrek.core.factories import PathFactory
+from geotrek.core.helpers import SnapError
 from geotrek.infrastructure.factories import InfrastructureFactory
 from geotrek.infrastructure.models import Infrastructure
 from geotrek.authent.factories import StructureFactory
@@ -146,7 +148,11 @@ class InfrastructureCommandTest(TestCase):
         StructureFactory.create(name='structure')
         filename = os.path.join(os.path.dirname(__file__), 'data', 'line.geojson')
         output = StringIO()
-        with self.assertRaises(GEOSException):
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            error, message = SnapError, 'No path found to snap point'
+        else:
+            error, message = GEOSException, 'Invalid Geometry type.'
+        with self.assertRaisesRegex(error, message):
             call_command('loadinfrastructure', filename, type_default='label', name_default='name',
                          stdout=output)
         self.assertIn('An error occured, rolling back operations.', output.getvalue())
@@ -5,6 +5,7 @@ from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, M
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
 from geotrek.authent.decorators import same_structure_required
+from geotrek.common.views import RelationsPrefetchMixin
 from geotrek.core.models import AltimetryMixin
 from geotrek.core.views import CreateFromTopologyMixin
 
@@ -28,11 +29,11 @@ class InfrastructureList(MapEntityList):
     columns = ['id', 'name', 'type', 'condition', 'cities']
 
 
-class InfrastructureJsonList(MapEntityJsonList, InfrastructureList):
+class InfrastructureJsonList(RelationsPrefetchMixin, MapEntityJsonList, InfrastructureList):
     pass
 
 
-class InfrastructureFormatList(MapEntityFormat, InfrastructureList):
+class InfrastructureFormatList(RelationsPrefetchMixin, MapEntityFormat, InfrastructureList):
     columns = [
         'id', 'name', 'type', 'condition', 'description',
         'implantation_year', 'published', 'publication_date', 'structure', 'date_insert',
@@ -5,7 +5,7 @@ casper.test.begin('Create a new intervention', function(test) {
     casper.start(utils.baseurl + '/intervention/add/', function () {
         // Workaround a bug if we try to use leaflet draw controls before
         // graph is loaded
-        casper.waitForResource("graph.json");
+        casper.waitForResource("graph.bin");
     });
 
     casper.then(function () {
@@ -1,6 +1,7 @@
 from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, MapEntityFormat,
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
+from geotrek.common.views import RelationsPrefetchMixin
 from geotrek.core.models import AltimetryMixin
 from geotrek.core.views import CreateFromTopologyMixin
 from .models import (PhysicalEdge, LandEdge, CompetenceEdge,
@@ -24,7 +25,7 @@ class PhysicalEdgeJsonList(MapEntityJsonList, PhysicalEdgeList):
     pass
 
 
-class PhysicalEdgeFormatList(MapEntityFormat, PhysicalEdgeList):
+class PhysicalEdgeFormatList(RelationsPrefetchMixin, MapEntityFormat, PhysicalEdgeList):
     columns = [
         'id', 'physical_type',
         'date_insert', 'date_update',
@@ -69,7 +70,7 @@ class LandEdgeJsonList(MapEntityJsonList, LandEdgeList):
     pass
 
 
-class LandEdgeFormatList(MapEntityFormat, LandEdgeList):
+class LandEdgeFormatList(RelationsPrefetchMixin, MapEntityFormat, LandEdgeList):
     columns = [
         'id', 'land_type', 'owner', 'agreement',
         'date_insert', 'date_update',
@@ -114,7 +115,7 @@ class CompetenceEdgeJsonList(MapEntityJsonList, CompetenceEdgeList):
     pass
 
 
-class CompetenceEdgeFormatList(MapEntityFormat, CompetenceEdgeList):
+class CompetenceEdgeFormatList(RelationsPrefetchMixin, MapEntityFormat, CompetenceEdgeList):
     columns = [
         'id', 'organization',
         'date_insert', 'date_update',
@@ -159,7 +160,7 @@ class WorkManagementEdgeJsonList(MapEntityJsonList, WorkManagementEdgeList):
     pass
 
 
-class WorkManagementEdgeFormatList(MapEntityFormat, WorkManagementEdgeList):
+class WorkManagementEdgeFormatList(RelationsPrefetchMixin, MapEntityFormat, WorkManagementEdgeList):
     columns = [
         'id', 'organization',
         'date_insert', 'date_update',
@@ -204,7 +205,7 @@ class SignageManagementEdgeJsonList(MapEntityJsonList, SignageManagementEdgeList
     pass
 
 
-class SignageManagementEdgeFormatList(MapEntityFormat, SignageManagementEdgeList):
+class SignageManagementEdgeFormatList(RelationsPrefetchMixin, MapEntityFormat, SignageManagementEdgeList):
     columns = [
         'id', 'organization',
         'date_insert', 'date_update',
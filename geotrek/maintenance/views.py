@@ -5,7 +5,7 @@ from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, M
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
 from geotrek.altimetry.models import AltimetryMixin
-from geotrek.common.views import FormsetMixin
+from geotrek.common.views import FormsetMixin, RelationsPrefetchMixin
 from geotrek.authent.decorators import same_structure_required
 from .models import Intervention, Project
 from .filters import InterventionFilterSet, ProjectFilterSet
@@ -35,7 +35,7 @@ class InterventionJsonList(MapEntityJsonList, InterventionList):
     pass
 
 
-class InterventionFormatList(MapEntityFormat, InterventionList):
+class InterventionFormatList(RelationsPrefetchMixin, MapEntityFormat, InterventionList):
     columns = [
         'id', 'name', 'date', 'type', 'target', 'status', 'stake',
         'disorders', 'total_manday', 'project', 'subcontracting',
@@ -126,7 +126,7 @@ class ProjectJsonList(MapEntityJsonList, ProjectList):
     pass
 
 
-class ProjectFormatList(MapEntityFormat, ProjectList):
+class ProjectFormatList(RelationsPrefetchMixin, MapEntityFormat, ProjectList):
     columns = [
         'id', 'structure', 'name', 'period', 'type', 'domain', 'constraint', 'global_cost',
         'interventions', 'interventions_total_cost', 'comments', 'contractors',
@@ -117,7 +117,7 @@ class BiodivWithPracticeParser(BiodivParser):
 
 
 class BiodivParserTests(TranslationResetMixin, TestCase):
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -152,7 +152,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(area_2.eid, '2')
         self.assertEqual(area_2.geom.geom_type, 'MultiPolygon')
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_with_practice(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -166,7 +166,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.sensitivity.tests.test_parsers.BiodivWithPracticeParser', verbosity=0)
         self.assertEqual(SportPractice.objects.count(), 2)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_status_code_404(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -177,7 +177,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         with self.assertRaisesRegex(CommandError, "Failed to download https://biodiv-sports.fr/api/v2/sportpractice/"):
             call_command('import', 'geotrek.sensitivity.parsers.BiodivParser', verbosity=0)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_status_code_404_practice(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -192,7 +192,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         with self.assertRaisesRegex(CommandError, "Failed to download https://rhododendron.com. HTTP status code 404"):
             call_command('import', 'geotrek.sensitivity.parsers.BiodivParser', verbosity=0)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_no_id(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -218,7 +218,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         self.assertQuerysetEqual(species.practices.all(), ['<SportPractice: Land>'])
         self.assertEqual(area.eid, '1')
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_species_url(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
@@ -236,7 +236,7 @@ class BiodivParserTests(TranslationResetMixin, TestCase):
         species = Species.objects.first()
         self.assertEqual(species.url, "toto.com")
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_species_radius(self, mocked):
         def side_effect(url, allow_redirects):
             response = requests.Response()
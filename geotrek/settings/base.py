@@ -377,6 +377,8 @@ MAPENTITY_CONFIG = {
                                                os.getenv('CONVERSION_PORT', '6543')),
     'CAPTURE_SERVER': 'http://{}:{}'.format(os.getenv('CAPTURE_HOST', 'screamshotter'),
                                             os.getenv('CAPTURE_PORT', '8000')),
+    # Stale map images of documents are rendered by celery, while the previous one is used
+    'MAP_CAPTURE_QUEUE': 'geotrek.common.tasks.queue_map_image',
     'MAP_BACKGROUND_FOGGED': True,
     'GEOJSON_LAYERS_CACHE_BACKEND': 'fat',
     'SENDFILE_HTTP_HEADER': 'X-Accel-Redirect',
@@ -417,6 +419,7 @@ PATHS_LINE_MARKER = 'dotL'
 PATH_SNAPPING_DISTANCE = 1  # Distance of path snapping in meters
 SNAP_DISTANCE = 30  # Distance of snapping in pixels
 PATH_MERGE_SNAPPING_DISTANCE = 2  # minimum distance to merge paths
+TOPOLOGY_SERVER_ROUTING = False  # Topology editor asks routes to the server instead of loading the path graph
 
 ALTIMETRIC_PROFILE_PRECISION = 25  # Sampling precision in meters
 ALTIMETRIC_PROFILE_AVERAGE = 2  # nb of points for altimetry moving average
@@ -605,6 +608,9 @@ MOBILE_TILES_RADIUS_SMALL = 0.005  # ~500 m
 MOBILE_TILES_GLOBAL_ZOOMS = list(range(13))
 MOBILE_TILES_LOW_ZOOMS = list(range(13, 15))
 MOBILE_TILES_HIGH_ZOOMS = list(range(15, 17))
+MOBILE_TILES_STORE_DIR = os.path.join(VAR_DIR, 'tiles')
+MOBILE_TILES_STORE_MAX_AGE = 30  # days
+MOBILE_TILES_WORKERS = 8
 MOBILE_CATEGORY_PICTO_SIZE = 32
 MOBILE_POI_PICTO_SIZE = 32
 MOBILE_INFORMATIONDESKTYPE_PICTO_SIZE = 32
@@ -25,6 +25,8 @@ MODELTRANSLATION_LANGUAGES = ('en', 'es', 'fr', 'it')
 
 LAND_BBOX_AREAS_ENABLED = True
 
+MOBILE_TILES_STORE_DIR = os.path.join('var', 'tmp_tiles')
+
 TIME_ZONE = "UTC"
 
 
@@ -8,7 +8,7 @@ from django.db import transaction
 
 from geotrek.authent.models import default_structure
 from geotrek.authent.models import Structure
-from geotrek.core.models import Topology
+from geotrek.core.helpers import TopologyBulkWriter
 from geotrek.signage.models import Signage, SignageType
 from geotrek.infrastructure.models import InfrastructureCondition
 from django.conf import settings
@@ -60,6 +60,7 @@ class Command(BaseCommand):
         field_eid = options.get('eid_field')
 
         sid = transaction.savepoint()
+        self.topology_writer = TopologyBulkWriter()
         structure_default = options.get('structure_default')
 
         try:
@@ -153,9 +154,12 @@ class Command(BaseCommand):
                     self.create_signage(feature_geom, name, type, condition, structure, description, year,
                                         verbosity, eid, use_structure)
 
+            self.topology_writer.flush()
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
                 self.stdout.write(self.style.NOTICE("{} objects created.".format(self.counter)))
+                if self.topology_writer.topologies_count:
+                    self.stdout.write(self.style.NOTICE(self.topology_writer.report()))
 
         except Exception:
             self.stdout.write(self.style.ERROR("An error occured, rolling back operations."))
@@ -202,8 +206,7 @@ class Command(BaseCommand):
                 geometry = geometry.transform(settings.API_SRID, clone=True)
                 geometry.coord_dim = 2
                 serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-                topology = Topology.deserialize(serialized)
-                infra.mutate(topology)
+                self.topology_writer.add(infra, serialized)
             except IndexError:
                 raise GEOSException('Invalid Geometry type.')
         else:
@@ -1,13 +1,13 @@
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 import logging
 from mapentity.views import (MapEntityLayer, MapEntityList, MapEntityJsonList, MapEntityFormat, MapEntityViewSet,
                              MapEntityDetail, MapEntityDocument, MapEntityCreate, MapEntityUpdate, MapEntityDelete)
 
 from geotrek.authent.decorators import same_structure_required
-from geotrek.common.views import FormsetMixin
+from geotrek.common.views import FormsetMixin, RelationsPrefetchMixin
 from geotrek.core.models import AltimetryMixin
 
 from geotrek.signage.filters import SignageFilterSet, BladeFilterSet
@@ -43,7 +43,7 @@ class SignageJsonList(MapEntityJsonList, SignageList):
     pass
 
 
-class SignageFormatList(MapEntityFormat, SignageList):
+class SignageFormatList(RelationsPrefetchMixin, MapEntityFormat, SignageList):
     columns = [
         'id', 'structure', 'name', 'code', 'type', 'condition', 'description',
         'implantation_year', 'published', 'date_insert',
@@ -203,8 +203,6 @@ class BladeFormatList(MapEntityFormat, BladeList):
 
     def shape_view(self, request, context, **kwargs):
         serializer = ZipBladeShapeSerializer()
-        response = HttpResponse(content_type='application/zip')
-        serializer.serialize(queryset=self.get_queryset(), model=Blade,
-                             stream=response, fields=self.columns)
-        response['Content-length'] = str(len(response.content))
-        return response
+        return StreamingHttpResponse(serializer.stream(queryset=self.get_queryset(), model=Blade,
+                                                       fields=self.columns),
+                                     content_type='application/zip')
@@ -49,6 +49,7 @@ class SyncRando:
         if self.global_sync.portal:
             contents = contents.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
+        self.global_sync.prepare_map_images(contents)
         for content in contents:
             self.sync_content(lang, content)
 
@@ -61,6 +62,7 @@ class SyncRando:
         if self.global_sync.portal:
             events = events.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
+        self.global_sync.prepare_map_images(events)
         for event in events:
             self.sync_event(lang, event)
 
@@ -69,6 +69,7 @@ class ApidaeParser(AttachmentParserMixin, Parser):
     }
     size = 100
     skip = 0
+    modification_field = 'gestion.dateModification'
     responseFields = [
         'id',
         'nom',
@@ -95,24 +96,23 @@ class ApidaeParser(AttachmentParserMixin, Parser):
             return []
         return self.root['objetsTouristiques']
 
+    def fetch_page(self, skip):
+        params = {
+            'apiKey': self.api_key,
+            'projetId': self.project_id,
+            'selectionIds': [self.selection_id],
+            'count': self.size,
+            'first': skip,
+            'responseFields': self.responseFields
+        }
+        response = self.request_or_retry(self.url, params={'query': json.dumps(params)})
+        return response.json()
+
     def next_row(self):
-        while True:
-            params = {
-                'apiKey': self.api_key,
-                'projetId': self.project_id,
-                'selectionIds': [self.selection_id],
-                'count': self.size,
-                'first': self.skip,
-                'responseFields': self.responseFields
-            }
-            response = self.request_or_retry(self.url, params={'query': json.dumps(params)})
-            self.root = response.json()
+        for self.root in self.paginate(self.fetch_page, lambda root: int(root['numFound']), self.size, self.skip):
             self.nb = int(self.root['numFound'])
             for row in self.items:
                 yield row
-            self.skip += self.size
-            if self.skip >= self.nb:
-                return
 
     def normalize_field_name(self, name):
         return name
@@ -78,7 +78,7 @@ class FMA28(TouristicEventTourInSoftParser):
 
 
 class ParserTests(TranslationResetMixin, TestCase):
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae_failed(self, mocked):
         mocked.return_value.status_code = 404
         FileType.objects.create(type="Photographie")
@@ -88,7 +88,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaises(CommandError):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=2)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_failed(self, mocked):
         mocked.return_value.status_code = 404
         FileType.objects.create(type="Photographie")
@@ -103,7 +103,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaises(CommandError):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=2)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
     @mock.patch('geotrek.common.parsers.AttachmentParserMixin.download_attachments', False)
     def test_create_content_espritparc_retry(self, mocked):
@@ -131,7 +131,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser')
         self.assertEqual(TouristicContent.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     @override_settings(PARSER_RETRY_SLEEP_TIME=0)
     def test_create_content_espritparc_retry_fail(self, mocked):
         def mocked_json():
@@ -154,7 +154,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         with self.assertRaisesRegex(CommandError, "Failed to download %s. HTTP status code 503" % EauViveParser.url):
             call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser')
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_not_fail_type1_does_not_exist(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -175,7 +175,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertIn("Type 1 'Miel' does not exist for category 'Miels et produits de la ruche'. Please add it,",
                       output.getvalue())
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_espritparc_not_fail_type2_does_not_exist(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -197,7 +197,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertIn("Type 2 'Bienvenue à la ferme' does not exist for category 'Miels et produits de la ruche'. Please add it",
                       output.getvalue())
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -237,7 +237,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_filetype_structure_none(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -254,7 +254,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.tests.test_parsers.EauViveParser', verbosity=0)
         self.assertEqual(TouristicContent.objects.count(), 1)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_no_event_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeNoEvent.json')
@@ -268,7 +268,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         call_command('import', 'geotrek.tourism.parsers.TouristicEventApidaeParser', verbosity=2, stdout=output)
         self.assertEqual(TouristicEvent.objects.count(), 0)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_apidae(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeEvent.json')
@@ -308,7 +308,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         )
         self.assertEqual(Attachment.objects.count(), 3)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_apidae_constant_fields(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeEvent.json')
@@ -333,7 +333,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertQuerysetEqual(event.source.all(), ["Source 1", "Source 2"], transform=str)
         self.assertQuerysetEqual(event.portal.all(), ["Portal 1", "Portal 2"], transform=str)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_apidae_constant_fields(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'apidaeContent.json')
@@ -360,7 +360,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertQuerysetEqual(content.source.all(), ["Source 1", "Source 2"], transform=str)
         self.assertQuerysetEqual(content.portal.all(), ["Portal 1", "Portal 2"], transform=str)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_esprit(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'espritparc.json')
@@ -401,7 +401,7 @@ class ParserTests(TranslationResetMixin, TestCase):
             self.assertIn(one.name.lower(), name)
             self.assertEqual(one.category, category)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_tourinsoft_v2(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftContent.json')
@@ -438,7 +438,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_content_tourinsoft_v3(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftContentV3.json')
@@ -475,7 +475,7 @@ class ParserTests(TranslationResetMixin, TestCase):
         self.assertEqual(Attachment.objects.count(), 3)
         self.assertEqual(Attachment.objects.first().content_object, content)
 
-    @mock.patch('requests.get')
+    @mock.patch('requests.Session.get')
     def test_create_event_tourinsoft(self, mocked):
         def mocked_json():
             filename = os.path.join(os.path.dirname(__file__), 'data', 'tourinsoftEvent.json')
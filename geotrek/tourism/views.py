@@ -20,7 +20,7 @@ from rest_framework.views import APIView
 
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.models import RecordSource, TargetPortal
-from geotrek.common.views import DocumentPublic, MarkupPublic, MetaMixin
+from geotrek.common.views import DocumentPublic, MarkupPublic, MetaMixin, RelationsPrefetchMixin
 from django.shortcuts import get_object_or_404
 from geotrek.trekking.models import Trek
 
@@ -59,7 +59,7 @@ class TouristicContentJsonList(MapEntityJsonList, TouristicContentList):
     pass
 
 
-class TouristicContentFormatList(MapEntityFormat, TouristicContentList):
+class TouristicContentFormatList(RelationsPrefetchMixin, MapEntityFormat, TouristicContentList):
     columns = [
         'id', 'structure', 'eid', 'name', 'category', 'type1', 'type2', 'description_teaser',
         'description', 'themes', 'contact', 'email', 'website', 'practical_info',
@@ -170,7 +170,7 @@ class TouristicEventJsonList(MapEntityJsonList, TouristicEventList):
     pass
 
 
-class TouristicEventFormatList(MapEntityFormat, TouristicEventList):
+class TouristicEventFormatList(RelationsPrefetchMixin, MapEntityFormat, TouristicEventList):
     columns = [
         'id', 'structure', 'eid', 'name', 'type', 'description_teaser', 'description', 'themes',
         'begin_date', 'end_date', 'duration', 'meeting_point', 'meeting_time',
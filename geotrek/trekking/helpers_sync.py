@@ -1,10 +1,13 @@
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 
 import os
 from zipfile import ZipFile
 
 from geotrek.common import views as common_views
+from geotrek.common.models import Attachment
+from geotrek.common.utils import uniquify
 from geotrek.trekking import views
 from geotrek.trekking import models
 
@@ -19,6 +22,11 @@ class SyncRando:
         self.global_sync = sync
 
     def sync(self, lang):
+        # Shared by every trek, synced outside trek units to be up to date even if all treks are unchanged
+        self.global_sync.sync_json(lang, common_views.ParametersView, 'parameters', zipfile=self.global_sync.zipfile)
+        self.global_sync.sync_json(lang, common_views.ThemeViewSet, 'themes', as_view_args=[{'get': 'list'}],
+                                   zipfile=self.global_sync.zipfile)
+        self.global_sync.sync_metas(lang, common_views.Meta)
         self.global_sync.sync_geojson(lang, views.POIViewSet, 'pois.geojson', zipfile=self.global_sync.zipfile)
         self.global_sync.sync_geojson(lang, views.TrekViewSet, 'treks.geojson', zipfile=self.global_sync.zipfile)
         self.global_sync.sync_geojson(lang, views.ServiceViewSet, 'services.geojson', zipfile=self.global_sync.zipfile)
@@ -40,8 +48,42 @@ class SyncRando:
         if self.global_sync.portal:
             treks = treks.filter(Q(portal__name=self.global_sync.portal) | Q(portal=None))
 
-        for trek in treks:
-            self.sync_detail(lang, trek)
+        # Treks may be selected several times through their parents
+        treks = uniquify(treks)
+        self.global_sync.prepare_map_images(treks)
+        pks = [trek.pk for trek in treks]
+        self.global_sync.run_units('treks/{lang}'.format(lang=lang), pks, lambda pk: self.sync_unit(lang, pk))
+
+    def sync_unit(self, lang, pk):
+        trek = models.Trek.objects.get(pk=pk)
+        self.sync_detail(lang, trek)
+        return self.dependencies(trek)
+
+    def dependencies(self, trek):
+        """
+        Objects shown in trek files, which must be synced again if one of them is modified or removed
+        (see sync_rando --incremental)
+        """
+        pois = [poi.pk for poi in trek.pois]
+        dependencies = ['poi:{}'.format(pk) for pk in pois]
+        attachments = Attachment.objects.filter(
+            Q(content_type=ContentType.objects.get_for_model(models.Trek), object_id=trek.pk)
+            | Q(content_type=ContentType.objects.get_for_model(models.POI), object_id__in=pois)
+        )
+        dependencies += ['attachment:{}'.format(pk) for pk in attachments.values_list('pk', flat=True)]
+        dependencies += ['service:{}'.format(service.pk) for service in trek.services]
+        if self.global_sync.with_signages:
+            dependencies += ['signage:{}'.format(signage.pk) for signage in trek.signages]
+        if self.global_sync.with_infrastructures:
+            dependencies += ['infrastructure:{}'.format(infrastructure.pk) for infrastructure in trek.infrastructures]
+        if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+            dependencies += ['sensitivearea:{}'.format(area.pk) for area in trek.sensitive_areas]
+        if 'geotrek.tourism' in settings.INSTALLED_APPS:
+            if self.global_sync.categories:
+                dependencies += ['touristiccontent:{}'.format(content.pk) for content in trek.touristic_contents]
+            if self.global_sync.with_events:
+                dependencies += ['touristicevent:{}'.format(event.pk) for event in trek.touristic_events]
+        return dependencies
 
     def sync_detail(self, lang, trek):
         zipname = os.path.join('zip', 'treks', lang, '{pk}.zip'.format(pk=trek.pk))
@@ -49,9 +91,6 @@ class SyncRando:
         self.global_sync.mkdirs(zipfullname)
         self.trek_zipfile = ZipFile(zipfullname, 'w')
 
-        self.global_sync.sync_json(lang, common_views.ParametersView, 'parameters', zipfile=self.global_sync.zipfile)
-        self.global_sync.sync_json(lang, common_views.ThemeViewSet, 'themes', as_view_args=[{'get': 'list'}],
-                                   zipfile=self.global_sync.zipfile)
         self.sync_trek_pois(lang, trek, zipfile=self.global_sync.zipfile)
         if self.global_sync.with_infrastructures:
             self.sync_trek_infrastructures(lang, trek)
@@ -61,7 +100,6 @@ class SyncRando:
         self.sync_trek_gpx(lang, trek)
         self.sync_trek_kml(lang, trek)
         self.global_sync.sync_metas(lang, views.TrekMeta, trek)
-        self.global_sync.sync_metas(lang, common_views.Meta)
         if settings.USE_BOOKLET_PDF:
             self.global_sync.sync_pdf(lang, trek, views.TrekDocumentBookletPublic.as_view(model=type(trek)))
         else:
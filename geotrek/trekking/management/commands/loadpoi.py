@@ -6,7 +6,7 @@ from django.contrib.gis.gdal import DataSource
 from django.contrib.gis.geos import Point
 from django.db import transaction
 
-from geotrek.core.models import Topology
+from geotrek.core.helpers import TopologyBulkWriter
 from geotrek.trekking.models import POI, POIType
 
 
@@ -38,6 +38,7 @@ class Command(BaseCommand):
         field_description = options.get('description_field')
 
         sid = transaction.savepoint()
+        self.topology_writer = TopologyBulkWriter()
 
         try:
             for layer in data_source:
@@ -69,9 +70,12 @@ class Command(BaseCommand):
                     if verbosity >= 2:
                         self.stdout.write(self.style.NOTICE("{} POI created.".format(name)))
 
+            self.topology_writer.flush()
             transaction.savepoint_commit(sid)
             if verbosity >= 2:
                 self.stdout.write(self.style.NOTICE("{} objects created.".format(self.counter)))
+                if self.topology_writer.topologies_count:
+                    self.stdout.write(self.style.NOTICE(self.topology_writer.report()))
 
         except Exception:
             self.stdout.write(self.style.ERROR("An error occured, rolling back operations."))
@@ -87,9 +91,8 @@ class Command(BaseCommand):
             geometry = geometry.transform(settings.API_SRID, clone=True)
             geometry.coord_dim = 2
             serialized = '{"lng": %s, "lat": %s}' % (geometry.x, geometry.y)
-            topology = Topology.deserialize(serialized)
-            # Move deserialization aggregations to the POI
-            poi.mutate(topology)
+            # Move deserialization aggregations to the POI (in batch)
+            self.topology_writer.add(poi, serialized)
         else:
             if geometry.geom_type != 'Point':
                 raise TypeError
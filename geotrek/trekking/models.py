@@ -17,7 +17,7 @@ from mapentity.serializers import plain_text
 from geotrek.api.v2.functions import LineLocatePoint, Transform
 from geotrek.authent.models import StructureRelated
 from geotrek.core.models import Path, Topology, simplify_coords
-from geotrek.common.utils import intersecting, classproperty
+from geotrek.common.utils import intersecting, intersecting_batch, classproperty
 from geotrek.common.mixins import (PicturesMixin, PublishableMixin,
                                    PictogramMixin, OptionalPictogramMixin, NoDeleteManager)
 from geotrek.common.models import Theme, ReservationSystem
@@ -278,6 +278,15 @@ class Trek(Topology, StructureRelated, PicturesMixin, PublishableMixin, MapEntit
             qs = cls.objects.existing().filter(geom__intersects=area)
         return qs
 
+    @classmethod
+    def topology_treks_batch(cls, topologies):
+        """ Like ``topology_treks()``, for many topologies at once:
+        return a dict {topology pk: [treks]}
+        """
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            return cls.overlapping_batch(topologies)
+        return intersecting_batch(cls, topologies, distance=settings.TREK_POI_INTERSECTION_MARGIN)
+
     @classmethod
     def published_topology_treks(cls, topology):
         return cls.topology_treks(topology).filter(published=True)
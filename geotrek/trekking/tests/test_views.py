@@ -146,6 +146,36 @@ class POIViewsTest(CommonTest):
         with self.assertNumQueries(9):
             self.client.get(self.model.get_format_list_url())
 
+    def test_list_in_csv(self):
+        self.login()
+        polygon = 'SRID=%s;MULTIPOLYGON(((0 0, 0 3, 3 3, 3 0, 0 0)))' % settings.SRID
+        CityFactory(geom=polygon, name="Trifouilli")
+        DistrictFactory(geom=polygon, name="District")
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            path = PathFactory.create(geom='SRID=%s;LINESTRING(0 0, 1 0)' % settings.SRID)
+            poi = POIFactory.create(paths=[(path, 0.5, 0.5)])
+            other_poi = POIFactory.create(paths=[(path, 0.2, 0.2)])
+            trek = TrekFactory.create(paths=[path], name="Visible")
+            trek_excluded = TrekFactory.create(paths=[path], name="Excluded")
+        else:
+            poi = POIFactory.create(geom='SRID=%s;POINT(0.5 0)' % settings.SRID)
+            other_poi = POIFactory.create(geom='SRID=%s;POINT(0.2 0)' % settings.SRID)
+            trek = TrekFactory.create(geom='SRID=%s;LINESTRING(0 0, 1 0)' % settings.SRID, name="Visible")
+            trek_excluded = TrekFactory.create(geom='SRID=%s;LINESTRING(0 0, 1 0)' % settings.SRID,
+                                               name="Excluded")
+        trek_excluded.pois_excluded.add(poi)
+
+        response = self.client.get(self.model.get_format_list_url() + '?format=csv')
+        self.assertEqual(response.status_code, 200)
+        reader = csv.DictReader(StringIO(b''.join(response.streaming_content).decode("utf-8")), delimiter=',')
+        rows = dict([(int(row['ID']), row) for row in reader])
+        self.assertEqual(len(rows), 2)
+        for row in rows.values():
+            self.assertEqual(row['Cities'], "Trifouilli")
+            self.assertEqual(row['Districts'], "District")
+        self.assertEqual(rows[poi.pk]['Treks'], trek.name)
+        self.assertEqual(sorted(rows[other_poi.pk]['Treks'].split(', ')), [trek_excluded.name, trek.name])
+
     def test_pois_on_treks_do_not_exist(self):
         self.login()
         self.modelfactory.create()
@@ -431,7 +461,7 @@ class TrekViewsTest(CommonTest):
         self.assertEqual(response.get('Content-Type'), 'text/csv')
 
         # Read the csv
-        reader = csv.DictReader(StringIO(response.content.decode("utf-8")), delimiter=',')
+        reader = csv.DictReader(StringIO(b''.join(response.streaming_content).decode("utf-8")), delimiter=',')
         for row in reader:
             self.assertEqual(row['Cities'], "Trifouilli, Refouilli")
             self.assertEqual(row['Districts'], self.district.name)
@@ -1008,6 +1038,14 @@ class TrekJSONDetailTest(TrekJSONSetUp):
         self.assertIn('%s.120x120_q85_crop.png'
                       % self.attachment.attachment_file.name, self.trek.thumbnail_csv_display)
 
+    def test_prefetch_pictures(self):
+        pictures = list(self.trek.pictures)
+        trek = Trek.objects.get(pk=self.trek.pk)
+        Trek.prefetch_pictures([trek])
+        with self.assertNumQueries(0):
+            self.assertEqual(trek.pictures, pictures)
+            self.assertIn('%s.120x120_q85_crop.png' % self.attachment.attachment_file.name, trek.thumbnail_display)
+
     def test_reservation(self):
         self.assertEqual(self.result['reservation_system'], self.trek.reservation_system.name)
         self.assertEqual(self.result['reservation_id'], 'XXXXXXXXX')
@@ -21,11 +21,10 @@ from geotrek.api.v2.functions import Length
 from geotrek.authent.decorators import same_structure_required
 from geotrek.common.models import Attachment, RecordSource, TargetPortal, Label
 from geotrek.common.views import (FormsetMixin, MetaMixin, DocumentPublic,
-                                  DocumentBookletPublic, MarkupPublic)
+                                  DocumentBookletPublic, MarkupPublic, RelationsPrefetchMixin)
 from geotrek.common.permissions import PublicOrReadPermMixin
 from geotrek.core.models import AltimetryMixin
 from geotrek.core.views import CreateFromTopologyMixin
-from geotrek.zoning.models import District, City, RestrictedArea
 
 from .filters import TrekFilterSet, POIFilterSet, ServiceFilterSet
 from .forms import (TrekForm, TrekRelationshipFormSet, POIForm,
@@ -65,11 +64,11 @@ class TrekList(FlattenPicturesMixin, MapEntityList):
     queryset = Trek.objects.existing()
 
 
-class TrekJsonList(MapEntityJsonList, TrekList):
+class TrekJsonList(RelationsPrefetchMixin, MapEntityJsonList, TrekList):
     pass
 
 
-class TrekFormatList(MapEntityFormat, TrekList):
+class TrekFormatList(RelationsPrefetchMixin, MapEntityFormat, TrekList):
     columns = [
         'id', 'eid', 'eid2', 'structure', 'name', 'departure', 'arrival', 'duration',
         'duration_pretty', 'description', 'description_teaser',
@@ -251,11 +250,11 @@ class POIList(FlattenPicturesMixin, MapEntityList):
     queryset = model.objects.existing()
 
 
-class POIJsonList(MapEntityJsonList, POIList):
+class POIJsonList(RelationsPrefetchMixin, MapEntityJsonList, POIList):
     pass
 
 
-class POIFormatList(MapEntityFormat, POIList):
+class POIFormatList(RelationsPrefetchMixin, MapEntityFormat, POIList):
     columns = [
         'id', 'structure', 'eid', 'name', 'type', 'description', 'treks',
         'review', 'published', 'publication_date',
@@ -265,34 +264,14 @@ class POIFormatList(MapEntityFormat, POIList):
 
     set(POIList.columns + ['description', 'treks', 'districts', 'cities', 'areas', 'structure'])
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-
-        denormalized = {}
-
-        # Since Land layers should have less records, start by them.
-        land_layers = [('districts', District),
-                       ('cities', City),
-                       ('areas', RestrictedArea)]
-        for attrname, land_layer in land_layers:
-            denormalized[attrname] = {}
-            for d in land_layer.objects.all():
-                overlapping = POI.objects.existing().filter(geom__within=d.geom)
-                for pid in overlapping.values_list('id', flat=True):
-                    denormalized[attrname].setdefault(pid, []).append(d)
-
-        # Same for treks
-        denormalized['treks'] = {}
-        for d in Trek.objects.existing():
-            for pid in d.pois.all():
-                denormalized['treks'].setdefault(pid, []).append(d)
-
-        for poi in qs:
-            # Put denormalized in specific attribute used in serializers
-            for attrname in denormalized.keys():
-                overlapping = denormalized[attrname].get(poi.id, [])
-                setattr(poi, '%s_csv_display' % attrname, overlapping)
-            yield poi
+    def prefetch_objects(self, objects):
+        """Treks of POIs are the ones where they are not excluded"""
+        objects = super().prefetch_objects(objects)
+        excluded = set(Trek.pois_excluded.through.objects.filter(poi__in=[poi.pk for poi in objects])
+                       .values_list('trek_id', 'poi_id'))
+        for poi in objects:
+            poi.treks_csv_display = [trek for trek in poi.treks_csv_display if (trek.pk, poi.pk) not in excluded]
+        return objects
 
 
 class POIDetail(MapEntityDetail):
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.zoning.models import ZoningMembership
+
+
+class Command(BaseCommand):
+    help = "Compute again zones crossed by every object (they are kept up to date by triggers otherwise)"
+
+    def handle(self, *args, **options):
+        ZoningMembership.refresh()
+        if options['verbosity'] > 0:
+            self.stdout.write("{} zoning memberships computed".format(ZoningMembership.objects.count()))
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zoning', '0100_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoningMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_table', models.CharField(max_length=100)),
+                ('object_id', models.IntegerField()),
+                ('zone_type', models.CharField(choices=[('city', 'City'), ('district', 'District'), ('restrictedarea', 'Restricted area')], max_length=16)),
+                ('zone_id', models.CharField(max_length=16)),
+                ('ordering', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='zoningmembership',
+            index=models.Index(fields=['object_table', 'object_id'], name='zoning_zoni_object__bf6605_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='zoningmembership',
+            index=models.Index(fields=['zone_type', 'zone_id'], name='zoning_zoni_zone_ty_58506d_idx'),
+        ),
+    ]
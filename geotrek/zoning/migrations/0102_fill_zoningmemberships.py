@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Initial fill of memberships (see zoning_refresh_memberships() in post_20_memberships.sql,
+# which is not created yet when migrations are applied). Triggers keep them up to date.
+FILL_MEMBERSHIPS = """
+DO $$
+DECLARE
+    t text;
+    ztype text;
+    zpk text;
+BEGIN
+    DELETE FROM zoning_zoningmembership;
+    FOREACH t IN ARRAY ARRAY['core_path', 'core_topology', 'tourism_touristiccontent', 'tourism_touristicevent',
+                             'diving_dive', 'outdoor_site', 'outdoor_course'] LOOP
+        CONTINUE WHEN to_regclass(t) IS NULL;
+        FOREACH ztype IN ARRAY ARRAY['city', 'district', 'restrictedarea'] LOOP
+            zpk := CASE WHEN ztype = 'city' THEN 'code' ELSE 'id' END;
+            EXECUTE 'INSERT INTO zoning_zoningmembership (object_table, object_id, zone_type, zone_id, ordering)
+                     SELECT ' || quote_literal(t) || ', o.id, ' || quote_literal(ztype) || ', z.' || quote_ident(zpk) || '::text,
+                            CASE WHEN GeometryType(o.geom) = ''LINESTRING'' THEN
+                                (SELECT min(ST_LineLocatePoint(o.geom, ST_StartPoint(d.geom)))
+                                 FROM ST_Dump(ST_Intersection(o.geom, z.geom)) AS d)
+                            END
+                     FROM ' || quote_ident(t) || ' AS o
+                     JOIN ' || quote_ident('zoning_' || ztype) || ' AS z ON ST_Intersects(o.geom, z.geom)';
+        END LOOP;
+    END LOOP;
+END;
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zoning', '0101_zoningmembership'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FILL_MEMBERSHIPS, reverse_sql=migrations.RunSQL.noop),
+    ]
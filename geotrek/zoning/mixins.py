@@ -1,8 +1,96 @@
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
 from django.utils.translation import gettext_lazy as _
-from .models import RestrictedArea, District, City
+from .models import RestrictedArea, District, City, ZoningMembership
 from geotrek.common.utils import intersecting, uniquify
 
 
+ZONE_MODELS = {
+    'city': City,
+    'district': District,
+    'restrictedarea': RestrictedArea,
+}
+
+# Tables of objects whose memberships are maintained (see sql/post_20_memberships.sql)
+MEMBERSHIP_TABLES = (
+    'core_path',
+    'core_topology',
+    'tourism_touristiccontent',
+    'tourism_touristicevent',
+    'diving_dive',
+    'outdoor_site',
+    'outdoor_course',
+)
+
+
+def membership_table(obj):
+    """
+    Return the table holding the geometry of ``obj`` if its zoning memberships
+    are maintained, None otherwise.
+    """
+    if obj is None or obj.pk is None:
+        return None
+    try:
+        field = obj._meta.get_field('geom')
+    except FieldDoesNotExist:
+        return None
+    table = field.model._meta.db_table
+    return table if table in MEMBERSHIP_TABLES else None
+
+
+def zones_of(zone_type, table, pks):
+    """
+    Return zones of objects ``pks`` of ``table`` in a single query, as a dict
+    of lists keyed by object pk. Zones are ordered along lines, like ``intersecting()``.
+    """
+    model = ZONE_MODELS[zone_type]
+    membership = ZoningMembership._meta.db_table
+    zone_pk = '{}.{}'.format(model._meta.db_table, model._meta.pk.column)
+    zones = model.objects.extra(
+        tables=[membership],
+        select={
+            'membership_object_id': '{}.object_id'.format(membership),
+            'membership_ordering': '{}.ordering'.format(membership),
+        },
+        where=[
+            '{}.zone_id = {}::text'.format(membership, zone_pk),
+            '{}.zone_type = %s'.format(membership),
+            '{}.object_table = %s'.format(membership),
+            '{}.object_id = ANY(%s)'.format(membership),
+        ],
+        params=[zone_type, table, list(pks)],
+    )
+    result = defaultdict(list)
+    for zone in zones:
+        result[zone.membership_object_id].append(zone)
+    for object_zones in result.values():
+        # Stable sort: zones at the same position keep the model ordering
+        object_zones.sort(key=lambda zone: (zone.membership_ordering is None, zone.membership_ordering or 0))
+    return result
+
+
+def prefetch_zoning(objects, zone_types=tuple(ZONE_MODELS)):
+    """
+    Resolve zones of many objects with one query per zone type, so that their
+    ``areas``, ``districts`` and ``cities`` are then read without any query.
+    """
+    by_table = defaultdict(list)
+    for obj in objects:
+        table = membership_table(obj.zoning_property)
+        if table is not None:
+            by_table[table].append(obj)
+    for table, objs in by_table.items():
+        pks = set([obj.zoning_property.pk for obj in objs])
+        for zone_type in zone_types:
+            zones = zones_of(zone_type, table, pks)
+            for obj in objs:
+                if not hasattr(obj, '_prefetched_zoning'):
+                    obj._prefetched_zoning = {}
+                obj._prefetched_zoning[zone_type] = zones.get(obj.zoning_property.pk, [])
+    return objects
+
+
 class ZoningPropertiesMixin:
     areas_verbose_name = _("Restricted areas")
 
@@ -10,17 +98,27 @@ class ZoningPropertiesMixin:
     def zoning_property(self):
         return self
 
+    def _zones(self, zone_type):
+        prefetched = getattr(self, '_prefetched_zoning', {})
+        if zone_type in prefetched:
+            return prefetched[zone_type]
+        obj = self.zoning_property
+        table = membership_table(obj)
+        if table is None:
+            return uniquify(intersecting(ZONE_MODELS[zone_type], obj, distance=0))
+        return zones_of(zone_type, table, [obj.pk]).get(obj.pk, [])
+
     @property
     def areas(self):
-        return uniquify(intersecting(RestrictedArea, self.zoning_property, distance=0))
+        return self._zones('restrictedarea')
 
     @property
     def districts(self):
-        return uniquify(intersecting(District, self.zoning_property, distance=0))
+        return self._zones('district')
 
     @property
     def cities(self):
-        return uniquify(intersecting(City, self.zoning_property, distance=0))
+        return self._zones('city')
 
     @property
     def published_areas(self):
@@ -6,6 +6,7 @@
 """
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.db import connection
 from django.utils.translation import gettext_lazy as _
 
 
@@ -69,3 +70,32 @@ class District(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ZoningMembership(models.Model):
+    """
+    Zones crossed by objects, maintained by triggers (see sql/post_20_memberships.sql).
+    Objects are identified by the table holding their geometry.
+    """
+    ZONE_TYPES = (
+        ('city', _("City")),
+        ('district', _("District")),
+        ('restrictedarea', _("Restricted area")),
+    )
+    object_table = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    zone_type = models.CharField(max_length=16, choices=ZONE_TYPES)
+    zone_id = models.CharField(max_length=16)
+    ordering = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['object_table', 'object_id']),
+            models.Index(fields=['zone_type', 'zone_id']),
+        ]
+
+    @classmethod
+    def refresh(cls, object_tables=None):
+        """Compute again memberships of objects of the given tables (of every table if None)"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT zoning_refresh_memberships(%s)", [object_tables])
@@ -0,0 +1,113 @@
+-------------------------------------------------------------------------------
+-- Zoning memberships: zones (cities, districts and restricted areas)
+-- intersected by each object, so that they are not computed on each access.
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_membership_tables() RETURNS SETOF text AS $$
+    -- Tables of objects whose memberships are maintained (see ZoningMembership model)
+    SELECT t FROM unnest(ARRAY['core_path', 'core_topology',
+                               'tourism_touristiccontent', 'tourism_touristicevent',
+                               'diving_dive', 'outdoor_site', 'outdoor_course']) AS t
+    WHERE to_regclass(t) IS NOT NULL;
+$$ LANGUAGE sql STABLE;
+
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_insert_memberships(object_table text, zone_type text, object_ids integer[], zone_ids text[]) RETURNS void AS $$
+DECLARE
+    zone_pk text;
+BEGIN
+    -- All objects (resp. zones) are considered when object_ids (resp. zone_ids) is NULL
+    zone_pk := CASE WHEN zone_type = 'city' THEN 'code' ELSE 'id' END;
+    -- Ordering along lines is the one of geotrek.common.utils.intersecting()
+    EXECUTE 'INSERT INTO zoning_zoningmembership (object_table, object_id, zone_type, zone_id, ordering)
+             SELECT ' || quote_literal(object_table) || ', o.id, ' || quote_literal(zone_type) || ', z.' || quote_ident(zone_pk) || '::text,
+                    CASE WHEN GeometryType(o.geom) = ''LINESTRING'' THEN
+                        (SELECT min(ST_LineLocatePoint(o.geom, ST_StartPoint(d.geom)))
+                         FROM ST_Dump(ST_Intersection(o.geom, z.geom)) AS d)
+                    END
+             FROM ' || quote_ident(object_table) || ' AS o
+             JOIN ' || quote_ident('zoning_' || zone_type) || ' AS z ON ST_Intersects(o.geom, z.geom)
+             WHERE ($1 IS NULL OR o.id = ANY($1))
+             AND ($2 IS NULL OR z.' || quote_ident(zone_pk) || '::text = ANY($2))'
+    USING object_ids, zone_ids;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_refresh_memberships(object_tables text[] DEFAULT NULL) RETURNS void AS $$
+BEGIN
+    -- Memberships of all tables are computed again when object_tables is NULL
+    DELETE FROM zoning_zoningmembership WHERE object_tables IS NULL OR object_table = ANY(object_tables);
+    PERFORM zoning_insert_memberships(t, zone_type, NULL, NULL)
+    FROM zoning_membership_tables() AS t,
+         unnest(ARRAY['city', 'district', 'restrictedarea']) AS zone_type
+    WHERE object_tables IS NULL OR t = ANY(object_tables);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-------------------------------------------------------------------------------
+-- Update memberships when objects geometries change
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_object_memberships_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM zoning_zoningmembership WHERE object_table = TG_TABLE_NAME AND object_id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM zoning_insert_memberships(TG_TABLE_NAME, zone_type, ARRAY[NEW.id], NULL)
+        FROM unnest(ARRAY['city', 'district', 'restrictedarea']) AS zone_type;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOR t IN SELECT zoning_membership_tables() LOOP
+        EXECUTE 'CREATE TRIGGER ' || quote_ident(t || '_99_zoning_memberships_iud_tgr') || '
+                 AFTER INSERT OR UPDATE OF geom OR DELETE ON ' || quote_ident(t) || '
+                 FOR EACH ROW EXECUTE PROCEDURE zoning_object_memberships_iud()';
+    END LOOP;
+END;
+$$;
+
+
+-------------------------------------------------------------------------------
+-- Update memberships when zones geometries change
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {# geotrek.zoning #}.zoning_zone_memberships_iud() RETURNS trigger SECURITY DEFINER AS $$
+DECLARE
+    ztype text;
+    zpk text;
+BEGIN
+    ztype := substring(TG_TABLE_NAME FROM 'zoning_(.*)');
+    zpk := CASE WHEN ztype = 'city' THEN 'code' ELSE 'id' END;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM zoning_zoningmembership
+        WHERE zone_type = ztype AND zone_id = to_jsonb(OLD) ->> zpk;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM zoning_insert_memberships(t, ztype, NULL, ARRAY[to_jsonb(NEW) ->> zpk])
+        FROM zoning_membership_tables() AS t;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER zoning_city_99_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF code, geom OR DELETE ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE zoning_zone_memberships_iud();
+
+CREATE TRIGGER zoning_district_99_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF geom OR DELETE ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE zoning_zone_memberships_iud();
+
+CREATE TRIGGER zoning_restrictedarea_99_memberships_iud_tgr
+AFTER INSERT OR UPDATE OF geom OR DELETE ON zoning_restrictedarea
+FOR EACH ROW EXECUTE PROCEDURE zoning_zone_memberships_iud();
+
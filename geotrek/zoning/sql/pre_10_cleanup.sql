@@ -19,3 +19,12 @@ DROP VIEW IF EXISTS f_v_secteur CASCADE;
 DROP VIEW IF EXISTS v_districts CASCADE;
 DROP VIEW IF EXISTS f_v_zonage CASCADE;
 DROP VIEW IF EXISTS v_restrictedareas CASCADE;
+
+-- 30
+
+DROP FUNCTION IF EXISTS zoning_object_memberships_iud() CASCADE;
+DROP FUNCTION IF EXISTS zoning_zone_memberships_iud() CASCADE;
+DROP FUNCTION IF EXISTS zoning_refresh_memberships() CASCADE;
+DROP FUNCTION IF EXISTS zoning_refresh_memberships(text[]) CASCADE;
+DROP FUNCTION IF EXISTS zoning_insert_memberships(text, text, integer[], text[]) CASCADE;
+DROP FUNCTION IF EXISTS zoning_membership_tables() CASCADE;
@@ -1,11 +1,16 @@
 import os
 from io import StringIO
+from unittest import mock
 
 from django.contrib.gis.gdal import GDALException
 from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.core.management.base import CommandError
-from geotrek.zoning.models import RestrictedArea, RestrictedAreaType, City, District
+from geotrek.common.management.commands.migrate import refresh_zoning_memberships
+from geotrek.core.factories import PathFactory
+from geotrek.core.models import Path
+from geotrek.zoning.factories import CityFactory
+from geotrek.zoning.models import RestrictedArea, RestrictedAreaType, City, District, ZoningMembership
 
 
 class RestrictedAreasCommandTest(TestCase):
@@ -280,3 +285,39 @@ class DistrictsCommandTest(TestCase):
         self.assertIn('NOM, Insee', output.getvalue())
         call_command('loaddistricts', self.filename, '-i', name='toto', stdout=output)
         self.assertIn('NOM, Insee', output.getvalue())
+
+
+class RefreshZoningMembershipsCommandTest(TestCase):
+    def test_refresh_memberships(self):
+        city = CityFactory.create(geom='SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, 900000 1200000, '
+                                       '200000 1200000, 200000 300000)))')
+        path = PathFactory.create(geom='SRID=2154;LINESTRING(200000 300000, 1100000 1200000)')
+        ZoningMembership.objects.all().delete()
+        self.assertEqual(Path.objects.get(pk=path.pk).cities, [])
+        output = StringIO()
+        call_command('refresh_zoning_memberships', stdout=output)
+        self.assertEqual(Path.objects.get(pk=path.pk).cities, [city])
+        self.assertIn('zoning memberships computed', output.getvalue())
+
+    def test_refresh_memberships_of_tables(self):
+        city = CityFactory.create(geom='SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, 900000 1200000, '
+                                       '200000 1200000, 200000 300000)))')
+        path = PathFactory.create(geom='SRID=2154;LINESTRING(200000 300000, 1100000 1200000)')
+        ZoningMembership.objects.all().delete()
+        ZoningMembership.refresh(['tourism_touristiccontent'])
+        self.assertEqual(Path.objects.get(pk=path.pk).cities, [])
+        ZoningMembership.refresh(['core_path'])
+        self.assertEqual(Path.objects.get(pk=path.pk).cities, [city])
+
+    @mock.patch('geotrek.zoning.models.ZoningMembership.refresh')
+    def test_refresh_memberships_after_migrate(self, mock_refresh):
+        refresh_zoning_memberships(set())
+        mock_refresh.assert_not_called()
+        # Topologies of treks are stored in their parent table
+        refresh_zoning_memberships({'trekking'})
+        tables = mock_refresh.call_args[0][0]
+        self.assertIn('trekking_trek', tables)
+        self.assertIn('core_topology', tables)
+        self.assertNotIn('core_path', tables)
+        refresh_zoning_memberships({'trekking', 'zoning'})
+        mock_refresh.assert_called_with()
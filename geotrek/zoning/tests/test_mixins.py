@@ -2,8 +2,10 @@ from django.conf import settings
 from django.test import TestCase
 
 from geotrek.core.factories import PathFactory
+from geotrek.core.models import Path
 from geotrek.trekking.factories import TrekFactory
 from geotrek.zoning.factories import CityFactory, DistrictFactory, RestrictedAreaFactory
+from geotrek.zoning.mixins import prefetch_zoning
 
 
 class ZoningPropertiesMixinTest(TestCase):
@@ -90,3 +92,42 @@ class ZoningPropertiesMixinTest(TestCase):
         self.assertEqual(len(self.path.areas), 2)
         self.assertQuerysetEqual(self.path.published_areas, [repr(area), repr(self.area)])
         self.assertEqual(len(self.path.published_areas), 2)
+
+    def test_zone_geometry_change_updates_memberships(self):
+        self.assertEqual(self.path.cities, [self.city])
+        self.city.geom = 'SRID=2154;MULTIPOLYGON(((0 0, 1000 0, 1000 1000, 0 1000, 0 0)))'
+        self.city.save()
+        self.assertEqual(self.path.cities, [])
+        self.assertEqual(self.trek.cities, [])
+        self.city.geom = self.geom_1_wkt
+        self.city.save()
+        self.assertEqual(self.path.cities, [self.city])
+        self.assertEqual(self.trek.cities, [self.city])
+
+
+class PrefetchZoningTest(TestCase):
+    def setUp(self):
+        geom = 'SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, 900000 1200000, 200000 1200000, ' \
+               '200000 300000)))'
+        self.city = CityFactory.create(geom=geom)
+        self.district = DistrictFactory.create(geom=geom)
+        self.area = RestrictedAreaFactory.create(geom=geom)
+        self.paths = [
+            PathFactory.create(geom='SRID=2154;LINESTRING(200000 300000, 1100000 1200000)'),
+            PathFactory.create(geom='SRID=2154;LINESTRING(950000 300000, 1100000 1200000)'),
+        ]
+
+    def test_prefetch_zoning_resolves_zones_without_queries(self):
+        paths = list(Path.objects.filter(pk__in=[path.pk for path in self.paths]).order_by('pk'))
+        with self.assertNumQueries(3):
+            prefetch_zoning(paths)
+        with self.assertNumQueries(0):
+            self.assertEqual(paths[0].cities, [self.city])
+            self.assertEqual(paths[0].districts, [self.district])
+            self.assertEqual(paths[0].areas, [self.area])
+            self.assertEqual(paths[1].cities, [])
+            self.assertEqual(paths[1].published_cities, [])
+
+    def test_zones_without_prefetch_query_memberships(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.paths[0].cities, [self.city])
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+
+from .settings import app_settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalized_params(querydict):
+    """
+    Return a canonical string of filtering GET parameters: keys and values are
+    sorted, and empty values (unused filter form fields) and parameters
+    starting with ``_`` (cache busters) are ignored.
+    """
+    params = []
+    for key in sorted(querydict.keys()):
+        if key.startswith('_'):
+            continue
+        values = sorted([value for value in querydict.getlist(key) if value != ''])
+        params.extend([(key, value) for value in values])
+    return urlencode(params)
+
+
+def params_hash(querydict):
+    """
+    Return a short hash of normalized GET parameters, empty if not filtered.
+    """
+    params = normalized_params(querydict)
+    if not params:
+        return ''
+    return hashlib.md5(params.encode()).hexdigest()
+
+
+class LayerCache(object):
+    """
+    Cache of layers contents, bounded in size with a least recently used
+    eviction, and counting hits and misses per model.
+
+    Both plain contents and streamed contents (stored chunk by chunk) are
+    supported. The LRU index is stored in the cache itself, so that it is
+    shared between processes. Updates are not atomic: in case of concurrent
+    writes, the bound may be exceeded until the next eviction.
+    """
+    index_key = 'mapentity_layers_lru'
+    stats_key = 'mapentity_layers_stats_%s_%s'
+
+    def __init__(self, backend=None, max_size=None):
+        self.cache = caches[backend or app_settings['GEOJSON_LAYERS_CACHE_BACKEND']]
+        self.max_size = app_settings['GEOJSON_LAYERS_CACHE_MAX_SIZE'] if max_size is None else max_size
+
+    def _count(self, model_name, kind):
+        key = self.stats_key % (model_name, kind)
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key)
+        except ValueError:  # Evicted in between
+            self.cache.set(key, 1, timeout=None)
+
+    def stats(self, model_name):
+        return {
+            'hits': self.cache.get(self.stats_key % (model_name, 'hits'), 0),
+            'misses': self.cache.get(self.stats_key % (model_name, 'misses'), 0),
+        }
+
+    def _chunk_keys(self, key, count):
+        return ['%s_%s' % (key, i) for i in range(count)]
+
+    def get(self, key, model_name):
+        """
+        Return cached content, or a (chunks iterator, content type) tuple for
+        streamed content, or None if not in cache.
+        """
+        content = self.cache.get(key)
+        if isinstance(content, dict):
+            keys = self._chunk_keys(key, content['chunks'])
+            if all([self.cache.has_key(k) for k in keys]):
+                self._touch(key)
+                self._count(model_name, 'hits')
+                return (self.cache.get(k) for k in keys), content['content_type']
+        elif content is not None:
+            self._touch(key)
+            self._count(model_name, 'hits')
+            return content
+        self._count(model_name, 'misses')
+        return None
+
+    def set(self, key, content):
+        self.cache.set(key, content)
+        self._register(key, len(content), 0)
+
+    def set_chunks(self, key, chunks, content_type):
+        """
+        Store streamed content chunk by chunk, while it is sent. The index of
+        chunks is stored last, so that partial content is never served.
+        """
+        count = 0
+        size = 0
+        for chunk in chunks:
+            self.cache.set('%s_%s' % (key, count), chunk)
+            count += 1
+            size += len(chunk)
+            yield chunk
+        self.cache.set(key, {'chunks': count, 'content_type': content_type})
+        self._register(key, size, count)
+
+    def _touch(self, key):
+        index = self.cache.get(self.index_key, [])
+        for i, entry in enumerate(index):
+            if entry[0] == key:
+                index.append(index.pop(i))
+                self.cache.set(self.index_key, index, timeout=None)
+                break
+
+    def _register(self, key, size, chunks):
+        index = [entry for entry in self.cache.get(self.index_key, []) if entry[0] != key]
+        index.append([key, size, chunks])
+        total = sum([entry[1] for entry in index])
+        while self.max_size and total > self.max_size and len(index) > 1:
+            evicted, evicted_size, evicted_chunks = index.pop(0)
+            self.cache.delete_many([evicted] + self._chunk_keys(evicted, evicted_chunks))
+            total -= evicted_size
+            logger.debug("Evicted layer %s from cache (%s bytes)", evicted, evicted_size)
+        self.cache.set(self.index_key, index, timeout=None)
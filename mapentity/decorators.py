@@ -5,12 +5,13 @@ from django.views.decorators.cache import cache_control
 from django.views.decorators.http import last_modified as cache_last_modified
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import PermissionDenied
-from django.core.cache import caches
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
+from django.http import StreamingHttpResponse
 from django.views.generic.edit import BaseUpdateView
 from django.views.generic.detail import BaseDetailView
 
+from .cache import LayerCache, params_hash
 from .settings import app_settings
 from .helpers import user_has_perm
 from . import models as mapentity_models
@@ -87,19 +88,13 @@ def view_cache_response_content():
         def _wrapped_method(self, *args, **kwargs):
             response_class = self.response_class
             response_kwargs = dict()
-
-            # Do not cache if filters presents
-            params = self.request.GET.keys()
-            with_filters = all([not p.startswith('_') for p in params])
-            if len(params) > 0 and with_filters:
-                return view_func(self, *args, **kwargs)
+            view_model = self.get_model() if hasattr(self, 'get_model') else self.model
 
             # Restore from cache or store view result
             geojson_lookup = None
             if hasattr(self, 'view_cache_key'):
                 geojson_lookup = self.view_cache_key()
-            elif not self.request.GET:  # Do not cache filtered responses
-                view_model = self.get_model()
+            else:
                 language = self.request.LANGUAGE_CODE
                 latest_saved = view_model.latest_updated()
                 if latest_saved:
@@ -108,16 +103,32 @@ def view_cache_response_content():
                         view_model._meta.model_name,
                         latest_saved.strftime('%y%m%d%H%M%S%f')
                     )
+            if not geojson_lookup:
+                return view_func(self, *args, **kwargs)
+
+            # Filtered responses are cached by filters values
+            filters = params_hash(self.request.GET)
+            if filters:
+                geojson_lookup = '%s_%s' % (geojson_lookup, filters)
 
-            geojson_cache = caches[app_settings['GEOJSON_LAYERS_CACHE_BACKEND']]
+            geojson_cache = LayerCache()
+            model_name = view_model._meta.model_name
 
-            if geojson_lookup:
-                content = geojson_cache.get(geojson_lookup)
-                if content:
-                    return response_class(content=content, **response_kwargs)
+            content = geojson_cache.get(geojson_lookup, model_name)
+            if isinstance(content, tuple):
+                chunks, content_type = content
+                return StreamingHttpResponse(chunks, content_type=content_type)
+            elif content:
+                return response_class(content=content, **response_kwargs)
 
             response = view_func(self, *args, **kwargs)
-            if geojson_lookup:
+            if response.status_code != 200:
+                return response
+            if response.streaming:
+                response.streaming_content = geojson_cache.set_chunks(geojson_lookup,
+                                                                      response.streaming_content,
+                                                                      response['Content-Type'])
+            else:
                 geojson_cache.set(geojson_lookup, response.content)
             return response
 
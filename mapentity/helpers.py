@@ -1,10 +1,13 @@
+import fcntl
 import itertools
 import json
 import logging
 import math
 import os
 import string
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from mimetypes import types_map
 from urllib.parse import urljoin, quote
@@ -12,6 +15,7 @@ from urllib.parse import urljoin, quote
 import bs4
 import requests
 from django.conf import settings
+from django.db import connections
 from django.contrib.gis.gdal.error import GDALException
 from django.contrib.gis.geos import GEOSException, fromstr
 from django.urls import resolve
@@ -19,7 +23,7 @@ from django.http import HttpResponse
 from django.template.exceptions import TemplateDoesNotExist
 from django.template.loader import get_template
 from django.utils import timezone
-from django.utils.translation import get_language
+from django.utils.translation import get_language, override
 
 from .settings import app_settings, API_SRID
 
@@ -243,10 +247,115 @@ def capture_map_image(url, destination, size=None, aspect=1.0, waitfor='.leaflet
     # Run head-less capture (takes time)
     url += '?lang={}&context={}'.format(get_language(), quote(serialized))
 
-    with open(destination, 'wb') as fd:
-        capture_image(url, fd,
-                      selector='.map-panel',
-                      waitfor=waitfor)
+    # Previous image remains served until the capture is complete
+    fd = tempfile.NamedTemporaryFile(dir=os.path.dirname(destination) or '.', suffix='.tmp', delete=False)
+    try:
+        with fd:
+            capture_image(url, fd,
+                          selector='.map-panel',
+                          waitfor=waitfor)
+        os.chmod(fd.name, 0o644)
+        os.replace(fd.name, destination)
+    except BaseException:
+        os.remove(fd.name)
+        raise
+
+
+def map_image_lock_path(obj):
+    return '%s.lock' % obj.get_map_image_path()
+
+
+def acquire_map_image_lock(obj):
+    """
+    Return a lock if the map image of ``obj`` was not already being rendered,
+    in this process or another one, None otherwise. The lock is a file lock
+    next to the image, released by the system if its owner dies.
+    """
+    lock = open(map_image_lock_path(obj), 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def release_map_image_lock(lock):
+    fcntl.flock(lock, fcntl.LOCK_UN)
+    lock.close()
+
+
+def wait_map_image_lock(obj, interval=0.5):
+    """
+    Wait until the map image of ``obj`` is not being rendered anymore,
+    at most ``MAP_CAPTURE_TIMEOUT`` seconds.
+    """
+    deadline = time.monotonic() + app_settings['MAP_CAPTURE_TIMEOUT']
+    while time.monotonic() < deadline:
+        lock = acquire_map_image_lock(obj)
+        if lock is not None:
+            release_map_image_lock(lock)
+            return
+        time.sleep(interval)
+
+
+def mark_map_image_queued(obj):
+    """
+    Return True if the map image of ``obj`` was not already queued to be
+    rendered, and mark it as queued. Marks expire after ``MAP_CAPTURE_TIMEOUT``
+    seconds, in case the queued task was lost.
+    """
+    path = '%s.queued' % obj.get_map_image_path()
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        try:
+            expired = os.path.getmtime(path) < time.time() - app_settings['MAP_CAPTURE_TIMEOUT']
+        except FileNotFoundError:  # Rendered in between
+            expired = True
+        if expired:
+            open(path, 'a').close()
+            os.utime(path)
+        return expired
+
+
+def unmark_map_image_queued(obj):
+    try:
+        os.remove('%s.queued' % obj.get_map_image_path())
+    except FileNotFoundError:
+        pass
+
+
+def render_map_images(objects, rooturl, workers=None):
+    """
+    Render stale map images of objects, in a pool of ``MAP_CAPTURE_WORKERS``
+    threads, since captures mostly wait for the capture server.
+    Errors are logged and do not stop the other captures.
+    Return the number of rendered images.
+    """
+    if workers is None:
+        workers = app_settings['MAP_CAPTURE_WORKERS']
+    language = get_language()
+
+    def render(obj):
+        try:
+            with override(language):
+                return bool(obj.prepare_map_image(rooturl, queue=False))
+        except Exception as e:
+            logger.exception("Map image of %s %s could not be rendered: %s", obj._meta.model_name, obj.pk, e)
+            return False
+        finally:
+            if workers > 1:
+                # Connections opened by this thread
+                connections.close_all()
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rendered = list(executor.map(render, objects))
+    else:
+        rendered = [render(obj) for obj in objects]
+    return len([r for r in rendered if r])
 
 
 def extract_attributes_html(url, request):
@@ -9,6 +9,7 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import FieldError, ObjectDoesNotExist
 from django.urls import reverse, NoReverseMatch
+from django.utils.module_loading import import_string
 from django.contrib import auth
 from django.contrib.admin.models import LogEntry as BaseLogEntry
 from django.contrib.admin.models import ADDITION, CHANGE, DELETION
@@ -19,13 +20,17 @@ from rest_framework import permissions as rest_permissions
 
 from mapentity.templatetags.mapentity_tags import humanize_timesince
 from .settings import app_settings, API_SRID
-from .helpers import smart_urljoin, is_file_uptodate, capture_map_image, extract_attributes_html
+from .helpers import (smart_urljoin, is_file_uptodate, capture_map_image, extract_attributes_html,
+                      acquire_map_image_lock, release_map_image_lock, wait_map_image_lock,
+                      mark_map_image_queued, unmark_map_image_queued)
 
 
 # Used to create the matching url name
 ENTITY_LAYER = "layer"
+ENTITY_TILES = "tiles"
 ENTITY_LIST = "list"
 ENTITY_JSON_LIST = "json_list"
+ENTITY_PK_LIST = "pk_list"
 ENTITY_FORMAT_LIST = "format_list"
 ENTITY_DETAIL = "detail"
 ENTITY_MAPIMAGE = "mapimage"
@@ -37,7 +42,7 @@ ENTITY_DELETE = "delete"
 ENTITY_UPDATE_GEOM = "update_geom"
 
 ENTITY_KINDS = (
-    ENTITY_LAYER, ENTITY_LIST, ENTITY_JSON_LIST,
+    ENTITY_LAYER, ENTITY_TILES, ENTITY_LIST, ENTITY_JSON_LIST, ENTITY_PK_LIST,
     ENTITY_FORMAT_LIST, ENTITY_DETAIL, ENTITY_MAPIMAGE, ENTITY_DOCUMENT, ENTITY_MARKUP, ENTITY_CREATE,
     ENTITY_UPDATE, ENTITY_DELETE, ENTITY_UPDATE_GEOM
 )
@@ -95,8 +100,10 @@ class BaseMapEntityMixin(models.Model):
             ENTITY_DELETE: ENTITY_PERMISSION_DELETE,
             ENTITY_DETAIL: ENTITY_PERMISSION_READ,
             ENTITY_LAYER: ENTITY_PERMISSION_READ,
+            ENTITY_TILES: ENTITY_PERMISSION_READ,
             ENTITY_LIST: ENTITY_PERMISSION_READ,
             ENTITY_JSON_LIST: ENTITY_PERMISSION_READ,
+            ENTITY_PK_LIST: ENTITY_PERMISSION_READ,
             ENTITY_MARKUP: ENTITY_PERMISSION_READ,
 
             ENTITY_FORMAT_LIST: ENTITY_PERMISSION_EXPORT,
@@ -140,14 +147,19 @@ class BaseMapEntityMixin(models.Model):
     def delete(self, *args, **kwargs):
         # Delete map image capture when delete object
         image_path = self.get_map_image_path()
-        if os.path.exists(image_path):
-            os.unlink(image_path)
+        for path in (image_path, image_path + '.lock', image_path + '.queued'):
+            if os.path.exists(path):
+                os.unlink(path)
         super().delete(*args, **kwargs)
 
     @classmethod
     def get_layer_url(cls):
         return reverse(cls._entity.url_name(ENTITY_LAYER))
 
+    @classmethod
+    def get_tile_url(cls, z, x, y):
+        return reverse(cls._entity.url_name(ENTITY_TILES), kwargs={'z': z, 'x': x, 'y': y})
+
     @classmethod
     def get_list_url(cls):
         return reverse(cls._entity.url_name(ENTITY_LIST))
@@ -156,6 +168,10 @@ class BaseMapEntityMixin(models.Model):
     def get_jsonlist_url(cls):
         return reverse(cls._entity.url_name(ENTITY_JSON_LIST))
 
+    @classmethod
+    def get_pk_list_url(cls):
+        return reverse(cls._entity.url_name(ENTITY_PK_LIST))
+
     @classmethod
     def get_format_list_url(cls):
         return reverse(cls._entity.url_name(ENTITY_FORMAT_LIST))
@@ -196,11 +212,41 @@ class BaseMapEntityMixin(models.Model):
         obj.transform(srid)
         return obj.extent
 
-    def prepare_map_image(self, rooturl):
+    def prepare_map_image(self, rooturl, queue=True):
+        """
+        Render the map image if it is not up-to-date, and return True if rendered.
+
+        Concurrent calls for the same object render it once: the others wait
+        for the image, or use the previous one if any. If ``queue`` is True and
+        a ``MAP_CAPTURE_QUEUE`` function is configured, a stale image is used
+        as is and queued to be rendered in background.
+        """
         path = self.get_map_image_path()
         # Do nothing if image is up-to-date
         if is_file_uptodate(path, self.get_date_update()):
             return False
+        queue_func = app_settings['MAP_CAPTURE_QUEUE']
+        if queue and queue_func and os.path.exists(path):
+            if mark_map_image_queued(self):
+                import_string(queue_func)(self, rooturl)
+            return False
+        lock = acquire_map_image_lock(self)
+        if lock is None:
+            if not os.path.exists(path):
+                wait_map_image_lock(self)
+            return False
+        try:
+            unmark_map_image_queued(self)
+            # Rendered meanwhile by another process
+            if is_file_uptodate(path, self.get_date_update()):
+                return False
+            self.render_map_image(rooturl)
+        finally:
+            release_map_image_lock(lock)
+        return True
+
+    def render_map_image(self, rooturl):
+        path = self.get_map_image_path()
         if self.get_geom() is None:
             size = app_settings['MAP_CAPTURE_SIZE']
             image = Image.new('RGB', (size, size), color=(192, 192, 192))
@@ -208,7 +254,7 @@ class BaseMapEntityMixin(models.Model):
             draw = ImageDraw.Draw(image)
             draw.text((10, 10), "This object has no geometry", font=font, fill=(0, 0, 0))
             image.save(path)
-            return True
+            return
         url = smart_urljoin(rooturl, self.get_detail_url())
         extent = self.get_map_image_extent(3857)
         length = max(extent[2] - extent[0], extent[3] - extent[1])
@@ -223,7 +269,6 @@ class BaseMapEntityMixin(models.Model):
             size = app_settings['MAP_CAPTURE_SIZE']
         printcontext = self.get_printcontext() if hasattr(self, 'get_printcontext') else None
         capture_map_image(url, path, size=size, waitfor=self.capture_map_image_waitfor, printcontext=printcontext)
-        return True
 
     def get_map_image_path(self):
         basefolder = os.path.join(settings.MEDIA_ROOT, 'maps')
@@ -66,6 +66,7 @@ class MapEntityOptions(object):
         picked = []
         rest_viewset = None
         list_view = None
+        layer_view = None
 
         for name, view in inspect.getmembers(views_module):
             if inspect.isclass(view) and issubclass(view, View):
@@ -82,6 +83,9 @@ class MapEntityOptions(object):
                             elif issubclass(view, mapentity_views.MapEntityList):
                                 picked.append(view)
                                 list_view = view
+                            elif issubclass(view, mapentity_views.MapEntityLayer):
+                                picked.append(view)
+                                layer_view = view
                             else:
                                 picked.append(view)
 
@@ -92,22 +96,35 @@ class MapEntityOptions(object):
         else:
             generic_views = [getattr(mapentity_views, 'MapEntity%s' % name)
                              for name in self.dynamic_views]
+            if 'Layer' in self.dynamic_views and 'Tiles' not in self.dynamic_views:
+                # Vector tiles come with layer
+                generic_views.append(mapentity_views.MapEntityTiles)
+            if 'JsonList' in self.dynamic_views and 'PkList' not in self.dynamic_views:
+                # Primary keys list comes with JSON list
+                generic_views.append(mapentity_views.MapEntityPkList)
 
         # Dynamically define missing views
         for generic_view in generic_views:
             already_defined = any([issubclass(view, generic_view) for view in picked])
             if not already_defined:
                 list_dependencies = (mapentity_views.MapEntityJsonList,
+                                     mapentity_views.MapEntityPkList,
                                      mapentity_views.MapEntityFormat)
                 if list_view and generic_view in list_dependencies:
-                    # List view depends on JsonList and Format view
+                    # List view depends on JsonList, PkList and Format view
                     class dynamic_view(generic_view, list_view):
                         pass
+                elif layer_view and generic_view is mapentity_views.MapEntityTiles:
+                    # Tiles view share queryset and properties of layer view
+                    class dynamic_view(generic_view, layer_view):
+                        pass
                 else:
                     # General case
                     class dynamic_view(generic_view):
                         model = _model
                 picked.append(dynamic_view)
+                if generic_view is mapentity_views.MapEntityLayer:
+                    layer_view = dynamic_view
 
         # Dynamically define REST missing viewset
         if rest_viewset is None:
@@ -157,8 +174,10 @@ class MapEntityOptions(object):
     def _url_path(self, view_kind):
         kind_to_urlpath = {
             mapentity_models.ENTITY_LAYER: r'^api/{modelname}/{modelname}.geojson$',
+            mapentity_models.ENTITY_TILES: r'^api/{modelname}/tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+).pbf$',
             mapentity_models.ENTITY_LIST: r'^{modelname}/list/$',
             mapentity_models.ENTITY_JSON_LIST: r'^api/{modelname}/{modelname}s.json$',
+            mapentity_models.ENTITY_PK_LIST: r'^api/{modelname}/{modelname}s.pks.json$',
             mapentity_models.ENTITY_FORMAT_LIST: r'^{modelname}/list/export/$',
             mapentity_models.ENTITY_DETAIL: r'^{modelname}/(?P<pk>\d+)/$',
             mapentity_models.ENTITY_MAPIMAGE: r'^image/{modelname}-(?P<pk>\d+).png$',
@@ -3,6 +3,7 @@ from .commasv import CSVSerializer
 from .gpx import GPXSerializer
 from .datatables import DatatablesSerializer
 from .shapefile import ZipShapeSerializer
+from .geojson import GeoJSONStreamSerializer
 
 
 __all__ = ['plain_text',
@@ -11,4 +12,5 @@ __all__ = ['plain_text',
            'GPXSerializer',
            'DatatablesSerializer',
            'ZipShapeSerializer',
+           'GeoJSONStreamSerializer',
            'json_django_dumps']
@@ -1,5 +1,6 @@
 import csv
 from functools import partial
+from io import StringIO
 
 from django.core.serializers.base import Serializer
 from django.utils.encoding import smart_str
@@ -7,10 +8,12 @@ from django.utils.translation import gettext as _
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.core.exceptions import FieldDoesNotExist
 
-from .helpers import smart_plain_text, field_as_string
+from .helpers import smart_plain_text, field_as_string, iterate_in_chunks, select_related_columns
 
 
 class CSVSerializer(Serializer):
+    chunk_length = 64 * 1024
+
     def getters_csv(self, columns, model, ascii):
         getters = {}
         for field in columns:
@@ -43,23 +46,40 @@ class CSVSerializer(Serializer):
             headers.append(smart_str(c))
         return headers
 
-    def serialize(self, queryset, **options):
-        """
-        Uses self.columns, containing fieldnames to produce the CSV.
-        The header of the csv is made of the verbose name of each field.
-        """
+    def get_lines(self, queryset, **options):
         model = options.pop('model', None) or queryset.model
         columns = options.pop('fields')
-        stream = options.pop('stream')
         ascii = options.get('ensure_ascii', True)
+        chunk_size = options.get('chunk_size', 500)
+        prefetch = options.get('prefetch')
 
-        headers = self.get_csv_header(columns, model)
+        yield self.get_csv_header(columns, model)
 
         getters = self.getters_csv(columns, model, ascii)
+        queryset = select_related_columns(queryset, columns, model)
+        for obj in iterate_in_chunks(queryset, chunk_size, prefetch):
+            yield [getters[field](obj, field) for field in columns]
 
-        def get_lines():
-            yield headers
-            for obj in queryset:
-                yield [getters[field](obj, field) for field in columns]
+    def serialize(self, queryset, **options):
+        """
+        Uses self.columns, containing fieldnames to produce the CSV.
+        The header of the csv is made of the verbose name of each field.
+        """
+        stream = options.pop('stream')
         writer = csv.writer(stream)
-        writer.writerows(get_lines())
+        writer.writerows(self.get_lines(queryset, **options))
+
+    def stream(self, queryset, **options):
+        """
+        Return an iterator of strings, which joined together form the CSV
+        of ``serialize()``, to be sent with a ``StreamingHttpResponse``.
+        """
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        for line in self.get_lines(queryset, **options):
+            writer.writerow(line)
+            if buffer.tell() >= self.chunk_length:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
@@ -4,12 +4,14 @@ from django.core.serializers.base import Serializer
 from django.utils.translation import gettext_lazy as _
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 
+from .helpers import chunked, select_related_columns
+
 
 class DatatablesSerializer(Serializer):
-    def serialize(self, queryset, **options):
-        model = options.pop('model', None) or queryset.model
-        columns = options.pop('fields')
+    # Number of objects given at once to the prefetch function
+    chunk_size = 500
 
+    def getters(self, columns, model):
         getters = {}
         for field in columns:
             if hasattr(model, field + '_display'):
@@ -27,16 +29,52 @@ class DatatablesSerializer(Serializer):
                             value = 0.0
                         return value
                     getters[field] = fixfloat
+        return getters
+
+    def rows(self, queryset, columns, model, prefetch=None):
+        """
+        Return (pk, row) tuples. Related objects of columns are fetched along
+        with objects, and ``prefetch`` is called with each chunk of objects.
+        """
+        getters = self.getters(columns, model)
+        queryset = select_related_columns(queryset, columns, model)
+        for objects in chunked(queryset, self.chunk_size):
+            if prefetch is not None:
+                objects = prefetch(objects)
+            for obj in objects:
+                yield obj.pk, [getters[field](obj, field) for field in columns]
+
+    def serialize(self, queryset, **options):
+        model = options.pop('model', None) or queryset.model
+        columns = options.pop('fields')
+        prefetch = options.pop('prefetch', None)
+
         # Build list with fields
         map_obj_pk = []
         data_table_rows = []
-        for obj in queryset:
-            row = [getters[field](obj, field) for field in columns]
+        for pk, row in self.rows(queryset, columns, model, prefetch):
             data_table_rows.append(row)
-            map_obj_pk.append(obj.pk)
+            map_obj_pk.append(pk)
 
         return {
             # aaData is the key looked up by dataTables
             'aaData': data_table_rows,
             'map_obj_pk': map_obj_pk,
         }
+
+    def serialize_page(self, queryset, **options):
+        """
+        Serialize a page of objects for dataTables server-side processing:
+        ``queryset`` is the page and ``total`` and ``filtered_total`` are the
+        number of objects before and after search.
+        """
+        model = options.pop('model', None) or queryset.model
+        columns = options.pop('fields')
+        prefetch = options.pop('prefetch', None)
+
+        return {
+            'sEcho': options.pop('echo'),
+            'iTotalRecords': options.pop('total'),
+            'iTotalDisplayRecords': options.pop('filtered_total'),
+            'aaData': [row for pk, row in self.rows(queryset, columns, model, prefetch)],
+        }
@@ -0,0 +1,110 @@
+import json
+
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import AsGeoJSON, Transform
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Func
+from django.utils.encoding import smart_str
+
+from .helpers import DjangoJSONEncoder
+
+
+class GeoJSONStreamSerializer(object):
+    """
+    Serialize a queryset as a GeoJSON FeatureCollection, in chunks of features.
+
+    Objects are read through a server-side cursor and geometries are converted
+    to GeoJSON by PostGIS, so that memory remains bounded whatever the number
+    of objects. Output is the one of ``djgeojson`` serializer.
+    """
+    def __init__(self, properties, geometry_field='geom', srid=4326, precision=None,
+                 force2d=False, with_modelname=True, chunk_size=500):
+        if not isinstance(properties, dict):
+            properties = dict([(p, p) for p in properties])
+        self.properties = properties
+        self.geometry_field = geometry_field
+        self.srid = srid
+        self.precision = precision
+        self.force2d = force2d
+        self.with_modelname = with_modelname
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def can_serialize(cls, queryset, geometry_field='geom'):
+        """
+        Geometry must be computed by the database (not a Python property)
+        """
+        if geometry_field in queryset.query.annotations:
+            return True
+        try:
+            field = queryset.model._meta.get_field(geometry_field)
+        except FieldDoesNotExist:
+            return False
+        return isinstance(field, GeometryField) and field.concrete
+
+    def geometry_expression(self):
+        geom = Transform(self.geometry_field, self.srid)
+        if self.force2d:
+            geom = Func(geom, function='ST_Force2D', output_field=GeometryField(srid=self.srid))
+        # Default of djgeojson is full precision
+        precision = self.precision if self.precision is not None else 15
+        return AsGeoJSON(geom, precision=precision)
+
+    def prepare_queryset(self, queryset):
+        queryset = queryset.annotate(geojson_geometry=self.geometry_expression())
+        model_fields = self.model_fields(queryset.model)
+        if self.geometry_field in model_fields and \
+                all([name in model_fields for name in self.properties if name != self.geometry_field]):
+            # Raw geometry is not needed anymore
+            queryset = queryset.defer(self.geometry_field)
+        return queryset
+
+    def model_fields(self, model):
+        fields = dict([(f.name, f) for f in model._meta.concrete_fields])
+        fields.update(dict([(f.name, f) for f in model._meta.many_to_many]))
+        return fields
+
+    def feature_properties(self, obj, model_fields):
+        properties = {}
+        for name, property_name in self.properties.items():
+            field = model_fields.get(name)
+            if field is not None and field.many_to_many:
+                value = [related.pk for related in getattr(obj, name).all()]
+            elif field is not None and field.many_to_one:
+                # Related object primary key, without fetching it
+                value = getattr(obj, field.attname)
+            elif hasattr(obj, name):
+                value = getattr(obj, name)
+            else:
+                continue
+            properties[property_name] = value
+        if self.with_modelname:
+            properties['model'] = smart_str(obj._meta)
+        return properties
+
+    def feature(self, obj, model_fields):
+        feature = {"type": "Feature", "properties": self.feature_properties(obj, model_fields)}
+        if obj.pk:
+            feature['id'] = obj.pk
+        feature = json.dumps(feature, cls=DjangoJSONEncoder, ensure_ascii=False)
+        # Geometry is already serialized by PostGIS
+        return '%s, "geometry": %s}' % (feature[:-1], obj.geojson_geometry or 'null')
+
+    def serialize(self, queryset):
+        """
+        Return an iterator of strings, which joined together form the FeatureCollection
+        """
+        crs = {"type": "name", "properties": {"name": "EPSG:%s" % self.srid}}
+        yield '{"type": "FeatureCollection", "crs": %s, "features": [' % json.dumps(crs)
+        model_fields = self.model_fields(queryset.model)
+        features = []
+        first = True
+        for obj in self.prepare_queryset(queryset).iterator(chunk_size=self.chunk_size):
+            features.append(self.feature(obj, model_fields))
+            if len(features) >= self.chunk_size:
+                yield ('' if first else ', ') + ', '.join(features)
+                features = []
+                first = False
+        if features:
+            yield ('' if first else ', ') + ', '.join(features)
+        yield ']}'
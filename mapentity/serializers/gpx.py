@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from tempfile import SpooledTemporaryFile
+
 from django.conf import settings
 from django.core.serializers.base import Serializer
 from django.utils.translation import gettext_lazy as _
@@ -6,9 +8,11 @@ from django.contrib.gis.geos.collections import GeometryCollection
 from django.contrib.gis.geos import Point, LineString, Polygon
 
 import gpxpy.gpx
+from gpxpy.gpxfield import gpx_fields_to_xml
 
 from ..templatetags.mapentity_tags import humanize_timesince
 from ..settings import app_settings
+from .helpers import iterate_in_chunks
 
 
 class GPXSerializer(Serializer):
@@ -22,6 +26,8 @@ class GPXSerializer(Serializer):
         Collection -> One route/waypoint per item
 
     """
+    spool_size = 8 * 1024 * 1024
+
     def __init__(self, *args, **kwargs):
         self.gpx = None
 
@@ -35,6 +41,33 @@ class GPXSerializer(Serializer):
         stream = options.pop('stream')
         stream.write(self.gpx.to_xml())
 
+    def stream(self, queryset, **options):
+        """
+        Return an iterator of strings, which joined together form the GPX document,
+        to be sent with a ``StreamingHttpResponse``. Objects are serialized one by
+        one: waypoints are sent as soon as they are built, whereas tracks, which must
+        come after all waypoints, are kept in a temporary file (in memory up to
+        ``spool_size``).
+        """
+        self.options = options
+        version = '1.1'
+        document = gpxpy.gpx.GPX().to_xml(version)
+        end = document.rindex('</gpx>')
+        yield document[:end].rstrip()
+        with SpooledTemporaryFile(max_size=self.spool_size, mode='w+') as tracks:
+            for obj in iterate_in_chunks(queryset, options.get('chunk_size', 500)):
+                self.gpx = gpxpy.gpx.GPX()
+                self.end_object(obj)
+                if self.gpx.waypoints:
+                    yield ''.join([gpx_fields_to_xml(waypoint, 'wpt', version, indent='  ')
+                                   for waypoint in self.gpx.waypoints])
+                for track in self.gpx.tracks:
+                    tracks.write(gpx_fields_to_xml(track, 'trk', version, indent='  '))
+            tracks.seek(0)
+            for chunk in iter(lambda: tracks.read(64 * 1024), ''):
+                yield chunk
+        yield '\n' + document[end:]
+
     def end_object(self, obj):
         """ Single object serialization.
         """
@@ -44,7 +77,7 @@ class GPXSerializer(Serializer):
         objupdate = obj.get_date_update()
         if objupdate:
             description += _('Modified') + ': ' + humanize_timesince(objupdate)
-        geom_field = self.options.pop('gpx_field', app_settings['GPX_FIELD_NAME'])
+        geom_field = self.options.get('gpx_field', app_settings['GPX_FIELD_NAME'])
         geom = getattr(obj, geom_field, None)
         if not geom:
             geom = getattr(obj, app_settings['GEOM_FIELD_NAME'], None)
@@ -2,8 +2,11 @@ from functools import partial
 import html
 import json
 
+from django.contrib.contenttypes.fields import GenericForeignKey
 from django.core.serializers import serialize
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.db.models.query import QuerySet
 from django.utils.encoding import force_str
 from django.utils.encoding import smart_str
@@ -23,11 +26,73 @@ def field_as_string(obj, field, ascii=False):
             value = (_('no'), _('yes'))[value]
         if isinstance(value, float) or isinstance(value, int):
             value = number_format(value)
-        if isinstance(value, list) or isinstance(value, QuerySet):
-            value = ", ".join([str(val) for val in value])
+    if isinstance(value, list) or isinstance(value, QuerySet):
+        value = ", ".join([str(val) for val in value])
     return smart_plain_text(value, ascii)
 
 
+def select_related_columns(queryset, columns, model):
+    """
+    Fetch related objects of foreign keys, generic foreign keys and many to many
+    columns along with objects, instead of one query per object and column.
+    """
+    if not isinstance(queryset, QuerySet):
+        return queryset
+    select, prefetch = [], []
+    for field in columns:
+        try:
+            modelfield = model._meta.get_field(field)
+        except FieldDoesNotExist:
+            continue
+        if isinstance(modelfield, ForeignKey):
+            select.append(field)
+        elif isinstance(modelfield, (ManyToManyField, GenericForeignKey)):
+            prefetch.append(field)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def iterate_in_chunks(queryset, chunk_size=500, prefetch=None):
+    """
+    Iterate over objects with bounded memory: primary keys are read through a
+    server-side cursor and objects are fetched chunk by chunk, so that
+    ``select_related()`` and ``prefetch_related()`` still apply (they are
+    ignored by ``QuerySet.iterator()``). Other iterables are iterated as is.
+
+    ``prefetch`` is called with each chunk of objects, to resolve their relations
+    at once, and returns the objects to yield.
+    """
+    if not isinstance(queryset, QuerySet) or queryset.query.is_sliced:
+        chunks = chunked(queryset, chunk_size)
+    else:
+        chunks = (fetch_chunk(queryset, pks)
+                  for pks in chunked(queryset.values_list('pk', flat=True).iterator(chunk_size=chunk_size),
+                                     chunk_size))
+    for objects in chunks:
+        if prefetch is not None:
+            objects = prefetch(objects)
+        yield from objects
+
+
+def chunked(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fetch_chunk(queryset, pks):
+    objects = dict([(obj.pk, obj) for obj in queryset.filter(pk__in=pks)])
+    return [objects[pk] for pk in pks if pk in objects]
+
+
 def plain_text(html_content):
     return html.unescape(strip_tags(html_content))
 
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
+import copy
 import fiona
 from fiona.crs import from_epsg
-from io import BytesIO
 import json
 import os
 import shutil
@@ -9,7 +9,9 @@ import uuid
 import unicodedata
 import zipfile
 
+from django.db.models import BooleanField, CharField, F, Func
 from django.db.models.fields.related import ForeignKey, ManyToManyField
+from django.db.models.query import QuerySet
 from django.contrib.gis.db.models.fields import (GeometryField, GeometryCollectionField,
                                                  PointField, LineStringField, PolygonField,
                                                  MultiPointField, MultiLineStringField, MultiPolygonField)
@@ -21,73 +23,131 @@ from django.utils.encoding import smart_str
 from django.utils.translation import gettext as _
 
 from ..settings import app_settings
-from .helpers import smart_plain_text, field_as_string
+from .helpers import smart_plain_text, field_as_string, iterate_in_chunks, select_related_columns
 
 os.environ["SHAPE_ENCODING"] = "UTF-8"
 
 
+class ChunkBuffer(object):
+    """
+    Write-only file object keeping written data until it is popped, used to
+    send a zip file while it is being built.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
 class ZipShapeSerializer(Serializer):
+    chunk_length = 64 * 1024
+
     def __init__(self, *args, **kwargs):
         super(ZipShapeSerializer, self).__init__(*args, **kwargs)
         self.path_directory = os.path.join(app_settings['TEMP_DIR'], str(uuid.uuid4()))
         os.mkdir(self.path_directory)
 
     def serialize(self, queryset, **options):
-        columns = options.pop('fields')
         stream = options.pop('stream')
+        for chunk in self.stream(queryset, **options):
+            stream.write(chunk)
+
+    def stream(self, queryset, **options):
+        """
+        Return an iterator of bytes, which joined together form the zip file of
+        shapefiles (one per geometry type), to be sent with a ``StreamingHttpResponse``.
+        Each layer is zipped as soon as it is written, and its files are then removed
+        (unless ``delete`` option is False).
+        """
+        columns = options.pop('fields')
         model = options.pop('model', None) or queryset.model
         delete = options.pop('delete', True)
-        filename = options.pop('filename', 'shp_download')
-        # Zip all shapefiles created temporarily
-        self._create_shape(self.path_directory, queryset, model, columns)
-        self.zip_shapefiles(self.path_directory, stream, filename)
-        if delete:
-            shutil.rmtree(self.path_directory)
-
-    def zip_shapefiles(self, shape_directory, stream, filename):
-        buffr = BytesIO()
+        prefetch = options.pop('prefetch', None)
+        buffr = ChunkBuffer()
         zipf = zipfile.ZipFile(buffr, "w", compression=zipfile.ZIP_DEFLATED)
-        path = os.path.normpath(shape_directory)
-        if path != os.curdir and path != shape_directory:
-            zipf.write(path, os.path.relpath(path, shape_directory))
-        for dirpath, dirnames, filenames in os.walk(shape_directory):
-            for name in sorted(dirnames):
-                path = os.path.normpath(os.path.join(dirpath, name))
-                zipf.write(path, os.path.relpath(path, shape_directory))
-            for name in filenames:
-                path = os.path.normpath(os.path.join(dirpath, name))
-                if os.path.isfile(path):
-                    zipf.write(path, os.path.relpath(path, shape_directory))
-
-        zipf.close()
-        buffr.flush()  # zip.close() writes stuff.
-        stream.write(buffr.getvalue())
-        buffr.close()
-
-    def _create_shape(self, shape_directory, queryset, model, columns):
-        """Split a shapes into one or more shapes (one for point and one for linestring)
+        try:
+            for layer in self._create_shape(self.path_directory, queryset, model, columns, prefetch):
+                for name in sorted(os.listdir(self.path_directory)):
+                    path = os.path.join(self.path_directory, name)
+                    if os.path.splitext(name)[0] != layer or not os.path.isfile(path):
+                        continue
+                    yield from self.zip_file(zipf, buffr, path, name)
+                    if delete:
+                        os.remove(path)
+            zipf.close()
+            yield buffr.pop()
+        finally:
+            if delete:
+                shutil.rmtree(self.path_directory, ignore_errors=True)
+
+    def zip_file(self, zipf, buffr, path, arcname):
+        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+            for data in iter(lambda: src.read(self.chunk_length), b''):
+                dst.write(data)
+                chunk = buffr.pop()
+                if chunk:
+                    yield chunk
+
+    def _create_shape(self, shape_directory, queryset, model, columns, prefetch=None):
+        """Split a shapes into one or more shapes (one for point and one for linestring),
+        and yield the name of each layer once written
         """
         geo_field = geo_field_from_model(model, app_settings['GEOM_FIELD_NAME'])
         get_geom, geom_type, srid = info_from_geo_field(geo_field)
         if geom_type.upper() in (GeometryField.geom_type, GeometryCollectionField.geom_type):
+            if can_split_in_db(queryset, geo_field):
+                layers = self.split_bygeom_db(queryset, geo_field)
+            else:
+                layers = zip(self.split_bygeom(queryset, geom_getter=get_geom),
+                             (PointField, LineStringField, PolygonField,
+                              MultiPointField, MultiLineStringField, MultiPolygonField),
+                             [get_geom] * 6)
 
-            by_points, by_linestrings, by_polygons, multipoints, multilinestrings, multipolygons = \
-                self.split_bygeom(queryset, geom_getter=get_geom)
-
-            for split_qs, split_geom_field in ((by_points, PointField),
-                                               (by_linestrings, LineStringField),
-                                               (by_polygons, PolygonField),
-                                               (multipoints, MultiPointField),
-                                               (multilinestrings, MultiLineStringField),
-                                               (multipolygons, MultiPolygonField)):
-                if len(split_qs) == 0:
+            for split_qs, split_geom_field, split_get_geom in layers:
+                if not (split_qs.exists() if isinstance(split_qs, QuerySet) else len(split_qs)):
                     continue
                 split_geom_type = split_geom_field.geom_class().geom_type
-                shape_write(shape_directory, split_qs, model, columns, get_geom, split_geom_type, srid)
+                shape_write(shape_directory, split_qs, model, columns, split_get_geom, split_geom_type, srid,
+                            prefetch=prefetch)
+                yield split_geom_type
 
         else:
             geom_type = geo_field.geom_class().geom_type
-            shape_write(shape_directory, queryset, model, columns, get_geom, geom_type, srid)
+            shape_write(shape_directory, queryset, model, columns, get_geom, geom_type, srid, prefetch=prefetch)
+            yield geom_type
+
+    def split_bygeom_db(self, queryset, geo_field):
+        """Split a queryset by geometry type in the database: one queryset per type, where
+        parts of multi geometries and collections are extracted by PostGIS into ``shape_geom``.
+        Return a list of (queryset, geometry field class, geometry getter) tuples.
+        """
+        name = geo_field.name
+        queryset = queryset.annotate(shape_geom_type=Func(F(name), function='GeometryType',
+                                                          output_field=CharField()))
+        simple_types = (PointField, LineStringField, PolygonField)
+        layers = [(queryset.filter(shape_geom_type=geom_field.geom_type), geom_field, lambda obj: getattr(obj, name))
+                  for geom_field in simple_types]
+        collections = queryset.exclude(shape_geom_type__in=[geom_field.geom_type for geom_field in simple_types])
+        for extract_type, geom_field in ((1, MultiPointField), (2, MultiLineStringField), (3, MultiPolygonField)):
+            parts = Func(Func(F(name), extract_type, function='ST_CollectionExtract'),
+                         function='ST_Multi', output_field=geom_field(srid=geo_field.srid))
+            split_qs = collections.annotate(shape_geom=parts).annotate(
+                shape_empty=Func(F('shape_geom'), function='ST_IsEmpty', output_field=BooleanField())
+            ).filter(shape_empty=False)
+            layers.append((split_qs, geom_field, lambda obj: obj.shape_geom))
+        return layers
 
     def split_bygeom(self, iterable, geom_getter=lambda x: x.geom):
         """Split an iterable in two list (points, linestring)"""
@@ -101,15 +161,15 @@ class ZipShapeSerializer(Serializer):
                 # Duplicate object, shapefile do not support geometry collections !
                 subpoints, sublines, subpolygons, pp, ll, yy = self.split_bygeom(geom, geom_getter=lambda geom: geom)
                 if subpoints:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiPoint(subpoints, srid=geom.srid)
                     multipoints.append(clone)
                 if sublines:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiLineString(sublines, srid=geom.srid)
                     multilinestrings.append(clone)
                 if subpolygons:
-                    clone = x.__class__.objects.get(pk=x.pk)
+                    clone = copy.copy(x)
                     clone.geom = MultiPolygon(subpolygons, srid=geom.srid)
                     multipolygons.append(clone)
             elif isinstance(geom, Point):
@@ -123,9 +183,23 @@ class ZipShapeSerializer(Serializer):
         return points, linestrings, polygons, multipoints, multilinestrings, multipolygons
 
 
-def shape_write(shape_directory, iterable, model, columns, get_geom, geom_type, srid, srid_out=None):
+def can_split_in_db(queryset, geo_field):
+    """
+    Geometry must be a column of the queryset table (not a Python property)
+    """
+    if not isinstance(queryset, QuerySet):
+        return False
+    try:
+        field = queryset.model._meta.get_field(geo_field.name)
+    except FieldDoesNotExist:
+        return False
+    return field is geo_field and field.concrete
+
+
+def shape_write(shape_directory, iterable, model, columns, get_geom, geom_type, srid, srid_out=None, prefetch=None):
     """
-    Write tempfile with shape layer.
+    Write tempfile with shape layer. ``prefetch`` is called with each chunk of
+    objects (see ``iterate_in_chunks()``).
     """
 
     headers = []
@@ -158,7 +232,7 @@ def shape_write(shape_directory, iterable, model, columns, get_geom, geom_type,
         def transform(ogr_geom):
             return ogr_geom
 
-    for item in iterable:
+    for item in iterate_in_chunks(select_related_columns(iterable, columns, model), prefetch=prefetch):
         geom = get_geom(item)
         if geom:
             geom = transform(geom)
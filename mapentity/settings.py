@@ -28,6 +28,9 @@ app_settings = dict({
     'TEMP_DIR': getattr(settings, 'TEMP_DIR', None),
     'MAP_CAPTURE_SIZE': 800,
     'MAP_CAPTURE_MAX_RATIO': 1.25,
+    'MAP_CAPTURE_WORKERS': 4,
+    'MAP_CAPTURE_TIMEOUT': 120,  # seconds
+    'MAP_CAPTURE_QUEUE': None,
     'GEOM_FIELD_NAME': 'geom',
     'GPX_FIELD_NAME': 'geom',
     'DATE_UPDATE_FIELD_NAME': 'date_update',
@@ -37,7 +40,9 @@ app_settings = dict({
     'ACTION_HISTORY_LENGTH': 20,
     'ANONYMOUS_VIEWS_PERMS': tuple(),
     'GEOJSON_LAYERS_CACHE_BACKEND': 'default',
+    'GEOJSON_LAYERS_CACHE_MAX_SIZE': 256 * 1024 * 1024,  # bytes
     'GEOJSON_PRECISION': None,
+    'DATATABLES_SERVER_SIDE': True,
     'SERVE_MEDIA_AS_ATTACHMENT': True,
     'SENDFILE_HTTP_HEADER': None,
     'DRF_API_URL_PREFIX': r'^api/',
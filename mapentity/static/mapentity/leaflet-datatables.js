@@ -29,6 +29,12 @@ L.MapListSync = L.Class.extend({
         this._loading = false;
         this.map.on('moveend', this._onMapViewChanged, this);
 
+        // Server-side processing: table only holds the current page, and
+        // objects of every page are shown on map from their primary keys.
+        this._serverSide = this.dt.fnSettings().oFeatures.bServerSide;
+        this._search = '';
+        this._pksRequest = 0;
+
         if (this.options.filter) {
             this.options.filter.submitbutton.click(this._onFormSubmit.bind(this));
             this.options.filter.resetbutton.click(this._onFormReset.bind(this));
@@ -38,6 +44,14 @@ L.MapListSync = L.Class.extend({
     },
 
     _onListFilter: function () {
+        if (this._serverSide) {
+            var search = this.dt.fnSettings().oPreviousSearch.sSearch;
+            if (search !== this._search) {
+                this._search = search;
+                this._loadPks();
+            }
+            return;
+        }
         var filterTxt = $(".dataTables_filter input[type='text']").val();
         var results = this.dt.fnGetColumnData(0);
         this.fire('reloaded', {
@@ -152,10 +166,59 @@ L.MapListSync = L.Class.extend({
         if (this.options.filter) {
             url = this.options.filter.form.attr("action") + '?' + this.options.filter.form.serialize();
         }
+        if (this._serverSide) {
+            var oSettings = this.dt.fnSettings();
+            oSettings.sAjaxSource = url;
+            $(oSettings.oInstance).one('draw', function () {
+                var nbrecords = oSettings.fnRecordsTotal();
+                var nbonmap = Object.keys(self.layer.getCurrentLayers()).length;
+                // Same trick as below
+                if (refreshLayer || (nbrecords > nbonmap)) {
+                    self._loadPks();
+                }
+                self.fire('reloaded', {
+                    nbrecords: nbrecords,
+                });
+                spinner.stop();
+                self._loading = false;
+            });
+            this.dt.fnDraw();
+            return false;
+        }
         this.dt.fnReloadAjax(url, extract_data_and_pks, on_data_loaded);
         return false;
     },
 
+    _loadPks: function () {
+        // Primary keys of filtered and searched objects
+        var self = this,
+            request = ++this._pksRequest,
+            url = window.SETTINGS.urls.pk_list.replace(new RegExp('modelname', 'g'), this.layer.options.modelname),
+            params = $.param({sSearch: this._search});
+        if (this.options.filter) {
+            params = this.options.filter.form.serialize() + '&' + params;
+        }
+        $.getJSON(url + '?' + params, function (pks) {
+            if (request !== self._pksRequest) {
+                return;  // Outdated
+            }
+            var updateLayerObjects = function () {
+                self.layer.updateFromPks(pks);
+            };
+            if (self.layer.loading) {
+                self.layer.on('loaded', updateLayerObjects);
+            }
+            else {
+                updateLayerObjects();
+            }
+            if (self._search) {
+                self.fire('reloaded', {
+                    nbrecords: pks.length,
+                });
+            }
+        });
+    },
+
     _formSetBounds: function () {
         if (!this.options.filter)
             return;
@@ -3,13 +3,29 @@ $(window).on('entity:view:list', function (e, data) {
      * Datatables
      * .......................
      */
+    // Columns which can't be sorted on server
+    var unsortable = [];
+    if (window.SETTINGS.server_side_lists) {
+        $('#objects-list thead th').each(function (i) {
+            if ($(this).data('sortable') === false)
+                unsortable.push(i);
+        });
+    }
+
     MapEntity.mainDatatable = JQDataTable.init($('#objects-list'), null /* no load at startup */, {
         // Hide pk column
-        aoColumnDefs: [ { "bVisible": false, "aTargets": [ 0 ] } ],
+        aoColumnDefs: [ { "bVisible": false, "aTargets": [ 0 ] },
+                        { "bSortable": false, "aTargets": unsortable } ],
         sDom: "tpf",
         aaData: [],
         iDeferLoading: 0,
         iDisplayLength: 15,  // TODO: this is VERY ANNOYING ! I want to fill height !
+        // Paginate, sort and search on server
+        bServerSide: !!window.SETTINGS.server_side_lists,
+        // Nothing to draw until the list url is set
+        fnPreDrawCallback: function (oSettings) {
+            return !oSettings.oFeatures.bServerSide || !!oSettings.sAjaxSource;
+        },
         // Enable cache
         fnServerData: function ( sUrl, aoData, fnCallback, oSettings ) {
 			oSettings.jqXHR = $.ajax( {
@@ -4,9 +4,11 @@ import hashlib
 import logging
 import os
 import shutil
+import threading
 import time
 from datetime import datetime
 from bs4 import BeautifulSoup
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import quote
 
 from freezegun import freeze_time
@@ -43,6 +45,45 @@ class AdjustDebugLevel():
         self.logger.setLevel(self.old_level)
 
 
+class StubServerHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        test = self.server.test
+        test.stub_requests.append(self.path)
+        status, content_type, content = test.stub_response(self.path)
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerMixin:
+    """
+    Serve GET requests of each test on a local HTTP server (``self.stub_url``),
+    with the ``(status, content type, content)`` returned by ``stub_response()``.
+    Requested paths are recorded in ``self.stub_requests``.
+    """
+    def setUp(self):
+        super().setUp()
+        self.stub_requests = []
+        self.stub_server = ThreadingHTTPServer(('127.0.0.1', 0), StubServerHandler)
+        self.stub_server.test = self
+        threading.Thread(target=self.stub_server.serve_forever, daemon=True).start()
+        self.stub_url = 'http://127.0.0.1:{}'.format(self.stub_server.server_port)
+
+    def tearDown(self):
+        self.stub_server.shutdown()
+        self.stub_server.server_close()
+        super().tearDown()
+
+    def stub_response(self, path):
+        raise NotImplementedError
+
+
 @override_settings(MEDIA_ROOT='/tmp/mapentity-media')
 class MapEntityTest(TestCase):
     model = None
@@ -161,7 +202,7 @@ class MapEntityTest(TestCase):
         self.login()
         obj = self.modelfactory.create()
         response = self.client.get(self.model.get_format_list_url() + '?format=gpx')
-        parsed = BeautifulSoup(response.content, 'lxml')
+        parsed = BeautifulSoup(b''.join(response.streaming_content), 'lxml')
         if hasattr(obj, 'geom_3d'):
             self.assertGreater(len(parsed.findAll('ele')), 0)
         else:
@@ -190,7 +231,7 @@ class MapEntityTest(TestCase):
         self.assertEqual(response.get('Content-Type'), 'text/csv')
 
         # Read the csv
-        lines = list(csv.reader(StringIO(response.content.decode("utf-8")), delimiter=','))
+        lines = list(csv.reader(StringIO(b''.join(response.streaming_content).decode("utf-8")), delimiter=','))
 
         # There should be one more line in the csv than in the items: this is the header line
         self.assertEqual(len(lines), self.model.objects.all().count() + 1)
@@ -438,7 +479,7 @@ class MapEntityLiveTest(LiveServerTestCase):
         lastmodified = response.get('Last-Modified')
         cachecontrol = response.get('Cache-control')
         hasher = hashlib.md5()
-        hasher.update(response.content)
+        hasher.update(b''.join(response.streaming_content) if response.streaming else response.content)
         md5sum = hasher.digest()
         self.assertNotEqual(lastmodified, None)
         self.assertCountEqual(cachecontrol.split(', '), ('must-revalidate', 'max-age=0'))
@@ -449,7 +490,7 @@ class MapEntityLiveTest(LiveServerTestCase):
         response = self.client.get(geojson_layer_url)
         self.assertEqual(lastmodified, response.get('Last-Modified'))
         new_hasher = hashlib.md5()
-        new_hasher.update(response.content)
+        new_hasher.update(b''.join(response.streaming_content) if response.streaming else response.content)
         self.assertEqual(md5sum, new_hasher.digest())
 
         # Create a new object
@@ -462,7 +503,7 @@ class MapEntityLiveTest(LiveServerTestCase):
         # Check that last modified and content changed
         self.assertNotEqual(lastmodified, response.get('Last-Modified'))
         new_hasher = hashlib.md5()
-        new_hasher.update(response.content)
+        new_hasher.update(b''.join(response.streaming_content) if response.streaming else response.content)
         self.assertNotEqual(md5sum, new_hasher.digest())
 
         # Ask again with headers, and expect a 304 status (not changed)
@@ -474,7 +515,7 @@ class MapEntityLiveTest(LiveServerTestCase):
         response = self.client.get(geojson_layer_url, HTTP_IF_MODIFIED_SINCE=http_date(1000))
         self.assertEqual(response.status_code, 200)
         new_hasher = hashlib.md5()
-        new_hasher.update(response.content)
+        new_hasher.update(b''.join(response.streaming_content) if response.streaming else response.content)
         self.assertNotEqual(md5sum, new_hasher.digest())
 
     @patch('mapentity.helpers.requests')
@@ -0,0 +1,50 @@
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from mapentity.cache import LayerCache, normalized_params, params_hash
+
+
+class NormalizedParamsTest(TestCase):
+    def test_params_are_sorted(self):
+        self.assertEqual(normalized_params(QueryDict('stake=2&structure=1&stake=1')),
+                         normalized_params(QueryDict('structure=1&stake=1&stake=2')))
+
+    def test_empty_values_and_cache_busters_are_ignored(self):
+        self.assertEqual(normalized_params(QueryDict('name=&structure=1&_=1234')), 'structure=1')
+        self.assertEqual(params_hash(QueryDict('name=&_=1234')), '')
+
+    def test_different_filters_have_different_hashes(self):
+        self.assertNotEqual(params_hash(QueryDict('structure=1')), params_hash(QueryDict('structure=2')))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LayerCacheTest(TestCase):
+    def test_content_is_cached(self):
+        cache = LayerCache(backend='default', max_size=100)
+        self.assertIsNone(cache.get('layer', 'path'))
+        cache.set('layer', b'content')
+        self.assertEqual(cache.get('layer', 'path'), b'content')
+        self.assertEqual(cache.stats('path'), {'hits': 1, 'misses': 1})
+        self.assertEqual(cache.stats('trek'), {'hits': 0, 'misses': 0})
+
+    def test_streamed_content_is_cached_once_complete(self):
+        cache = LayerCache(backend='default', max_size=100)
+        chunks = cache.set_chunks('layer', iter([b'con', b'tent']), 'application/geo+json')
+        self.assertEqual(next(chunks), b'con')
+        self.assertIsNone(cache.get('layer', 'path'))
+        self.assertEqual(list(chunks), [b'tent'])
+        chunks, content_type = cache.get('layer', 'path')
+        self.assertEqual(list(chunks), [b'con', b'tent'])
+        self.assertEqual(content_type, 'application/geo+json')
+
+    def test_least_recently_used_layers_are_evicted(self):
+        cache = LayerCache(backend='default', max_size=10)
+        cache.set('layer1', b'1234')
+        list(cache.set_chunks('layer2', iter([b'12', b'34']), 'application/geo+json'))
+        cache.get('layer1', 'path')
+        cache.set('layer3', b'1234')
+        self.assertEqual(cache.get('layer1', 'path'), b'1234')
+        self.assertIsNone(cache.get('layer2', 'path'))
+        self.assertIsNone(cache.cache.get('layer2_0'))
+        self.assertEqual(cache.get('layer3', 'path'), b'1234')
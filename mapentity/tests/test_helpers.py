@@ -1,5 +1,7 @@
 import os
 import requests
+import threading
+import time
 from unittest import mock
 
 from django.contrib.gis.geos import Polygon
@@ -8,6 +10,7 @@ from django.http import HttpResponse
 from django.test import TestCase
 
 from mapentity.registry import app_settings
+from mapentity.tests import StubServerMixin
 from mapentity.helpers import (
     capture_url,
     capture_map_image,
@@ -17,8 +20,13 @@ from mapentity.helpers import (
     bbox_split_srid_2154,
     api_bbox,
     wkt_to_geom,
-    is_file_uptodate
+    is_file_uptodate,
+    render_map_images,
+    acquire_map_image_lock,
+    release_map_image_lock,
 )
+from geotrek.core.factories import PathFactory
+from geotrek.core.models import Path
 import shutil
 
 
@@ -222,3 +230,116 @@ class DownloadStreamTest(TestCase):
         get_mocked.return_value.content = "x"
         download_to_stream('http://google.com', open(os.devnull, 'w'), silent=True, headers={'Accept-language': 'fr'})
         get_mocked.assert_called_with('http://google.com', headers={'Accept-language': 'fr'})
+
+
+class MapImageRenderingTest(StubServerMixin, TestCase):
+    rooturl = 'http://geotrek.local/'
+    delay = 0
+
+    def setUp(self):
+        super().setUp()
+        self.patch = mock.patch.dict(app_settings, {'CAPTURE_SERVER': self.stub_url, 'MAP_CAPTURE_QUEUE': None})
+        self.patch.start()
+        self.paths = PathFactory.create_batch(3)
+
+    def tearDown(self):
+        self.patch.stop()
+        for path in self.paths:
+            for suffix in ('', '.lock', '.queued'):
+                if os.path.exists(path.get_map_image_path() + suffix):
+                    os.remove(path.get_map_image_path() + suffix)
+        super().tearDown()
+
+    def stub_response(self, path):
+        """Slowly capture a fake image"""
+        time.sleep(self.delay)
+        return 200, 'image/png', b'PNG' + path.encode()
+
+    def make_stale(self, path, content=b'previous'):
+        image_path = path.get_map_image_path()
+        with open(image_path, 'wb') as f:
+            f.write(content)
+        past = time.time() - 3600 * 24
+        os.utime(image_path, (past, past))
+        return image_path
+
+    def test_render_map_images_in_batch(self):
+        self.assertEqual(render_map_images(self.paths, self.rooturl, workers=3), 3)
+        self.assertEqual(len(self.stub_requests), 3)
+        for path in self.paths:
+            with open(path.get_map_image_path(), 'rb') as f:
+                self.assertTrue(f.read().startswith(b'PNG'))
+        # Up-to-date images are not captured again
+        self.assertEqual(render_map_images(self.paths, self.rooturl, workers=3), 0)
+        self.assertEqual(len(self.stub_requests), 3)
+
+    def test_render_map_images_errors_are_logged(self):
+        app_settings['CAPTURE_SERVER'] = 'http://127.0.0.1:1'
+        with mock.patch('mapentity.helpers.time.sleep'):
+            self.assertEqual(render_map_images(self.paths[:1], self.rooturl, workers=1), 0)
+        self.assertFalse(os.path.exists(self.paths[0].get_map_image_path()))
+
+    def test_concurrent_requests_are_rendered_once(self):
+        self.delay = 0.5
+        objects = [Path.objects.get(pk=self.paths[0].pk) for i in range(3)]
+        results = []
+        threads = [threading.Thread(target=lambda obj: results.append(obj.prepare_map_image(self.rooturl)),
+                                    args=(obj, )) for obj in objects]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.stub_requests), 1)
+        self.assertEqual(sorted(results), [False, False, True])
+        self.assertTrue(os.path.exists(self.paths[0].get_map_image_path()))
+
+    def test_stale_image_is_used_while_queued(self):
+        path = self.paths[0]
+        image_path = self.make_stale(path)
+        queue = mock.Mock()
+        app_settings['MAP_CAPTURE_QUEUE'] = 'mapentity.tests.queue'
+        with mock.patch('mapentity.models.import_string', return_value=queue):
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+        # Queued once, previous image is kept
+        queue.assert_called_once_with(path, self.rooturl)
+        self.assertEqual(self.stub_requests, [])
+        with open(image_path, 'rb') as f:
+            self.assertEqual(f.read(), b'previous')
+        # Rendered in background
+        self.assertEqual(render_map_images([path], self.rooturl, workers=1), 1)
+        self.assertEqual(len(self.stub_requests), 1)
+        with open(image_path, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'PNG'))
+        self.assertFalse(os.path.exists(image_path + '.queued'))
+
+    def test_stale_image_is_queued_again_when_mark_expired(self):
+        path = self.paths[0]
+        image_path = self.make_stale(path)
+        queue = mock.Mock()
+        app_settings['MAP_CAPTURE_QUEUE'] = 'mapentity.tests.queue'
+        with mock.patch('mapentity.models.import_string', return_value=queue):
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+            # Queued task was lost
+            past = time.time() - app_settings['MAP_CAPTURE_TIMEOUT'] - 1
+            os.utime(image_path + '.queued', (past, past))
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+        self.assertEqual(queue.call_count, 2)
+
+    def test_image_locked_by_another_process_is_not_rendered(self):
+        path = self.paths[0]
+        self.make_stale(path)
+        lock = acquire_map_image_lock(path)
+        try:
+            self.assertFalse(path.prepare_map_image(self.rooturl))
+        finally:
+            release_map_image_lock(lock)
+        self.assertEqual(self.stub_requests, [])
+        self.assertTrue(path.prepare_map_image(self.rooturl))
+
+    def test_stale_image_without_queue_is_rendered(self):
+        path = self.paths[0]
+        self.make_stale(path)
+        self.assertTrue(path.prepare_map_image(self.rooturl))
+        self.assertEqual(len(self.stub_requests), 1)
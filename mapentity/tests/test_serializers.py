@@ -1,7 +1,9 @@
 from tempfile import TemporaryDirectory
-from io import StringIO
+from io import BytesIO, StringIO
 import os
+import zipfile
 
+import gpxpy
 from django.test import TestCase
 from django.conf import settings
 from django.contrib.gis import gdal
@@ -10,7 +12,7 @@ from django.http import HttpResponse
 from django.test.utils import override_settings
 from django.utils import translation
 
-from mapentity.serializers import ZipShapeSerializer, CSVSerializer
+from mapentity.serializers import ZipShapeSerializer, CSVSerializer, GPXSerializer
 from mapentity.serializers.shapefile import shape_write, info_from_geo_field, geo_field_from_model
 from mapentity.settings import app_settings
 
@@ -100,6 +102,29 @@ class ShapefileSerializer(TestCase):
         feature = layer_point[0]
         self.assertEqual(feature['name'].value, self.point1.name)
 
+    def test_zip_is_streamed(self):
+        serializer = ZipShapeSerializer()
+        content = b''.join(serializer.stream(Dive.objects.all(), fields=['id', 'name']))
+        self.assertFalse(os.path.exists(serializer.path_directory))
+        with zipfile.ZipFile(BytesIO(content)) as zipf:
+            names = zipf.namelist()
+        self.assertIn('Point.shp', names)
+        self.assertIn('MultiPolygon.dbf', names)
+        self.assertEqual(len([name for name in names if name.endswith('.shp')]), 6)
+
+    def test_geometry_collection_parts(self):
+        collection = DiveFactory.create(geom='SRID=%s;GEOMETRYCOLLECTION(POINT(1 1), POINT(2 2), '
+                                             'LINESTRING(0 0, 1 1))' % settings.SRID)
+        serializer = ZipShapeSerializer()
+        serializer.serialize(Dive.objects.filter(pk=collection.pk), stream=BytesIO(),
+                             fields=['id', 'name'], delete=False)
+        shapefiles = sorted([name for name in os.listdir(serializer.path_directory) if name.endswith('.shp')])
+        self.assertEqual(shapefiles, ['MultiLineString.shp', 'MultiPoint.shp'])
+        layer = DataSource(os.path.join(serializer.path_directory, 'MultiPoint.shp'))[0]
+        self.assertEqual(len(layer), 1)
+        self.assertEqual(str(layer[0]['id']), str(collection.pk))
+        self.assertEqual(layer[0].geom.geos.num_geom, 2)
+
     def test_serializer_model_no_geofield(self):
         self.serializer = ZipShapeSerializer()
         response = HttpResponse()
@@ -172,3 +197,30 @@ class CSVSerializerTests(TestCase):
                          ('ID,Nom\r\n{},'
                           'Test\r\n').format(self.point.pk))
         translation.deactivate()
+
+    def test_stream(self):
+        self.serializer.serialize(Dive.objects.all(), stream=self.stream,
+                                  fields=['id', 'name', 'practice', 'themes'])
+        chunks = self.serializer.stream(Dive.objects.all(), fields=['id', 'name', 'practice', 'themes'])
+        self.assertEqual(''.join(chunks), self.stream.getvalue())
+
+    def test_related_fetched_in_batch(self):
+        DiveFactory.create_batch(3)
+        with self.assertNumQueries(3):
+            content = ''.join(self.serializer.stream(Dive.objects.all(), chunk_size=10,
+                                                     fields=['id', 'name', 'practice', 'themes']))
+        self.assertEqual(len(content.splitlines()), 5)
+        self.assertIn('Tag1,Tag2', content)
+
+
+class GPXSerializerTests(TestCase):
+    def test_stream(self):
+        DiveFactory.create(name="Point")
+        DiveFactory.create(name="Line", geom='SRID=%s;LINESTRING(0 0, 10 0)' % settings.SRID)
+        content = ''.join(GPXSerializer().stream(Dive.objects.order_by('name')))
+        gpx = gpxpy.parse(content)
+        self.assertEqual(len(gpx.waypoints), 1)
+        self.assertIn('Point', gpx.waypoints[0].name)
+        self.assertEqual(len(gpx.tracks), 1)
+        self.assertIn('Line', gpx.tracks[0].name)
+        self.assertEqual(len(gpx.tracks[0].segments[0].points), 2)
@@ -1,4 +1,5 @@
 import json
+import math
 import os
 import shutil
 from unittest import mock
@@ -15,6 +16,7 @@ from django.core.exceptions import PermissionDenied
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.template.exceptions import TemplateDoesNotExist
 
+from mapentity.cache import LayerCache
 from mapentity.factories import UserFactory
 
 from mapentity.registry import app_settings
@@ -24,9 +26,9 @@ from mapentity.views import serve_attachment, Convert, JSSettings, MapEntityList
 from geotrek.common.models import Attachment
 from geotrek.common.models import FileType
 from geotrek.trekking.factories import TrekFactory
-from geotrek.trekking.views import TrekDocumentPublic, TrekDocument
+from geotrek.trekking.views import TrekDocumentPublic, TrekDocument, TrekList
 from geotrek.tourism.filters import TouristicEventFilterSet
-from geotrek.tourism.factories import TouristicEventFactory
+from geotrek.tourism.factories import TouristicEventFactory, TouristicEventTypeFactory
 from geotrek.tourism.models import TouristicEvent
 from geotrek.tourism.views import TouristicEventList, TouristicEventDetail
 from geotrek.zoning.factories import CityFactory
@@ -321,9 +323,11 @@ class SettingsViewTest(BaseTest):
         context = view.get_context_data()
         self.assertDictEqual(context['urls'], {
             "layer": "/api/modelname/modelname.geojson",
+            "tiles": "/api/modelname/tiles/{z}/{x}/{y}.pbf",
             "screenshot": "/map_screenshot/",
             "detail": "/modelname/0/",
             "format_list": "/modelname/list/export/",
+            "pk_list": "/api/modelname/modelnames.pks.json",
             "static": "/static/",
             "root": "/"
         })
@@ -378,26 +382,178 @@ class MapEntityLayerViewTest(BaseTest):
     def test_geojson_layer_returns_all_by_default(self):
         self.login()
         response = self.client.get(TouristicEvent.get_layer_url())
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 31)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 31)
 
     def test_geojson_layer_can_be_filtered(self):
         self.login()
         response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto')
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 1)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 1)
 
     def test_geojson_layer_with_parameters_is_not_cached(self):
         self.login()
         response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto')
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 1)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 1)
         response = self.client.get(TouristicEvent.get_layer_url())
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 31)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 31)
 
     def test_geojson_layer_with_parameters_does_not_use_cache(self):
         self.login()
         response = self.client.get(TouristicEvent.get_layer_url())
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 31)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 31)
         response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto')
-        self.assertEqual(len(json.loads(response.content.decode())['features']), 1)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 1)
+
+    def test_geojson_layer_features(self):
+        self.login()
+        event = TouristicEvent.objects.get(name='toto')
+        response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto')
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        layer = json.loads(b''.join(response.streaming_content).decode())
+        self.assertEqual(layer['type'], 'FeatureCollection')
+        self.assertEqual(layer['crs'], {'type': 'name', 'properties': {'name': 'EPSG:4326'}})
+        feature = layer['features'][0]
+        self.assertEqual(feature['id'], event.pk)
+        self.assertEqual(feature['properties'], {'name': 'toto', 'pk': event.pk, 'model': 'tourism.touristicevent'})
+        self.assertEqual(feature['geometry']['type'], 'Point')
+        self.assertEqual(len(feature['geometry']['coordinates']), 2)
+
+    def test_filtered_geojson_layer_is_cached_by_filters(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_layer_url() + '?name=toto&structure=')
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 1)
+        with mock.patch('mapentity.serializers.GeoJSONStreamSerializer.serialize') as serialize:
+            response = self.client.get(TouristicEvent.get_layer_url() + '?structure=&name=toto&_=1234')
+            self.assertEqual(len(json.loads(b''.join(response.streaming_content).decode())['features']), 1)
+        serialize.assert_not_called()
+
+    @mock.patch('mapentity.views.api.MapEntityLayer.stream_chunk_size', 10)
+    def test_geojson_layer_is_streamed_from_cache(self):
+        self.login()
+        response = self.client.get(TouristicEvent.get_layer_url())
+        content = b''.join(response.streaming_content)
+        self.assertEqual(len(json.loads(content.decode())['features']), 31)
+        with mock.patch('mapentity.serializers.GeoJSONStreamSerializer.serialize') as serialize:
+            response = self.client.get(TouristicEvent.get_layer_url())
+            self.assertEqual(b''.join(response.streaming_content), content)
+        serialize.assert_not_called()
+
+
+class MapEntityTilesViewTest(BaseTest):
+    def setUp(self):
+        self.event = TouristicEventFactory.create(geom='SRID=2154;POINT(700000 6600000)')
+        self.login_as_superuser()
+
+    def tile_of_event(self, z):
+        lng, lat = self.event.geom.transform(4326, clone=True).coords
+        n = 2 ** z
+        x = int((lng + 180) / 360 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return x, y
+
+    def test_tile_with_object(self):
+        x, y = self.tile_of_event(12)
+        response = self.client.get(TouristicEvent.get_tile_url(12, x, y))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'touristicevent', response.content)
+
+    def test_tile_properties(self):
+        self.event.name = 'Event in tile'
+        self.event.save()
+        x, y = self.tile_of_event(12)
+        response = self.client.get(TouristicEvent.get_tile_url(12, x, y))
+        # Properties of the layer view (keys and values are plain strings in MVT)
+        self.assertIn(b'name', response.content)
+        self.assertIn(b'Event in tile', response.content)
+
+    def test_tile_cached_under_own_key(self):
+        x, y = self.tile_of_event(12)
+        with mock.patch('mapentity.views.api.caches') as mocked_caches:
+            mocked_caches.__getitem__.return_value.get.return_value = None
+            self.client.get(TouristicEvent.get_tile_url(12, x, y))
+            tiles_cache = mocked_caches.__getitem__.return_value
+            key = tiles_cache.set.call_args[0][0]
+        self.assertIn('tile_12_%s_%s' % (x, y), key)
+        self.assertNotIn(LayerCache.index_key, [call[0][0] for call in tiles_cache.set.call_args_list])
+
+    def test_tile_without_object(self):
+        x, y = self.tile_of_event(12)
+        response = self.client.get(TouristicEvent.get_tile_url(12, x + 2, y))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_tile_is_filtered(self):
+        x, y = self.tile_of_event(12)
+        response = self.client.get(TouristicEvent.get_tile_url(12, x, y), {'name': 'not-a-name'})
+        self.assertEqual(response.content, b'')
+
+    def test_tile_out_of_range(self):
+        response = self.client.get(TouristicEvent.get_tile_url(2, 4, 0))
+        self.assertEqual(response.status_code, 404)
+
+
+class MapEntityJsonListViewTest(BaseTest):
+    def setUp(self):
+        self.events = [TouristicEventFactory.create(name=name) for name in ('Beta', 'Alpha', 'Gamma')]
+        self.login_as_superuser()
+
+    def get_page(self, **params):
+        params.setdefault('sEcho', 3)
+        response = self.client.get(TouristicEvent.get_jsonlist_url(), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_whole_list_without_paging_parameters(self):
+        response = self.client.get(TouristicEvent.get_jsonlist_url())
+        data = response.json()
+        self.assertEqual(len(data['aaData']), 3)
+        self.assertEqual(sorted(data['map_obj_pk']), sorted([event.pk for event in self.events]))
+
+    def test_page(self):
+        data = self.get_page(iDisplayStart=1, iDisplayLength=1, iSortCol_0=1, sSortDir_0='asc')
+        self.assertEqual(data['sEcho'], 3)
+        self.assertEqual(data['iTotalRecords'], 3)
+        self.assertEqual(data['iTotalDisplayRecords'], 3)
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[0].pk])
+        self.assertNotIn('map_obj_pk', data)
+
+    def test_page_sorted_descending(self):
+        data = self.get_page(iDisplayStart=0, iDisplayLength=10, iSortCol_0=1, sSortDir_0='desc')
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[2].pk, self.events[0].pk, self.events[1].pk])
+
+    def test_page_sorted_by_foreign_key_label(self):
+        for event, label in zip(self.events, ('Walk', 'Concert', 'Show')):
+            event.type = TouristicEventTypeFactory.create(type=label)
+            event.save()
+        data = self.get_page(iDisplayStart=0, iDisplayLength=10, iSortCol_0=2, sSortDir_0='asc')
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[1].pk, self.events[2].pk, self.events[0].pk])
+
+    def test_sortable_columns(self):
+        self.assertEqual(TrekList().get_sortable_columns(), ['id', 'name', 'duration', 'difficulty', 'departure'])
+
+    def test_page_searched(self):
+        data = self.get_page(iDisplayStart=0, iDisplayLength=10, sSearch='alp')
+        self.assertEqual(data['iTotalRecords'], 3)
+        self.assertEqual(data['iTotalDisplayRecords'], 1)
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[1].pk])
+
+    def test_page_searched_by_pk(self):
+        data = self.get_page(sSearch=str(self.events[2].pk))
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[2].pk])
+
+    def test_page_is_filtered(self):
+        data = self.get_page(type=self.events[2].type.pk)
+        self.assertEqual(data['iTotalRecords'], 1)
+        self.assertEqual([row[0] for row in data['aaData']], [self.events[2].pk])
+
+    def test_pk_list(self):
+        response = self.client.get(TouristicEvent.get_pk_list_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()), sorted([event.pk for event in self.events]))
+
+    def test_pk_list_searched_and_filtered(self):
+        response = self.client.get(TouristicEvent.get_pk_list_url(), {'sSearch': 'a', 'type': self.events[1].type.pk})
+        self.assertEqual(response.json(), [self.events[1].pk])
 
 
 class DetailViewTest(BaseTest):
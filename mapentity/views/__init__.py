@@ -16,7 +16,9 @@ from .generic import (
 )
 from .api import (
     MapEntityLayer,
+    MapEntityTiles,
     MapEntityJsonList,
+    MapEntityPkList,
     MapEntityViewSet
 )
 from .mixins import (
@@ -36,8 +38,10 @@ from .logentry import LogEntryList
 
 MAPENTITY_GENERIC_VIEWS = [
     MapEntityLayer,
+    MapEntityTiles,
     MapEntityList,
     MapEntityJsonList,
+    MapEntityPkList,
     MapEntityFormat,
     MapEntityMapImage,
     MapEntityDocument,
@@ -65,7 +69,9 @@ __all__ = [
     'MapEntityDelete',
 
     'MapEntityLayer',
+    'MapEntityTiles',
     'MapEntityJsonList',
+    'MapEntityPkList',
     'MapEntityViewSet',
 
     'HttpJSONResponse',
@@ -1,6 +1,12 @@
 import logging
 
+from django.contrib.gis.db.models import GeometryField
 from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import Polygon
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Func
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.views.generic.list import ListView
 
 from djgeojson.views import GeoJSONLayerView
@@ -8,6 +14,7 @@ from rest_framework import viewsets
 
 from mapentity import models as mapentity_models
 from ..settings import API_SRID, app_settings
+from ..cache import params_hash
 from ..decorators import (view_cache_response_content, view_cache_latest,
                           view_permission_required)
 from .. import serializers as mapentity_serializers
@@ -27,6 +34,8 @@ class MapEntityLayer(FilterListMixin, ModelViewMixin, GeoJSONLayerView):
     force2d = True
     srid = API_SRID
     precision = app_settings.get('GEOJSON_PRECISION')
+    # Number of features read and sent at once
+    stream_chunk_size = 500
 
     def __init__(self, *args, **kwargs):
         super(MapEntityLayer, self).__init__(*args, **kwargs)
@@ -49,13 +58,131 @@ class MapEntityLayer(FilterListMixin, ModelViewMixin, GeoJSONLayerView):
 
     @view_cache_response_content()
     def render_to_response(self, context, **response_kwargs):
-        return super(MapEntityLayer, self).render_to_response(context, **response_kwargs)
+        queryset = self.get_queryset()
+        if not mapentity_serializers.GeoJSONStreamSerializer.can_serialize(queryset, self.geometry_field):
+            # Geometry is not stored in database, fallback to djgeojson serializer
+            return super(MapEntityLayer, self).render_to_response(context, **response_kwargs)
+        serializer = mapentity_serializers.GeoJSONStreamSerializer(
+            properties=self.properties,
+            geometry_field=self.geometry_field,
+            srid=self.srid,
+            precision=self.precision,
+            force2d=self.force2d,
+            with_modelname=self.with_modelname,
+            chunk_size=self.stream_chunk_size,
+        )
+        return StreamingHttpResponse(serializer.serialize(queryset), content_type='application/geo+json',
+                                     **response_kwargs)
+
+
+class MapEntityTiles(FilterListMixin, ModelViewMixin, ListView):
+    """
+    Serve Mapbox vector tiles of the model, built by PostGIS (``ST_AsMVT``), with
+    the ``properties`` that are database fields. When registered, it takes
+    queryset and properties of the model layer view (see ``MapEntityOptions``).
+    Tiles are cached under their own keys until an object of the model is updated.
+    """
+    geometry_field = 'geom'
+    layer_name = None
+    extent = 4096
+    buffer = 64
+    # Below this zoom level, tiles are too large to be reprojected in the model SRID
+    bbox_filter_min_zoom = 5
+    max_zoom = 24
+    content_type = 'application/vnd.mapbox-vector-tile'
+
+    # Web Mercator half extent (EPSG:3857)
+    WORLD_EXTENT = 20037508.342789244
+
+    @classmethod
+    def get_entity_kind(cls):
+        return mapentity_models.ENTITY_TILES
+
+    @classmethod
+    def tile_bounds(cls, z, x, y):
+        size = 2 * cls.WORLD_EXTENT / 2 ** z
+        xmin = -cls.WORLD_EXTENT + x * size
+        ymax = cls.WORLD_EXTENT - y * size
+        return (xmin, ymax - size, xmin + size, ymax)
+
+    @view_permission_required()
+    def dispatch(self, *args, **kwargs):
+        z, x, y = int(kwargs['z']), int(kwargs['x']), int(kwargs['y'])
+        if z > self.max_zoom or x >= 2 ** z or y >= 2 ** z:
+            raise Http404
+        self.z, self.x, self.y = z, x, y
+        return super(MapEntityTiles, self).dispatch(*args, **kwargs)
+
+    def tile_cache_key(self):
+        model = self.get_model()
+        latest_saved = model.latest_updated()
+        if not latest_saved:
+            return None
+        key = '%s_%s_%s_tile_%s_%s_%s' % (
+            self.request.LANGUAGE_CODE,
+            model._meta.model_name,
+            latest_saved.strftime('%y%m%d%H%M%S%f'),
+            self.z, self.x, self.y
+        )
+        filters = params_hash(self.request.GET)
+        return '%s_%s' % (key, filters) if filters else key
+
+    def tile_fields(self, model):
+        fields = dict([(f.name, f) for f in model._meta.concrete_fields if not isinstance(f, GeometryField)])
+        names = [model._meta.pk.name]
+        # Properties of the layer view, if any (see MapEntityOptions)
+        for name in getattr(self, 'properties', []):
+            if name in fields and name not in names:
+                names.append(name)
+        # Related objects are given by primary key
+        return [fields[name].attname for name in names]
+
+    def get_tile(self):
+        xmin, ymin, xmax, ymax = self.tile_bounds(self.z, self.x, self.y)
+        queryset = self.get_queryset()
+        if not mapentity_serializers.GeoJSONStreamSerializer.can_serialize(queryset, self.geometry_field):
+            # Geometry is not stored in database
+            raise Http404
+        if self.z >= self.bbox_filter_min_zoom:
+            bounds = Polygon.from_bbox((xmin, ymin, xmax, ymax))
+            bounds.srid = 3857
+            queryset = queryset.filter(**{'%s__bboverlaps' % self.geometry_field: bounds})
+        envelope = Func(xmin, ymin, xmax, ymax, 3857, function='ST_MakeEnvelope',
+                        output_field=GeometryField(srid=3857))
+        mvt_geom = Func(Transform(self.geometry_field, 3857), envelope, self.extent, self.buffer, True,
+                        function='ST_AsMVTGeom', output_field=GeometryField(srid=3857))
+        queryset = queryset.annotate(mvt_geom=mvt_geom).values(*self.tile_fields(queryset.model), 'mvt_geom')
+        sql, params = queryset.query.sql_with_params()
+        layer_name = self.layer_name or self.get_model()._meta.model_name
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ST_AsMVT(tile, %s, %s, 'mvt_geom') FROM ({}) AS tile "
+                           "WHERE tile.mvt_geom IS NOT NULL".format(sql), [layer_name, self.extent] + list(params))
+            tile = cursor.fetchone()[0]
+        return bytes(tile) if tile else b''
+
+    def render_to_response(self, context, **response_kwargs):
+        key = self.tile_cache_key()
+        # Tiles are not recorded in the layers LRU index, which would grow with every tile
+        tiles_cache = caches[app_settings['GEOJSON_LAYERS_CACHE_BACKEND']]
+        tile = tiles_cache.get(key) if key else None
+        if tile is None:
+            tile = self.get_tile()
+            if key:
+                tiles_cache.set(key, tile)
+        return HttpResponse(tile, content_type=self.content_type)
 
 
 class MapEntityJsonList(JSONResponseMixin, BaseListView, ListView):
     """
     Return objects list as a JSON that will populate the Jquery.dataTables.
+
+    With dataTables server-side processing parameters (``sEcho``,
+    ``iDisplayStart``, ``iDisplayLength``, ``sSearch``, ``iSortCol_0``,
+    ``sSortDir_0``), only the requested page of the searched and sorted
+    objects is returned, without their primary keys (see ``MapEntityPkList``).
     """
+    # Maximum number of rows of a page
+    max_page_length = 1000
 
     @classmethod
     def get_entity_kind(cls):
@@ -66,9 +193,75 @@ class MapEntityJsonList(JSONResponseMixin, BaseListView, ListView):
         Override the most important part of JSONListView... (paginator)
         """
         serializer = mapentity_serializers.DatatablesSerializer()
+        if 'sEcho' in self.request.GET:
+            return self.get_page_data(serializer)
         return serializer.serialize(self.get_queryset(),
                                     fields=self.columns,
-                                    model=self.get_model())
+                                    model=self.get_model(),
+                                    prefetch=self.prefetch_objects)
+
+    def get_int_param(self, name, default):
+        try:
+            return int(self.request.GET.get(name, default))
+        except ValueError:
+            return default
+
+    def get_ordering(self):
+        """
+        Return ordering of the sorted column (see ``get_column_ordering()``)
+        """
+        column_index = self.get_int_param('iSortCol_0', -1)
+        if not 0 <= column_index < len(self.columns):
+            return []
+        ordering = self.get_column_ordering(self.columns[column_index])
+        if not ordering:
+            return []
+        if self.request.GET.get('sSortDir_0') == 'desc':
+            ordering = [lookup[1:] if lookup.startswith('-') else '-' + lookup for lookup in ordering]
+            return ordering + ['-pk']
+        # Primary key keeps pages stable
+        return ordering + ['pk']
+
+    def get_page_data(self, serializer):
+        queryset = self.get_queryset()
+        total = queryset.count()
+        queryset = self.search_queryset(queryset, self.request.GET.get('sSearch', ''))
+        filtered_total = queryset.count()
+        ordering = self.get_ordering()
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        start = max(self.get_int_param('iDisplayStart', 0), 0)
+        length = self.get_int_param('iDisplayLength', self.max_page_length)
+        if not 0 < length <= self.max_page_length:
+            length = self.max_page_length
+        return serializer.serialize_page(queryset[start:start + length],
+                                         fields=self.columns,
+                                         model=self.get_model(),
+                                         prefetch=self.prefetch_objects,
+                                         echo=self.get_int_param('sEcho', 0),
+                                         total=total,
+                                         filtered_total=filtered_total)
+
+    @view_permission_required()
+    @view_cache_latest()
+    def dispatch(self, *args, **kwargs):
+        return super(BaseListView, self).dispatch(*args, **kwargs)
+
+
+class MapEntityPkList(JSONResponseMixin, BaseListView, ListView):
+    """
+    Return primary keys of filtered objects, and of searched objects if
+    ``sSearch`` parameter is given, as a JSON array. Used to show the objects
+    of a list on the map when the list is paginated by the server.
+    """
+
+    @classmethod
+    def get_entity_kind(cls):
+        return mapentity_models.ENTITY_PK_LIST
+
+    def get_context_data(self, **kwargs):
+        queryset = self.search_queryset(self.get_queryset(), self.request.GET.get('sSearch', ''))
+        return list(queryset.values_list('pk', flat=True))
 
     @view_permission_required()
     @view_cache_latest()
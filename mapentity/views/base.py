@@ -1,9 +1,11 @@
 from __future__ import unicode_literals
 
 from io import BytesIO
+from functools import reduce
 import json
 import logging
 import mimetypes
+import operator
 import os
 from datetime import datetime
 import re
@@ -12,7 +14,8 @@ from urllib.parse import quote
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.db.models import GeometryField
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import FieldDoesNotExist, PermissionDenied
+from django.db.models import CharField, Q, TextField
 from django.urls import reverse
 from django.http import (HttpResponse, HttpResponseBadRequest, Http404)
 from django.shortcuts import get_object_or_404
@@ -96,12 +99,19 @@ class JSSettings(JSONResponseMixin, TemplateView):
 
         dictsettings['urls']['static'] = settings.STATIC_URL
         dictsettings['urls']['layer'] = '{}{}'.format(root_url, options._url_path(mapentity_models.ENTITY_LAYER)[1:-1])
+        dictsettings['urls']['tiles'] = '{}api/modelname/tiles/{{z}}/{{x}}/{{y}}.pbf'.format(root_url)
         dictsettings['urls']['detail'] = '{}modelname/0/'.format(root_url)
         dictsettings['urls']['format_list'] = '{}{}'.format(
             root_url, options._url_path(mapentity_models.ENTITY_FORMAT_LIST)[1:-1]
         )
+        dictsettings['urls']['pk_list'] = '{}{}'.format(
+            root_url, options._url_path(mapentity_models.ENTITY_PK_LIST)[1:-1]
+        )
         dictsettings['urls']['screenshot'] = reverse("mapentity:map_screenshot")
 
+        # Lists are paginated, sorted and searched by the server
+        dictsettings['server_side_lists'] = app_settings['DATATABLES_SERVER_SIDE']
+
         # Useful for JS calendars
         date_format = settings.DATE_INPUT_FORMATS[0].replace('%Y', 'yyyy').replace('%m', 'mm').replace('%d', 'dd')
         dictsettings['date_format'] = date_format
@@ -113,6 +123,8 @@ class JSSettings(JSONResponseMixin, TemplateView):
 
 class BaseListView(FilterListMixin, ModelViewMixin):
     columns = None
+    # Lookups used by the search box of lists (text columns by default)
+    search_fields = None
 
     def __init__(self, *args, **kwargs):
         super(BaseListView, self).__init__(*args, **kwargs)
@@ -129,6 +141,69 @@ class BaseListView(FilterListMixin, ModelViewMixin):
     def dispatch(self, *args, **kwargs):
         return super(BaseListView, self).dispatch(*args, **kwargs)
 
+    def prefetch_objects(self, objects):
+        """
+        Called with each chunk of listed or exported objects, to resolve
+        relations of columns at once. Return the objects.
+        """
+        return objects
+
+    def get_search_fields(self):
+        if self.search_fields is not None:
+            return self.search_fields
+        fields = []
+        model = self.get_model()
+        for column in self.columns:
+            try:
+                field = model._meta.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if isinstance(field, (CharField, TextField)) and field.concrete:
+                fields.append('%s__icontains' % column)
+        return fields
+
+    def get_column_ordering(self, column):
+        """
+        Return lookups sorting objects by ``column`` as shown in lists: related
+        objects by their default ordering (or first text field). Return None if
+        the column is not stored in database.
+        """
+        try:
+            field = self.get_model()._meta.get_field(column)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        if not field.is_relation:
+            return [column]
+        related = field.related_model._meta
+        ordering = [lookup for lookup in related.ordering if isinstance(lookup, str)]
+        if not ordering:
+            ordering = [f.name for f in related.fields if isinstance(f, (CharField, TextField))][:1]
+        if not ordering:
+            return [column]
+        return [('-%s__%s' % (column, lookup[1:])) if lookup.startswith('-') else '%s__%s' % (column, lookup)
+                for lookup in ordering]
+
+    def get_sortable_columns(self):
+        return [column for column in self.columns if self.get_column_ordering(column) is not None]
+
+    def search_queryset(self, queryset, search):
+        """
+        Keep objects matching every word of ``search`` in one of the search
+        fields, or whose primary key is ``search``.
+        """
+        search = search.strip()
+        if not search:
+            return queryset
+        lookups = self.get_search_fields()
+        condition = Q()
+        for word in search.split():
+            condition &= reduce(operator.or_, [Q(**{lookup: word}) for lookup in lookups], Q(pk__in=[]))
+        if search.isdigit():
+            condition |= Q(pk=int(search))
+        return queryset.filter(condition)
+
 
 @csrf_exempt
 @login_required
@@ -63,6 +63,7 @@ setup(
         'Pillow',
         'simplekml',
         'pygal',
+        'numpy',
         'django-extended-choices',
         'django-mptt',
         'django-multiselectfield',